@@ -0,0 +1,149 @@
+import random
+from array import array
+
+import numpy as np
+
+from game_logic import CheckersGame
+from packed_moves import TYPECODE, pack_move_matrix
+
+BOARD_TYPEHINT = list[list[str]]
+MOVES_LIST_TYPEHINT = list[tuple[int, int, int, int]]
+
+# cell encoding of the board tensor, hint marks ("G") are neither empty nor a piece - same as in scalar version
+EMPTY = 0
+RED = 1
+BLACK = 2
+HINT = 3
+CELL_CODES = {" ": EMPTY, CheckersGame.PLAYER_1_COLOR: RED, CheckersGame.PLAYER_2_COLOR: BLACK, "G": HINT}
+SIDE_CODES = {CheckersGame.PLAYER_1_COLOR: RED, CheckersGame.PLAYER_2_COLOR: BLACK}
+OUT_OF_BOARD = -1
+PADDING = 2  # the furthest a piece can go is two squares (beating)
+
+
+def move_kinds(direction: int) -> list[tuple[int, int, bool]]:
+    """(row shift, column shift, is beating) in the same order as keys of `possible_moves_for_piece`"""
+    return [
+        (direction, -1, False),           # move left
+        (direction, 1, False),            # move right
+        (direction * 2, -2, True),        # beating left
+        (direction * 2, 2, True),         # beating right
+        (-direction * 2, -2, True),       # beating backwards left
+        (-direction * 2, 2, True),        # beating backwards right
+    ]
+
+
+def boards_to_tensor(boards: list[BOARD_TYPEHINT]) -> np.ndarray:
+    """list of boards as used by `CheckersGame` -> (N, 8, 8) int8 tensor"""
+    tensor = np.empty((len(boards), 8, 8), dtype=np.int8)
+    for index, board in enumerate(boards):
+        tensor[index] = [[CELL_CODES[cell] for cell in row] for row in board]
+    return tensor
+
+
+def sides_to_array(sides: list[str]) -> np.ndarray:
+    """side to move of every board ("R"/"B") -> (N,) int8 array of piece codes"""
+    return np.array([SIDE_CODES[side] for side in sides], dtype=np.int8)
+
+
+def _kind_mask(padded: np.ndarray, own: np.ndarray, enemy: np.ndarray, row_shift: int, col_shift: int,
+               beating: bool) -> np.ndarray:
+    """(N, 8, 8) mask of own pieces that can make move of given kind, computed with shifted views of the board"""
+    def shifted(row_offset, col_offset):
+        return padded[:, PADDING + row_offset:PADDING + row_offset + 8, PADDING + col_offset:PADDING + col_offset + 8]
+
+    mask = (padded[:, PADDING:PADDING + 8, PADDING:PADDING + 8] == own[:, None, None])
+    mask &= shifted(row_shift, col_shift) == EMPTY
+    if beating:
+        mask &= shifted(row_shift // 2, col_shift // 2) == enemy[:, None, None]
+    return mask
+
+
+def batch_valid_moves(boards: np.ndarray, sides: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    legal moves of many positions at once
+
+    :param boards: (N, 8, 8) int8 tensor, see `boards_to_tensor`
+    :param sides: (N,) array with piece code (`RED`/`BLACK`) of the side to move, see `sides_to_array`
+    :returns: (M, 4) int8 array of all moves (start_row, start_col, end_row, end_col) and (N + 1,) offsets -
+        moves of board `i` are `moves[offsets[i]:offsets[i + 1]]`, ordered exactly like `CheckersGame.valid_moves`
+    """
+    boards = np.asarray(boards, dtype=np.int8)
+    sides = np.asarray(sides, dtype=np.int8)
+    count = len(boards)
+    enemies = np.where(sides == RED, BLACK, RED).astype(np.int8)
+    padded = np.pad(boards, ((0, 0), (PADDING, PADDING), (PADDING, PADDING)), constant_values=OUT_OF_BOARD)
+
+    # (N, kind, row, col) - both directions are computed and every board picks the one of its side
+    valid = np.empty((count, 6, 8, 8), dtype=bool)
+    red_moves = sides == RED
+    for kind_index, (red_kind, black_kind) in enumerate(zip(
+            move_kinds(CheckersGame.PLAYER_BOARD_DIRECTION[CheckersGame.PLAYER_1_COLOR]),
+            move_kinds(CheckersGame.PLAYER_BOARD_DIRECTION[CheckersGame.PLAYER_2_COLOR]))):
+        valid[:, kind_index] = np.where(
+            red_moves[:, None, None],
+            _kind_mask(padded, sides, enemies, *red_kind),
+            _kind_mask(padded, sides, enemies, *black_kind))
+
+    # scalar generator walks the board column by column and then over kinds of every piece
+    board_index, col, row, kind_index = np.nonzero(valid.transpose(0, 3, 2, 1))
+    row_shifts = np.array([[kind[0] for kind in move_kinds(direction)] for direction in (-1, 1)], dtype=np.int8)
+    col_shifts = np.array([kind[1] for kind in move_kinds(1)], dtype=np.int8)
+    direction_index = (sides[board_index] == BLACK).astype(np.intp)
+
+    moves = np.empty((len(board_index), 4), dtype=np.int8)
+    moves[:, 0] = row
+    moves[:, 1] = col
+    moves[:, 2] = row + row_shifts[direction_index, kind_index]
+    moves[:, 3] = col + col_shifts[kind_index]
+
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(board_index, minlength=count), out=offsets[1:])
+    return moves, offsets
+
+
+def moves_to_lists(moves: np.ndarray, offsets: np.ndarray) -> list[MOVES_LIST_TYPEHINT]:
+    """flat moves + offsets -> list of `valid_moves` lists (tuples of ints), one per board"""
+    as_tuples = [tuple(move) for move in moves.tolist()]
+    return [as_tuples[offsets[index]:offsets[index + 1]] for index in range(len(offsets) - 1)]
+
+
+def moves_to_packed(moves: np.ndarray, offsets: np.ndarray) -> list[array]:
+    """
+    flat moves + offsets -> list of `packed_valid_moves` arrays, one per board - no tuple per move is made,
+    what the bot takes in batch workloads
+    """
+    packed = array(TYPECODE, pack_move_matrix(moves).tobytes())
+    return [packed[offsets[index]:offsets[index + 1]] for index in range(len(offsets) - 1)]
+
+
+def random_board(generator: random.Random, fill: float) -> BOARD_TYPEHINT:
+    """pieces scattered anywhere (not only dark squares), so that edges and every move kind get exercised"""
+    cells = [" ", CheckersGame.PLAYER_1_COLOR, CheckersGame.PLAYER_2_COLOR]
+    weights = [1 - fill, fill / 2, fill / 2]
+    return [generator.choices(cells, weights, k=8) for _ in range(8)]
+
+
+def validate_against_scalar(count: int = 2000, seed: int = 0) -> int:
+    """
+    compare batched generator against `CheckersGame.calculate_current_valid_moves` on a random corpus
+
+    :returns: number of moves compared, raises RuntimeError on the first mismatch
+    """
+    generator = random.Random(seed)
+    boards = [random_board(generator, generator.uniform(0.1, 0.9)) for _ in range(count)]
+    sides = [generator.choice([CheckersGame.PLAYER_1_COLOR, CheckersGame.PLAYER_2_COLOR]) for _ in range(count)]
+    moves, offsets = batch_valid_moves(boards_to_tensor(boards), sides_to_array(sides))
+
+    game = CheckersGame()
+    batched_lists = zip(moves_to_lists(moves, offsets), moves_to_packed(moves, offsets))
+    for index, (board, side, (batched, packed)) in enumerate(zip(boards, sides, batched_lists)):
+        game.set_position(board, side)
+        if game.valid_moves != batched or game.packed_valid_moves != packed:
+            raise RuntimeError(f"board {index} ({side} to move) differs:\n"
+                               f"scalar:  {game.valid_moves}\nbatched: {batched}")
+    return len(moves)
+
+
+if __name__ == '__main__':
+    compared = validate_against_scalar()
+    print(f"batched move generator matches scalar one ({compared} moves compared)")
@@ -1,5 +1,15 @@
+import functools
+import hashlib
+import inspect
+from array import array
+from collections import Counter
+from collections.abc import Iterator
 from math import log2, floor
 
+import numpy as np
+
+import qiskit
+import qiskit_aer
 from qiskit import QuantumRegister, ClassicalRegister, QuantumCircuit
 from qiskit_aer.backends import AerSimulator
 from qiskit.circuit import ControlledGate
@@ -10,16 +20,57 @@ from qiskit.circuit.quantumregister import Qubit
 
 from matplotlib import pyplot as plt
 
+from game_logic import CheckersGame
+from circuit_cache import CircuitCache
+from cost_model import CostModel, ResourceBudgetExceeded
+from schedule_tuner import ScheduleTable
+from tablebase import Tablebase
+from latency_scheduler import LatencyScheduler
+from position_index import PositionIndex
+from simulator_backend import AerBackend, SimulatorBackend
+from packed_moves import TYPECODE as PACKED_TYPECODE, pack_move, pack_moves
+from conditions import CONDITIONS, DEFAULT_CONDITIONS, ConditionCache, MoveFeatures, evaluate_conditions
+from recommendation_result import PredictionRows, RecommendationResult
+
 MOVE_TYPEHINT = list[int, int, int, int] | tuple[int, int, int, int]
-MOVES_LIST_TYPEHINT = list[list[int, int, int, int]] | list[tuple[int, int, int, int]]
+# tuples of coordinates or moves packed into 16 bits (`CheckersGame.packed_valid_moves`, see `packed_moves`)
+MOVES_LIST_TYPEHINT = list[list[int, int, int, int]] | list[tuple[int, int, int, int]] | array
 ASSIGNED_STATES_TYPEHINT = dict[str, list]
 BOARD_TYPEHINT = list[list[str]]
+POSITION_TYPEHINT = tuple[MOVES_LIST_TYPEHINT, BOARD_TYPEHINT, str]
+
+# instructions Aer can run without transpiling, synthesized MCX gates are unrolled until only these are left
+AER_SUPPORTED_INSTRUCTIONS = frozenset(AerSimulator().configuration().basis_gates) | {"measure", "barrier"}
 
 
 class QuantumBot:
-    ALLOWED_CONDITION_COUNT = [1, 2, 3]  # 3rd in baking
+    # conditions are counted by adder of up to 3 qubits, at most 7 of them (`conditions.DEFAULT_CONDITIONS` order)
+    ALLOWED_CONDITION_COUNT = list(range(1, len(DEFAULT_CONDITIONS) + 1))
+    # ATTENTION!!!, ORDER, "MAGIC NUMBER", AND NUMBER OF ITERATIONS HAS BIG IMPACT!!!
+    # below is optimal, i kind of guessed that you have to interleave between these, but then reversed
+    # order of what i came up with at some point seems to do the best trick
+    ITERATION_SCHEDULE = (3, 1, 2, 1, 2, 1)
+    # ...which is why positions whose shape got tuned offline (see schedule_tuner.py) use schedule from the table
+    # how big multi-controlled X gates (condition check and diffusion, 6-10+ controls) are synthesized:
+    # "default"       - `XGate().control(n)`, left for qiskit/Aer to decompose
+    # "noancilla"     - no helper qubits, gate count grows fast with number of controls
+    # "recursion"     - splits the gate in halves with a single borrowed helper qubit
+    # "v-chain"       - toffoli ladder over n-2 clean (|0>) helper qubits, linear size
+    # "v-chain-dirty" - toffoli ladder over n-2 helper qubits that can be in any state (borrowed)
+    MCX_STRATEGIES = ["default", "noancilla", "recursion", "v-chain", "v-chain-dirty"]
+    # what to do when predicted job cost goes over budget: raise or use classical engine (no circuit at all)
+    OVER_BUDGET_ACTIONS = ["fallback", "refuse"]
+    # everything that shapes the circuit, used to invalidate compiled circuits stored on disk
+    CIRCUIT_BUILDER_METHODS = [
+        "q_minimal_board_move_alloc", "q_allocate_registers", "q_initialize", "q_condition_check", "q_adder",
+        "q_adder_check", "_QuantumBot__grover_diffusion", "q_prepare_iteration", "prepare_recommendation_circuit",
+        "q_assemble_master_circuit", "mcx_ancillas_needed", "_q_append_mcx", "_q_all_registers",
+        "_mcx_synthesis", "q_order_flagged_states",
+    ]
 
-    def __init__(self, number_of_conditions: int):
+    def __init__(self, number_of_conditions: int, mcx_strategy: str = "default", conditions: list[str] | None = None,
+                 schedule_table: ScheduleTable | None = None, tablebase: Tablebase | None = None,
+                 cost_model: CostModel | None = None, book: PositionIndex | None = None):
         """
         This class serves as the means of gauging probabilities of certain available moves the bot can make
 
@@ -32,25 +83,75 @@ class QuantumBot:
         these states will then be flipped; there is also a need to get correct number of good conditions
         these conditions will be added in "quantum accumulator", that then will be used in state flagging on certain
         condition (for example -> mark all the states that got at least one condition right)
+
+        :param conditions: names of registered conditions (`conditions.register_condition`), as many as
+            `number_of_conditions`; first `number_of_conditions` of `conditions.DEFAULT_CONDITIONS` if not given
+        :param schedule_table: tuned iteration schedules (`ScheduleTable.load`), default schedule for all if None
+        :param tablebase: solved endgames (`Tablebase.load`), None - endgames go through the circuit as well
+        :param cost_model: calibrated model (`CostModel.load`) for the resource budget and the latency scheduler
+        :param book: position index with stored recommendations, the latency scheduler answers seen positions from
+            it; None - no book
+
+        nothing is loaded from disk implicitly, callers pass in what they loaded
         """
         if number_of_conditions not in self.ALLOWED_CONDITION_COUNT:
             raise ValueError(f"number_of_conditions should be one of: {self.ALLOWED_CONDITION_COUNT}")
+        conditions = list(DEFAULT_CONDITIONS[:number_of_conditions] if conditions is None else conditions)
+        if len(conditions) != number_of_conditions:
+            raise ValueError(f"{len(conditions)} conditions given, number_of_conditions is {number_of_conditions}")
+        unknown = [name for name in conditions if name not in CONDITIONS]
+        if unknown:
+            raise ValueError(f"unknown conditions {unknown}, registered ones are: {list(CONDITIONS)}")
+        if mcx_strategy not in self.MCX_STRATEGIES:
+            raise ValueError(f"mcx_strategy should be one of: {self.MCX_STRATEGIES}")
+        if schedule_table is not None and schedule_table.number_of_conditions != number_of_conditions:
+            raise ValueError(f"schedule table was tuned for {schedule_table.number_of_conditions} conditions, "
+                             f"bot has {number_of_conditions}")
         self.master_circuit: QuantumCircuit | None = None
         self.board_moves_qbit_register: QuantumRegister | None = None
         self.ancilla_register: QuantumRegister | None = None
         self.quantum_adder_register: QuantumRegister | None = None
         self.condition_register: QuantumRegister | None = None
         self.results_register: ClassicalRegister | None = None
+        self.mcx_ancilla_register: QuantumRegister | None = None  # only when borrowed qubits are not enough
+        self.mcx_strategy = mcx_strategy
         self.number_of_conditions = number_of_conditions
-        # self.condition_map = condition_map
+        self.conditions = conditions
         self.valid_moves_with_flags: dict | None = None
         self.current_job_shots: int | None = None
         self.counts: dict | None = None
+        self.default_iteration_schedule: tuple[int, ...] = self.ITERATION_SCHEDULE
+        self.iteration_schedule: tuple[int, ...] = self.ITERATION_SCHEDULE  # one used for the current circuit
+        self.schedule_table: ScheduleTable | None = schedule_table
+        self.tablebase: Tablebase | None = tablebase  # solved endgames, see tablebase.py
+        self.circuit_cache: CircuitCache | None = None
+        # where jobs run, `simulator_backend.RecordReplayBackend` records or replays counts instead
+        self.simulator_backend: SimulatorBackend = AerBackend()
+        # flagged states get neighbouring gray codes and X flips of `q_condition_check` are merged between states
+        self.gray_code_ordering = True
+
+        # resource guard, see `set_resource_budget`
+        self.cost_model: CostModel | None = cost_model
+        self.max_memory_bytes: int | None = None
+        self.max_latency_seconds: float | None = None
+        self.over_budget_action = "fallback"
+        self.last_estimate: dict | None = None
+        self.last_engine: str | None = None  # "aer", "classical" or "tablebase", engine that produced current counts
+        self.book: PositionIndex | None = book
+        self.latency_scheduler: LatencyScheduler | None = None  # created on the first call with a deadline
 
         self.enemy = None  # current_enemy_player
         self.player_identifier = None  # current_player
         self.direction = None  # current_player_direction
-        self.human_readable_predictions: list[str, str, str] | None | list = []
+        self.human_readable_predictions: PredictionRows | list = []
+        # result of the current counts and what it was built from, see `recommendation_result`
+        self.last_result: RecommendationResult | None = None
+        self._last_result_source: tuple | None = None
+
+        # (attack maps, defence maps) of the position being flagged, see `CheckersGame.board_maps`
+        self.board_maps: tuple[dict, dict] | None = None
+        # flags of single moves kept across turns, see `enable_condition_cache`; None - every move flagged every time
+        self.condition_cache: ConditionCache | None = None
 
         self.verbose = False  #
         # self.verbose = True  #
@@ -81,6 +182,173 @@ class QuantumBot:
         self.player_identifier = current_player
         self.direction = current_player_direction
 
+    @classmethod
+    def circuit_builder_version(cls) -> str:
+        """short hash of circuit building code and qiskit versions, changes whenever produced circuits could"""
+        digest = hashlib.sha256(f"{qiskit.__version__}|{qiskit_aer.__version__}".encode("utf-8"))
+        for method_name in cls.CIRCUIT_BUILDER_METHODS:
+            method = getattr(cls, method_name)
+            try:
+                digest.update(inspect.getsource(method).encode("utf-8"))
+            except (OSError, TypeError):  # no source available (frozen build), fall back to bytecode
+                digest.update(method.__code__.co_code)
+        return digest.hexdigest()[:16]
+
+    def enable_circuit_cache(self, directory: str, max_bytes: int = 256 * 1024 * 1024,
+                             purge_other_versions: bool = False):
+        """
+        store compiled circuits in `directory` and reuse them across processes and restarts
+
+        :param purge_other_versions: remove circuits of other builder versions (see
+            `CircuitCache.purge_other_versions`), only when no process of another version shares the directory
+        """
+        self.circuit_cache = CircuitCache(directory, self.circuit_builder_version(), max_bytes)
+        if purge_other_versions:
+            self.circuit_cache.purge_other_versions()
+
+    def enable_condition_cache(self, verify: bool = False) -> ConditionCache:
+        """
+        flag only moves whose inputs changed since the last turn (see `conditions.ConditionCache`), meant for
+        expensive registered conditions - the built-in ones are faster without it
+
+        :param verify: check every cached flag against full recomputation, RuntimeError on mismatch
+        :returns: the cache, its `hits` and `misses` count moves
+        """
+        self.condition_cache = ConditionCache(verify)
+        return self.condition_cache
+
+    def circuit_cache_key(self) -> str:
+        """structural hash - register sizes, condition count, iteration schedule and flags of every state"""
+        return CircuitCache.structural_key(
+            board_qubits=len(self.board_moves_qbit_register),
+            result_bits=len(self.results_register),
+            adder_qubits=len(self.quantum_adder_register),
+            mcx_ancillas=len(self.mcx_ancilla_register) if self.mcx_ancilla_register else 0,
+            conditions=self.number_of_conditions,
+            schedule=list(self.iteration_schedule),
+            mcx_strategy=self.mcx_strategy,
+            gray_code_ordering=self.gray_code_ordering,
+            # only flags decide how oracle looks like, not the moves themselves
+            flags=[self.valid_moves_with_flags[state][1:-1] for state in self.valid_moves_with_flags],
+        )
+
+    def select_iteration_schedule(self) -> tuple[int, ...]:
+        """schedule tuned for the number of moves and flag histogram of flagged states, default one if not tuned"""
+        schedule = None
+        if self.schedule_table is not None:
+            histogram = ScheduleTable.flag_histogram(
+                (row[1:-1] for row in self.valid_moves_with_flags.values()), self.number_of_conditions)
+            schedule = self.schedule_table.lookup(len(self.valid_moves_with_flags), histogram)
+        self.iteration_schedule = self.default_iteration_schedule if schedule is None else schedule
+        return self.iteration_schedule
+
+    def set_resource_budget(self, max_memory_bytes: int | None = None, max_latency_seconds: float | None = None,
+                            action: str = "fallback", cost_model: CostModel | None = None):
+        """
+        limit memory and predicted time of a single simulation, None means no limit
+
+        :param action: "fallback" - compute recommendations with classical engine instead, "refuse" - raise
+            `ResourceBudgetExceeded`
+        :param cost_model: calibrated model, the one the bot was given (or default coefficients) if None
+        """
+        if action not in self.OVER_BUDGET_ACTIONS:
+            raise ValueError(f"action should be one of: {self.OVER_BUDGET_ACTIONS}")
+        self.max_memory_bytes = max_memory_bytes
+        self.max_latency_seconds = max_latency_seconds
+        self.over_budget_action = action
+        if cost_model is not None:
+            self.cost_model = cost_model
+        elif self.cost_model is None:
+            self.cost_model = CostModel()
+
+    def check_resource_budget(self, shots: int = 10000) -> bool:
+        """
+        predict cost of the job for currently flagged states, False means classical engine should be used instead
+        """
+        if self.max_memory_bytes is None and self.max_latency_seconds is None:
+            return True
+        self.last_estimate = estimate = self.cost_model.estimate(self, shots)
+        too_big = self.max_memory_bytes is not None and estimate["memory_bytes"] > self.max_memory_bytes
+        too_slow = self.max_latency_seconds is not None and estimate["seconds"] > self.max_latency_seconds
+        if not (too_big or too_slow):
+            return True
+        if self.over_budget_action == "refuse":
+            raise ResourceBudgetExceeded(
+                f"job would need {estimate['qubits']} qubits, {estimate['memory_bytes']} B "
+                f"and ~{estimate['seconds']:.2f} s, budget: {self.max_memory_bytes} B, {self.max_latency_seconds} s")
+        return False
+
+    def q_classical_counts(self, shots: int = 10000) -> dict:
+        """
+        cheap engine, no circuit involved - shots are spread over states with weight 2^(number of conditions met),
+        so the ordering matches what grover iterations push up, only without any quantum randomness
+        """
+        weights = {state: 2 ** sum(row[1:-1]) for state, row in self.valid_moves_with_flags.items()}
+        total_weight = sum(weights.values()) or 1
+        self.counts = {state: shots * weight // total_weight for state, weight in weights.items()}
+        self.current_job_shots = shots
+        return self.counts
+
+    def q_exact_probabilities(self) -> dict[str, float]:
+        """
+        outcome probabilities of the grover circuit, computed classically and exactly (no sampling)
+
+        same marking rule as the oracle: adder holds the number of flags the condition check raised for a basis
+        state - flags are raised only for moves whose extra board qubits (conditions + 2 of them) are all |1>, any
+        other state adds up to 0 - and the phase is flipped when that number is at least the `magic number` (so 0
+        marks everything). Diffusion inverts about the mean over whole board register - that's a vector of at most
+        few thousand amplitudes, so it is microseconds instead of a circuit
+        """
+        move_alloc = len(self.results_register)
+        extra_qubits = len(self.board_moves_qbit_register) - move_alloc
+        amplitudes = np.full((2 ** extra_qubits, 2 ** move_alloc), 2 ** (-(move_alloc + extra_qubits) / 2))
+        adder_values = np.zeros((2 ** extra_qubits, 2 ** move_alloc), dtype=int)
+        for state, row in self.valid_moves_with_flags.items():
+            adder_values[-1, int(state, 2)] = sum(row[1:-1])
+        for oracle_magic_number in self.iteration_schedule:
+            amplitudes[adder_values >= oracle_magic_number] *= -1
+            amplitudes = 2 * amplitudes.mean() - amplitudes
+        probabilities = (amplitudes ** 2).sum(axis=0)
+        return {state: float(probabilities[int(state, 2)]) for state in self.valid_moves_with_flags}
+
+    def q_exact_counts(self, shots: int = 10000) -> dict:
+        """expected counts of the circuit (see `q_exact_probabilities`), without running it"""
+        self.counts = {state: int(probability * shots) for state, probability in self.q_exact_probabilities().items()}
+        self.current_job_shots = shots
+        return self.counts
+
+    def q_tablebase_counts(
+            self, valid_moves_list: MOVES_LIST_TYPEHINT, board: BOARD_TYPEHINT, shots: int = 10000) -> dict | None:
+        """
+        endgames covered by the tablebase are played perfectly and without any circuit - shots are split between
+        moves that keep the best result (fastest win / slowest loss)
+
+        :returns: counts, None when there is no tablebase or position is not in it
+        """
+        if self.tablebase is None:
+            return None
+        best_moves = self.tablebase.best_moves(board, self.player_identifier)
+        if not best_moves:
+            return None
+        best_moves = {pack_move(*move) for move, _, _ in best_moves}
+        states = self.assign_valid_board_moves_to_q_states(valid_moves_list)
+        chosen = [state for state, row in states.items() if row[0] in best_moves]
+        if len(chosen) != len(best_moves):  # board does not follow the rules tablebase was solved for
+            return None
+        self.valid_moves_with_flags = states
+        self.counts = {state: shots // len(chosen) for state in chosen}
+        self.current_job_shots = shots
+        return self.counts
+
+    def update_current_side(self, side: str):
+        """shortcut over `update_current_player_info`, enemy and direction are taken from the game rules"""
+        enemy = CheckersGame.PLAYER_2_COLOR if side == CheckersGame.PLAYER_1_COLOR else CheckersGame.PLAYER_1_COLOR
+        self.update_current_player_info(
+            current_player=side,
+            current_player_direction=CheckersGame.PLAYER_BOARD_DIRECTION[side],
+            current_enemy_player=enemy
+        )
+
     def _present_full_state(self, state: str):
         "|" + f"{state}".zfill(len(self.board_moves_qbit_register)) + ">"
 
@@ -88,24 +356,90 @@ class QuantumBot:
         """creates registers for future purposes"""
         moves_q_alloc = self.q_minimal_board_move_alloc(valid_moves_count)
         self.board_moves_qbit_register = QuantumRegister(moves_q_alloc + self.number_of_conditions + 2, name="board")
-        if self.number_of_conditions < 4:  # up to 3?
-            self.quantum_adder_register = QuantumRegister(2, name="add")  # quantum counting up to 3
-        else:
-            self.quantum_adder_register = QuantumRegister(3, name="add")  # quantum counting up to 7
+        self.quantum_adder_register = QuantumRegister(self.adder_size(self.number_of_conditions), name="add")
 
         self.results_register = ClassicalRegister(moves_q_alloc, name="meas.")  # + self.number_of_conditions + 2
         self.ancilla_register = QuantumRegister(1, name="anc")  # extra qbit for Z-flip action
         self.condition_register = QuantumRegister(self.number_of_conditions, name="condi")
 
+        # big MCX gates can borrow idle qubits of other registers, separate register only covers what's missing
+        # condition check: adder + anc are idle (and clean), other condition qbits are idle but hold flags (dirty)
+        # diffusion: condition, adder and anc registers are all uncomputed back to |0> by then
+        board_size = len(self.board_moves_qbit_register)
+        idle_in_condition_check = len(self.quantum_adder_register) + 1
+        if self.mcx_strategy != "v-chain":
+            idle_in_condition_check += self.number_of_conditions - 1
+        idle_in_diffusion = self.number_of_conditions + len(self.quantum_adder_register) + 1
+        missing = max(
+            self.mcx_ancillas_needed(board_size) - idle_in_condition_check,
+            self.mcx_ancillas_needed(board_size - 1) - idle_in_diffusion,
+            0
+        )
+        self.mcx_ancilla_register = QuantumRegister(missing, name="mcx_anc") if missing else None
+
+    @staticmethod
+    def adder_size(number_of_conditions: int) -> int:
+        """qubits counting met conditions: 2 count up to 3, 3 up to 7"""
+        return max(2, number_of_conditions.bit_length())
+
+    def mcx_ancillas_needed(self, num_controls: int) -> int:
+        """helper qubits that chosen MCX synthesis needs for a gate with that many controls"""
+        if self.mcx_strategy in ["v-chain", "v-chain-dirty"]:
+            return max(0, num_controls - 2)
+        if self.mcx_strategy == "recursion":
+            return 1 if num_controls > 4 else 0
+        return 0
+
+    def _q_all_registers(self) -> list[QuantumRegister]:
+        """quantum registers in the order master circuit is built with"""
+        registers = [
+            self.board_moves_qbit_register, self.condition_register, self.quantum_adder_register,
+            self.ancilla_register
+        ]
+        if self.mcx_ancilla_register is not None:
+            registers.append(self.mcx_ancilla_register)
+        return registers
+
+    def _q_append_mcx(self, circuit: QuantumCircuit, controls: list[Qubit], target: Qubit,
+                      clean_idle: list[Qubit], dirty_idle: list[Qubit]):
+        """
+        append multi-controlled X synthesized with `self.mcx_strategy`
+
+        :param clean_idle: qubits not used by the gate that are guaranteed to be |0> at this point
+        :param dirty_idle: qubits not used by the gate in unknown state, only strategies that borrow can use them
+        """
+        if self.mcx_strategy == "default":
+            circuit.append(XGate().control(len(controls)), [*controls, target])
+            return
+        helper_pool = [*clean_idle]
+        if self.mcx_strategy != "v-chain":  # every other one restores the helper state, whatever it was
+            helper_pool.extend(dirty_idle)
+        if self.mcx_ancilla_register is not None:
+            helper_pool.extend(self.mcx_ancilla_register)
+        helpers = helper_pool[:self.mcx_ancillas_needed(len(controls))]
+        synthesis = self._mcx_synthesis(self.mcx_strategy, len(controls), len(helpers))
+        circuit.compose(synthesis, [*controls, target, *helpers], inplace=True)
+
+    @staticmethod
+    @functools.cache
+    def _mcx_synthesis(strategy: str, num_controls: int, num_helpers: int) -> QuantumCircuit:
+        """
+        MCX of given shape synthesized with `strategy` and unrolled into instructions Aer knows
+        (`mcx_recursive`, `mcx_vchain`, `rccx`... are not among them), qubits: controls, target, helpers
+        """
+        synthesis = QuantumCircuit(num_controls + 1 + num_helpers)
+        helpers = list(range(num_controls + 1, num_controls + 1 + num_helpers))
+        synthesis.mcx(list(range(num_controls)), num_controls, ancilla_qubits=helpers or None, mode=strategy)
+        while unsupported := set(synthesis.count_ops()) - AER_SUPPORTED_INSTRUCTIONS:
+            synthesis = synthesis.decompose(gates_to_decompose=list(unsupported))
+        return synthesis
+
     def q_initialize(self):
         """
         create master circuit that will get all the sub-circuits composed into
         all the compositions that will further take place should happen as in_place=True
         """
-        self.master_circuit = QuantumCircuit(
-            self.board_moves_qbit_register, self.condition_register, self.quantum_adder_register,
-            self.ancilla_register, self.results_register
-        )
+        self.master_circuit = QuantumCircuit(*self._q_all_registers(), self.results_register)
 
         self.master_circuit.h(self.board_moves_qbit_register)
 
@@ -115,17 +449,19 @@ class QuantumBot:
         probabilities are
 
         :returns: dictionairy of the structure:
-            key: [move, state_1_flag, state_2_flag, probability (0)]
+            key: [packed move, state_1_flag, state_2_flag, probability (0)]
 
         """
-        # move: (start_row, start_col, fin_row, fin_col)
+        # move packed into an int (see `packed_moves`), tuples are decoded only in `parse_recommendations_*`
+        packed_moves = pack_moves(valid_moves_list)
+        move_alloc = self.q_minimal_board_move_alloc(len(packed_moves))
         states_assigned = dict()
-        for index, move in enumerate(valid_moves_list):
+        for index, move in enumerate(packed_moves):
             # state = "|" + f"{bin(index)[2:]}".zfill(len(self.board_moves_qbit_register)) + ">"
-            state = f"{bin(index)[2:]}".zfill(self.q_minimal_board_move_alloc(len(valid_moves_list)))
+            state = f"{bin(index)[2:]}".zfill(move_alloc)
             # for example, following could result in:
             # { ...
-            #       "000" : [(3, 4, 3, 1), 0, 0, 0],
+            #       "000" : [pack_move(3, 4, 2, 3), 0, 0, 0],
             # ... }
             # translates to:
             # "partial_q_state": [
@@ -135,103 +471,44 @@ class QuantumBot:
 
         return states_assigned
 
-    def condition_piece_shielded(
-            self, board: BOARD_TYPEHINT, assigned_states_to_fill: ASSIGNED_STATES_TYPEHINT, condition_num=1):
-        """
-        This condition aims at preventing overextending of the board pieces.
-        This in turn means that a piece, after finished move, will have the piece of the same color on one
-        of its sides, behind its back. This prevents beating pieces of its color
-
-        :param condition_num: this param controls which condition should be marked
-            from method above, if condition is true then "1" means -> mark condition_1_placeholder as "1"
-        """
-        # move: (start_row, start_col, fin_row, fin_col)
-
-        for state in assigned_states_to_fill:
-            move = assigned_states_to_fill[state][0]
-            fin_col, fin_row = move[3], move[2]
-            start_col, start_row = move[1], move[0]
-            # following are always +/- 1, we want "1 to the side, and 1 row BEHIND!"
-            # "BEHIND" -> making this color agnostic, from both perspectives
-            # for this test - "row direction" of this condition check is reverse to where player goes
-            check_direction_row = -self.direction
-            test_row = fin_row + check_direction_row  # col, row
-            test_col_1 = fin_col - 1
-            test_col_2 = fin_col + 1
-            # conditions
-            if not self._check_out_of_border(test_col_1, test_row):
-                if board[test_row][test_col_1] == self.player_identifier:
-                    if test_col_1 != start_col:
-                        assigned_states_to_fill[state][condition_num] = 1
-                        continue
-            else:
-                assigned_states_to_fill[state][condition_num] = 1
-                continue
-            if not self._check_out_of_border(test_col_2, test_row):
-                if board[test_row][test_col_2] == self.player_identifier:
-                    if test_col_2 != start_col:
-                        assigned_states_to_fill[state][condition_num] = 1
-                        continue
-            else:
-                assigned_states_to_fill[state][condition_num] = 1
-                continue
+    def q_order_flagged_states(self) -> ASSIGNED_STATES_TYPEHINT:
+        """
+        reassign states once the flags are known: moves with any condition flagged take gray codes 0, 1, 2...
+        (states that follow each other differ in one bit), the rest takes the codes after them. Codes are inverted,
+        so the walk starts at |11..1> - the state that needs no X gates at all
+
+        `q_condition_check` only has to flip bits that change between two flagged states, so every flagged state
+        past the first one costs one X gate instead of two per zero bit (and per flagged condition)
+        """
+        if not self.gray_code_ordering:
+            return self.valid_moves_with_flags
+        move_alloc = len(self.results_register)
+        all_ones = 2 ** move_alloc - 1
+        rows = sorted(self.valid_moves_with_flags.values(), key=lambda row: not any(row[1:-1]))  # stable
+        self.valid_moves_with_flags = {
+            bin(index ^ index >> 1 ^ all_ones)[2:].zfill(move_alloc): row for index, row in enumerate(rows)
+        }
+        return self.valid_moves_with_flags
+
+    def flag_conditions(self, board: BOARD_TYPEHINT) -> ASSIGNED_STATES_TYPEHINT:
+        """
+        fill condition flags of `valid_moves_with_flags` - all `self.conditions` (see `conditions.CONDITIONS`) are
+        evaluated in one pass over all the moves, flag of the i-th condition goes to the i-th placeholder
 
-        return assigned_states_to_fill
-
-    def condition_moves_to_be_beaten(
-            self, board: BOARD_TYPEHINT, assigned_states_to_fill: ASSIGNED_STATES_TYPEHINT, condition_num=2):
-        """
-        This condition checks, if after the move, our piece moved would get beaten
-
-        Since this test looks for potentially bad moves, we can "invert the logic" and always mark "1",
-        unless the situation finds the move to not be worth it. Then it will stay as "0"
-        """
-
-        # move: (start_row, start_col, fin_row, fin_col)
-        for state in assigned_states_to_fill:
-            move = assigned_states_to_fill[state][0]
-            print(self.human_readable_move_format(move))
-            fin_col, fin_row = move[3], move[2]
-            start_col, start_row = move[1], move[0]
-            # moving only one field with check, since we have to include check for
-            direction_col = int((fin_col - start_col) / abs(fin_col - start_col))
-            # conditions
-            test_col_1 = fin_col - direction_col  # horizontal direction
-            test_col_2 = fin_col + direction_col  # horizontal direction
-            test_row_enemy = fin_row + self.direction
-            if not self._check_out_of_border(test_col_1, test_row_enemy):  # perpendicular check
-                if board[test_row_enemy][start_col] == self.enemy:
-                    # enemy present, but can he beat?
-                    # is lower, straight from enemy, free? if so, he can check!
-                    if not self._check_out_of_border(test_col_1 - 2*direction_col, test_row_enemy - 2*self.direction):
-                        # can this enemy really jump over on the perpendicular lower empty field?
-                        if board[test_row_enemy - 2*self.direction][test_col_1 - 2*direction_col] == " ":
-                            # assigned_states_to_fill[state][condition_num] = 0
-                            print("enemy can check!")
-                            continue
-
-            if not self._check_out_of_border(test_col_2, test_row_enemy):  # check "in the direction"
-                if board[test_row_enemy][test_col_2] == self.enemy:
-                    # lower, in the direction we came from with the piece is always empty
-                    # either through beating or through just piece moving out
-                    # assigned_states_to_fill[state][condition_num] = 0
-                    print("enemy can check!")
-                    continue
-            assigned_states_to_fill[state][condition_num] = 1  # it is an ok move -> approved to move like that
-
-        return assigned_states_to_fill
-
-    def condition_can_beat(
-            self, assigned_states_to_fill: ASSIGNED_STATES_TYPEHINT, condition_num=3):
-        """Flag condition for beating opponent checker!"""
-        for state in assigned_states_to_fill:
-            move = assigned_states_to_fill[state][0]
-            fin_col, fin_row = move[3], move[2]
-            start_col, start_row = move[1], move[0]
-            if abs(fin_row - start_row) > 1:
-                assigned_states_to_fill[state][condition_num] = 1
-
-        return assigned_states_to_fill
+        feature functions read board maps of the position (`self.board_maps`, see `CheckersGame.board_maps`), with
+        `enable_condition_cache` flags of moves whose inputs didn't change since the last turn are reused
+        """
+        rows = list(self.valid_moves_with_flags.values())
+        features = MoveFeatures(
+            array(PACKED_TYPECODE, [row[0] for row in rows]), board, self.player_identifier, self.enemy,
+            self.direction, self.board_maps)
+        if self.condition_cache is not None:
+            flags_of_moves = self.condition_cache.evaluate(features, self.conditions)
+        else:
+            flags_of_moves = evaluate_conditions(features, self.conditions)
+        for row, flags in zip(rows, flags_of_moves.tolist()):
+            row[1:-1] = flags
+        return self.valid_moves_with_flags
 
     def q_condition_check(self, prepared_assigned_states: ASSIGNED_STATES_TYPEHINT) -> QuantumCircuit:
         """
@@ -241,7 +518,8 @@ class QuantumBot:
         takes -> board moves (states) register
         outputs -> condition register
         """
-        check_circuit = QuantumCircuit(self.board_moves_qbit_register, self.condition_register)
+        check_circuit = QuantumCircuit(*self._q_all_registers())
+        clean_idle = [*self.quantum_adder_register, *self.ancilla_register]
 
         # we operate on extend board_move_register, with the "control bits" expanded by num_conditions ,
         # then we control qbits: (last, last-1, ...) in quantum state register
@@ -253,23 +531,29 @@ class QuantumBot:
         # we do all this to not overshoot with too many grover diffusion iterations, as when we diffuse too much,
         # probabilities start to diminish, and then after even more time, the BAD-move quantum states will start to
         # be brought up by grover's algorithm... and this repeats "ad infinum"
-        CNXGate: ControlledGate = XGate().control(len(self.board_moves_qbit_register))
-
+        # with `gray_code_ordering` zero bits stay flipped from one flagged state to the next, only the bits where
+        # the two states differ are flipped in between (X pairs cancel out) - and once back at the very end
+        flipped = set()
         for state in prepared_assigned_states:
             check_circuit.barrier()
             # absolute last elem. is "prob. placeholder"
             for flag_index, flag in enumerate(prepared_assigned_states[state][1:-1]):
                 if flag:
-                    for invert_index, c in enumerate(reversed(state)):
-                        if c == "0":
-                            check_circuit.append(XGate(), [self.board_moves_qbit_register[invert_index]])
-                    check_circuit.append(CNXGate, [
-                        *self.board_moves_qbit_register,
-                        self.condition_register[flag_index]
-                    ])
-                    for invert_index, c in enumerate(reversed(state)):
-                        if c == "0":
+                    zero_bits = {invert_index for invert_index, c in enumerate(reversed(state)) if c == "0"}
+                    for invert_index in sorted(flipped ^ zero_bits):
+                        check_circuit.append(XGate(), [self.board_moves_qbit_register[invert_index]])
+                    flipped = zero_bits
+                    other_conditions = [q for i, q in enumerate(self.condition_register) if i != flag_index]
+                    self._q_append_mcx(
+                        check_circuit, [*self.board_moves_qbit_register], self.condition_register[flag_index],
+                        clean_idle, other_conditions
+                    )
+                    if not self.gray_code_ordering:
+                        for invert_index in sorted(flipped):
                             check_circuit.append(XGate(), [self.board_moves_qbit_register[invert_index]])
+                        flipped = set()
+        for invert_index in sorted(flipped):
+            check_circuit.append(XGate(), [self.board_moves_qbit_register[invert_index]])
 
         return check_circuit
 
@@ -336,8 +620,6 @@ class QuantumBot:
         if not number_to_diffuse_over in possible_numbers:
             raise ValueError("wrong number")
 
-        C3XGate: ControlledGate = XGate().control(3)
-        C2XGate: ControlledGate = XGate().control(2)
         adder_check_circuit = QuantumCircuit(self.quantum_adder_register, self.ancilla_register)
 
         binstr = bin(number_to_diffuse_over)[2:].zfill(adder_len)
@@ -345,10 +627,7 @@ class QuantumBot:
             if c == "0":
                 adder_check_circuit.x(self.quantum_adder_register[index])
 
-        if adder_len == 3:
-            adder_check_circuit.append(C3XGate, [*self.quantum_adder_register, *self.ancilla_register])
-        elif adder_len == 2:
-            adder_check_circuit.append(C2XGate, [*self.quantum_adder_register, *self.ancilla_register])
+        adder_check_circuit.append(XGate().control(adder_len), [*self.quantum_adder_register, *self.ancilla_register])
 
         return adder_check_circuit
 
@@ -360,15 +639,19 @@ class QuantumBot:
         takes and outputs -> board moves (states) register
         """
 
-        grover_diffusion_circuit = QuantumCircuit(self.board_moves_qbit_register)
-        x_gate_controlled = XGate().control(num_ctrl_qubits=len(self.board_moves_qbit_register)-1)
+        grover_diffusion_circuit = QuantumCircuit(*self._q_all_registers())
+        # everything besides board register is back at |0> when diffusion happens
+        clean_idle = [*self.condition_register, *self.quantum_adder_register, *self.ancilla_register]
 
         grover_diffusion_circuit.h(self.board_moves_qbit_register)
         grover_diffusion_circuit.x(self.board_moves_qbit_register)
 
         # I had troubles with qiskit recognizing n-(c)ZGate, this construct seems to work as an equivalent
         grover_diffusion_circuit.h(self.board_moves_qbit_register[-1])
-        grover_diffusion_circuit.append(x_gate_controlled, [*self.board_moves_qbit_register])
+        self._q_append_mcx(
+            grover_diffusion_circuit, [*self.board_moves_qbit_register[:-1]], self.board_moves_qbit_register[-1],
+            clean_idle, []
+        )
         grover_diffusion_circuit.h(self.board_moves_qbit_register[-1])
 
         grover_diffusion_circuit.x(self.board_moves_qbit_register)
@@ -378,7 +661,8 @@ class QuantumBot:
 
     def q_prepare_iteration(self, oracle_magic_number: int):
         """prepares entire diffusion procedure"""
-        possible_numbers = [*range(2**(len(self.quantum_adder_register)))]
+        # adder never counts past the number of conditions, checking higher numbers would only add gates
+        possible_numbers = [*range(self.number_of_conditions + 1)]
         diffusion = self.__grover_diffusion()
 
         condition_check_circuit = self.q_condition_check(self.valid_moves_with_flags)
@@ -389,8 +673,8 @@ class QuantumBot:
             adder_check_circuits.append(self.q_adder_check(i))
 
         # assembly
-        self.master_circuit.compose(
-            condition_check_circuit, [*self.board_moves_qbit_register, *self.condition_register], inplace=True)
+        # condition check and diffusion are built over all registers, so they can borrow idle qubits
+        self.master_circuit.compose(condition_check_circuit, self.master_circuit.qubits, inplace=True)
         self.master_circuit.barrier()
         self.master_circuit.compose(
             adder_circuit, [*self.condition_register, *self.quantum_adder_register], inplace=True)
@@ -405,53 +689,249 @@ class QuantumBot:
         self.master_circuit.compose(
             adder_circuit.reverse_ops(), [*self.condition_register, *self.quantum_adder_register], inplace=True)
         self.master_circuit.barrier()
-        self.master_circuit.compose(
-            condition_check_circuit.reverse_ops(), [*self.board_moves_qbit_register, *self.condition_register], inplace=True)
+        self.master_circuit.compose(condition_check_circuit.reverse_ops(), self.master_circuit.qubits, inplace=True)
         self.master_circuit.barrier()
 
-        self.master_circuit.compose(diffusion, [*self.board_moves_qbit_register], inplace=True)
+        self.master_circuit.compose(diffusion, self.master_circuit.qubits, inplace=True)
 
     def __schedule_job_locally(self, shots=10000, seed_simulator=None):
         """
         run circuit measurements locally on your PC with standard settings
 
-        default simulator to use is 'qasm' that provides only counts and measurements, but any can be used
+        simulator is `self.simulator_backend` (Aer unless replaced), it provides only counts and measurements
         :returns: job results
         """
-        job = AerSimulator().run(self.master_circuit, shots=shots, seed_simulator=seed_simulator)
+        self.counts = self.simulator_backend.run([self.master_circuit], shots, seed_simulator)[0]
         self.current_job_shots = shots
-        self.counts = job.result().get_counts(self.master_circuit)
         return self.counts
 
-    def calculate_recommendations(
-            self, valid_moves_list: MOVES_LIST_TYPEHINT, board: BOARD_TYPEHINT):
-        """flag possible states, execute entire subcircuit creation, schedule a job and get results"""
+    def prepare_recommendation_circuit(
+            self, valid_moves_list: MOVES_LIST_TYPEHINT, board: BOARD_TYPEHINT) -> QuantumCircuit:
+        """flag possible states and execute entire subcircuit creation, without scheduling any job"""
+        self.prepare_flagged_states(valid_moves_list, board)
+        return self.q_assemble_master_circuit()
+
+    def prepare_flagged_states(
+            self, valid_moves_list: MOVES_LIST_TYPEHINT, board: BOARD_TYPEHINT,
+            board_maps: tuple[dict, dict] | None = None) -> ASSIGNED_STATES_TYPEHINT:
+        """
+        allocate registers, assign quantum states to moves and flag conditions - everything before assembly
+
+        :param board_maps: attack and defence maps of the board, as kept up to date by `CheckersGame` (its
+            `attack_maps`, `defence_maps`); built from the board when not given
+        """
+        self.board_maps = board_maps if board_maps is not None else CheckersGame.board_maps(board)
         moves_count = len(valid_moves_list)
         self.q_allocate_registers(moves_count)
 
         # initialize states and flag conditions
         self.q_initialize()
         self.valid_moves_with_flags = self.assign_valid_board_moves_to_q_states(valid_moves_list)
-        self.valid_moves_with_flags = self.condition_piece_shielded(
-            board, self.valid_moves_with_flags, condition_num=1)
-        self.valid_moves_with_flags = self.condition_moves_to_be_beaten(
-            board, self.valid_moves_with_flags, condition_num=2)
-        self.valid_moves_with_flags = self.condition_can_beat(
-            self.valid_moves_with_flags, condition_num=3)
-
-        # prepare entire diffusion circuit based on flagged conditions
-        # ATTENTION!!!, ORDER, "MAGIC NUMBER", AND NUMBER OF ITERATIONS HAS BIG IMPACT!!!
-        # below is optimal, i kind of guessed that you have to interleave between these, but then reversed
-        # order of what i came up with at some point seems to do the best trick
-        self.q_prepare_iteration(3)
-        self.q_prepare_iteration(1)
-        self.q_prepare_iteration(2)
-        self.q_prepare_iteration(1)
-        self.q_prepare_iteration(2)
-        self.q_prepare_iteration(1)
+        self.flag_conditions(board)
+        self.q_order_flagged_states()
+        self.select_iteration_schedule()
+        return self.valid_moves_with_flags
+
+    def prepare_circuit_for_flags(self, flag_rows: list[list[int]]) -> QuantumCircuit:
+        """
+        build the circuit straight from condition flags, one row per state - no board involved
+
+        meant for benchmarks and tuning tools, that need circuits of given shape without real positions
+        """
+        self.q_allocate_registers(len(flag_rows))
+        self.q_initialize()
+        move_alloc = self.q_minimal_board_move_alloc(len(flag_rows))
+        self.valid_moves_with_flags = {
+            bin(index)[2:].zfill(move_alloc): [0, *flags, 0] for index, flags in enumerate(flag_rows)
+        }
+        self.q_order_flagged_states()
+        self.select_iteration_schedule()
+        return self.q_assemble_master_circuit()
+
+    def q_assemble_master_circuit(self) -> QuantumCircuit:
+        """compose all the grover iterations over flagged states and measurement (or load it from the cache)"""
+        cache_key = None
+        if self.circuit_cache is not None:
+            cache_key = self.circuit_cache_key()
+            cached_circuit = self.circuit_cache.load(cache_key)
+            if cached_circuit is not None:
+                self.master_circuit = cached_circuit
+                return self.master_circuit
+
+        # prepare entire diffusion circuit based on flagged conditions (see ITERATION_SCHEDULE)
+        for oracle_magic_number in self.iteration_schedule:
+            self.q_prepare_iteration(oracle_magic_number)
 
         self.master_circuit.measure(self.board_moves_qbit_register[0:len(self.results_register)], self.results_register)
-        self.__schedule_job_locally()
+        if cache_key is not None:
+            # stored as assembled, not transpiled - Aer runs native multi-controlled gates several times faster
+            # than their basis-gate decomposition, and transpiling alone takes longer than building from scratch
+            self.circuit_cache.store(cache_key, self.master_circuit)
+        return self.master_circuit
+
+    def run_master_circuit(self, shots=10000, seed_simulator=None) -> dict:
+        """simulate already assembled master circuit, counts are stored in the bot as well"""
+        return self.__schedule_job_locally(shots, seed_simulator)
+
+    def calculate_recommendations(
+            self, valid_moves_list: MOVES_LIST_TYPEHINT, board: BOARD_TYPEHINT, shots=10000,
+            deadline: float | None = None, board_maps: tuple[dict, dict] | None = None):
+        """
+        flag possible states, execute entire subcircuit creation, schedule a job and get results
+
+        :param deadline: seconds the reply has to be ready in, the cheapest engine that fits is picked
+            (see `LatencyScheduler`); None means always full circuit with all the shots
+        :param board_maps: see `prepare_flagged_states`
+        """
+        if deadline is not None:
+            if self.latency_scheduler is None:
+                self.latency_scheduler = LatencyScheduler(self, book=self.book)
+            self.latency_scheduler.calculate_recommendations(valid_moves_list, board, deadline, shots, board_maps)
+            return
+        if self.q_tablebase_counts(valid_moves_list, board, shots) is not None:
+            self.last_engine = "tablebase"
+            return
+        self.prepare_flagged_states(valid_moves_list, board, board_maps)
+        if not self.check_resource_budget(shots):
+            self.last_engine = "classical"
+            self.q_classical_counts(shots)
+            return
+        self.q_assemble_master_circuit()
+        self.last_engine = "aer"
+        self.__schedule_job_locally(shots)
+
+    def stream_recommendations(
+            self, valid_moves_list: MOVES_LIST_TYPEHINT, board: BOARD_TYPEHINT, shots=10000, chunk_shots=1000,
+            chunk_growth: float = 2.0, exact_sampling: bool = False, board_maps: tuple[dict, dict] | None = None,
+            seed_simulator=None) -> Iterator[RecommendationResult]:
+        """
+        anytime version of `calculate_recommendations` - circuit is built once and its shots run in chunks, result
+        of all the shots so far is yielded after every chunk (its `confidence_intervals` say how settled it is).
+        Stop iterating to stop early: counts of the chunks done stay in the bot, so `parse_recommendations_*` and
+        `last_result` work with whatever was reached
+
+        every job simulates the whole statevector again, so chunks grow by `chunk_growth` - first estimate comes
+        after `chunk_shots`, while 10000 shots take 4 jobs instead of 10. `exact_sampling` computes the outcome
+        distribution once (`q_exact_probabilities`) and draws the chunks from it, no circuit gets built or run
+
+        tablebase and over the budget positions don't sample anything, their only result is yielded at once
+
+        :param seed_simulator: seed of the first chunk, the next ones take the following numbers
+        """
+        if self.q_tablebase_counts(valid_moves_list, board, shots) is not None:
+            self.last_engine = "tablebase"
+            yield self.recommendation_result()
+            return
+        self.prepare_flagged_states(valid_moves_list, board, board_maps)
+        if exact_sampling:
+            self.last_engine = "exact"
+            states = list(self.valid_moves_with_flags)
+            probabilities = np.array(list(self.q_exact_probabilities().values()))
+            generator = np.random.default_rng(seed_simulator)
+        elif not self.check_resource_budget(shots):
+            self.last_engine = "classical"
+            self.q_classical_counts(shots)
+            yield self.recommendation_result()
+            return
+        else:
+            self.q_assemble_master_circuit()
+            self.last_engine = "aer"
+
+        counts = Counter()
+        done = 0
+        chunk_index = 0
+        while done < shots:
+            chunk = min(int(chunk_shots * chunk_growth ** chunk_index), shots - done)
+            if exact_sampling:
+                # states that are not a move take the rest of the probability
+                drawn = generator.multinomial(chunk, [*probabilities, max(0.0, 1 - probabilities.sum())])
+                counts.update(dict(zip(states, drawn[:-1].tolist())))
+            else:
+                chunk_seed = None if seed_simulator is None else seed_simulator + chunk_index
+                counts.update(self.simulator_backend.run([self.master_circuit], chunk, chunk_seed)[0])
+            done += chunk
+            chunk_index += 1
+            self.counts = dict(counts)
+            self.current_job_shots = done
+            yield self.recommendation_result()
+
+    def calculate_recommendations_batch(
+            self, positions: list[POSITION_TYPEHINT], shots=10000, seed_simulator=None) -> list[list]:
+        """
+        build circuits for several positions and run all of them as one simulator job
+
+        :param positions: list of (valid_moves, board, side to move) entries, the bot takes the side of the player
+            that is about to move in each of them
+        :returns: list of recommendations, one per position, in the same format as `parse_recommendations_bot_use`
+        """
+        previous_side_info = self.player_identifier, self.direction, self.enemy
+        circuits = []
+        flagged_states = []
+        circuit_indices = []  # None for positions over the budget, these go through classical engine
+        tablebase_counts = []  # counts of positions solved by the tablebase, None for all the others
+        for valid_moves, board, side in positions:
+            self.update_current_side(side)
+            tablebase_counts.append(self.q_tablebase_counts(valid_moves, board, shots))
+            if tablebase_counts[-1] is not None:
+                flagged_states.append(self.valid_moves_with_flags)
+                circuit_indices.append(None)
+                continue
+            flagged_states.append(self.prepare_flagged_states(valid_moves, board))
+            if self.check_resource_budget(shots):
+                circuit_indices.append(len(circuits))
+                circuits.append(self.q_assemble_master_circuit())
+            else:
+                circuit_indices.append(None)
+        self.update_current_player_info(*previous_side_info)
+
+        results = None
+        if circuits:
+            results = self.simulator_backend.run(circuits, shots, seed_simulator)
+        recommendations = []
+        for circuit_index, states, counts in zip(circuit_indices, flagged_states, tablebase_counts):
+            self.valid_moves_with_flags = states
+            if counts is not None:
+                self.counts = counts
+                self.current_job_shots = shots
+            elif circuit_index is None:
+                self.q_classical_counts(shots)
+            else:
+                self.counts = results[circuit_index]
+                self.current_job_shots = shots
+            recommendations.append(self.parse_recommendations_bot_use())
+        return recommendations
+
+    def recommendation_result(self) -> RecommendationResult:
+        """
+        counts of the current job turned into a `RecommendationResult` - built once per job, `parse_recommendations_*`
+        methods share it
+        """
+        source = (self.counts, self.valid_moves_with_flags, self.current_job_shots)
+        previous = self._last_result_source
+        if previous is None or previous[0] is not source[0] or previous[1] is not source[1] or previous[2] != source[2]:
+            self.last_result = RecommendationResult.from_counts(
+                self.valid_moves_with_flags, self.counts, self.current_job_shots)
+            self._last_result_source = source
+        return self.last_result
+
+    def recommendation_state(self) -> dict:
+        """current recommendations with everything they were made of, for `restore_recommendation_state`"""
+        return {
+            "valid_moves_with_flags": self.valid_moves_with_flags,
+            "counts": self.counts,
+            "current_job_shots": self.current_job_shots,
+            "last_engine": self.last_engine,
+            "result": self.recommendation_result(),
+        }
+
+    def restore_recommendation_state(self, state: dict):
+        """take over recommendations of `recommendation_state` (of this bot or another one, e.g. a pondering one)"""
+        self.valid_moves_with_flags = state["valid_moves_with_flags"]
+        self.counts = state["counts"]
+        self.current_job_shots = state["current_job_shots"]
+        self.last_engine = state["last_engine"]
+        self.last_result = state["result"]
+        self._last_result_source = (self.counts, self.valid_moves_with_flags, self.current_job_shots)
 
     def parse_recommendations_bot_use(self):  # true return type: list[list[tuple[int, int, int, int], float]]
         """when counts are obtained, prepare percentage based recommendations for moves, and sort
@@ -459,31 +939,13 @@ class QuantumBot:
 
         percentage chance is given in the 0.XXX format here
         """
-        total_counts_accumulated = 0
-        moves_recommended = []
-        for state in self.valid_moves_with_flags:
-            move = self.valid_moves_with_flags[state][0]
-            try:
-                counts = self.counts[state]
-            except KeyError:  # 0 counts because there was no chance for the state to emerge
-                counts = 0
-            total_counts_accumulated += counts
-            self.valid_moves_with_flags[state][-1] = counts
-            moves_recommended.append([move, counts])
-
-        if len(self.valid_moves_with_flags) == 0:
-            return moves_recommended
+        return self.recommendation_result().bot_use()
 
-        total_counts_accumulated = (
-           self.current_job_shots - total_counts_accumulated) // len(self.valid_moves_with_flags)
-        for rec_ in moves_recommended:
-            rec_[-1] += total_counts_accumulated
-            rec_[-1] /= self.current_job_shots
+    def parse_recommendations_packed(self):  # true return type: list[list[int, float]]
+        """`parse_recommendations_bot_use` with moves left packed (see `packed_moves`), for batch workloads"""
+        return self.recommendation_result().packed()
 
-        moves_recommended.sort(key=lambda rec_: -rec_[-1])
-        return moves_recommended
-
-    def parse_recommendations_human_readable(self):
+    def parse_recommendations_human_readable(self, intervals: bool = False):
         """
         when counts are obtained, prepare percentage based recommendations for moves, and sort
         them based on that key
@@ -494,40 +956,15 @@ class QuantumBot:
 
         these columns are read like this: quantum state identifier, corresponding human-readable move format,
             percentage chance of the bot picking this move (XX.XX%)
+
+        rows are a lazy sequence (`PredictionRows`), text of a row is made only once something reads it
+
+        :param intervals: probabilities with ± half width of their confidence interval, for partial results
         """
-        print(self.counts)
-        total_counts_accumulated = 0
-        moves_recommended = []
         if self.valid_moves_with_flags is None:
             self.human_readable_predictions = []
-
-        for state in self.valid_moves_with_flags:
-            move = self.valid_moves_with_flags[state][0]
-            human_state = "|" + state + ">"
-            human_move = self.human_readable_move_format(move)
-            if state not in self.counts:
-                counts = 0
-            else:
-                counts = self.counts[state]
-            total_counts_accumulated += counts
-            moves_recommended.append([human_state, human_move, counts])
-
-        moves_recommended.sort(key=lambda rec_: -rec_[-1])
-
-        if len(self.valid_moves_with_flags) == 0:
-            self.human_readable_predictions = moves_recommended
             return
-
-        total_counts_accumulated = (
-           self.current_job_shots - total_counts_accumulated) // len(self.valid_moves_with_flags)
-        for rec_ in moves_recommended:
-            rec_[-1] += total_counts_accumulated
-            fixed_counts = int(rec_[-1] * 10000 / self.current_job_shots)
-            minor = f"{fixed_counts%100}".zfill(2)
-            human_percentage = f"{fixed_counts//100:2}.{minor}%"
-            rec_[-1] = human_percentage
-
-        self.human_readable_predictions = moves_recommended
+        self.human_readable_predictions = self.recommendation_result().human_readable(intervals)
 
     def __draw_master_circuit(self):
         """just don't :D"""
@@ -546,7 +983,6 @@ class QuantumBot:
 
 # Example Usage
 if __name__ == '__main__':
-    from game_logic import CheckersGame
     c_game = CheckersGame()
     # board = [[0 for _ in range(8)] for _ in range(8)]  # 8x8 board example
     temporary_board = [
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import re
+import struct
+import tempfile
+
+from qiskit import QuantumCircuit, qpy
+from qiskit.exceptions import QiskitError
+
+
+class CircuitCache:
+    """
+    Persistent directory of assembled circuits serialized with QPY, shared by every process pointing at it.
+
+    layout:
+        <directory>/<version>/<structural key>.qpy
+
+    `version` should change whenever circuit builder code changes (see `QuantumBot.circuit_builder_version`), so
+    stale circuits are never served. Version directories the cache creates get a `MARKER_FILE`; directories of
+    other versions are only removed on an explicit `purge_other_versions` call - processes of different
+    qiskit/Aer versions can share the directory, and anything else in it is never touched.
+
+    writes go to a temporary file in the same directory and are then atomically renamed into place, so concurrent
+    workers either see a complete entry or none at all (two workers compiling the same circuit is harmless, last
+    rename wins). Loading an entry touches its modification time, which is what the LRU cleanup sorts by when
+    total size goes over `max_bytes`. An entry that can't be read back (truncated, corrupted, QPY version this
+    qiskit doesn't support) counts as a miss and is removed, so the circuit gets built and stored again.
+    """
+    FILE_SUFFIX = ".qpy"
+    TEMPORARY_SUFFIX = ".tmp"
+    MARKER_FILE = ".circuit-cache"
+    VERSION_PATTERN = re.compile(r"^[0-9a-f]{8,64}$")  # hex digest, see `QuantumBot.circuit_builder_version`
+
+    def __init__(self, directory: str | os.PathLike, version: str, max_bytes: int = 256 * 1024 * 1024):
+        """:raises ValueError: version is not a hex digest"""
+        if not self.VERSION_PATTERN.match(version):
+            raise ValueError(f"cache version should be a hex digest (8 to 64 characters), got {version!r}")
+        self.directory = directory
+        self.version = version
+        self.max_bytes = max_bytes
+        self.version_directory = os.path.join(directory, version)
+        os.makedirs(self.version_directory, exist_ok=True)
+        marker_path = os.path.join(self.version_directory, self.MARKER_FILE)
+        if not os.path.exists(marker_path):
+            with open(marker_path, "w") as marker_file:
+                marker_file.write(version)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def structural_key(**structure) -> str:
+        """hash of everything circuit shape depends on, values have to be JSON serializable"""
+        serialized = json.dumps(structure, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.version_directory, key + self.FILE_SUFFIX)
+
+    def contains(self, key: str) -> bool:
+        """entry is there (it can still get removed by cleanup of another process before it's loaded)"""
+        return os.path.exists(self._path(key))
+
+    def load(self, key: str) -> QuantumCircuit | None:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as circuit_file:
+                circuit = qpy.load(circuit_file)[0]
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        # QpyError is a QiskitError, unsupported QPY versions raise QiskitError itself; truncated files run out of
+        # bytes in struct/EOF errors
+        except (QiskitError, EOFError, ValueError, struct.error, IndexError):
+            self.misses += 1
+            try:
+                os.remove(path)
+            except FileNotFoundError:  # other worker got there first
+                pass
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:  # removed by cleanup of another process in the meantime, still fine to use
+            pass
+        self.hits += 1
+        return circuit
+
+    def store(self, key: str, circuit: QuantumCircuit):
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.version_directory, suffix=self.TEMPORARY_SUFFIX)
+        try:
+            with os.fdopen(file_descriptor, "wb") as circuit_file:
+                qpy.dump(circuit, circuit_file)
+                circuit_file.flush()
+                os.fsync(circuit_file.fileno())
+            os.replace(temporary_path, self._path(key))
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        self.cleanup()
+
+    def cleanup(self):
+        """remove least recently used entries until cache fits into `max_bytes`"""
+        entries = []
+        total_size = 0
+        for entry in os.scandir(self.version_directory):
+            if not entry.name.endswith(self.FILE_SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:  # other worker got there first
+                pass
+            total_size -= size
+
+    def purge_other_versions(self) -> int:
+        """
+        remove entries of other versions - only from directories with a version name and the marker (created by
+        this class), only files the cache writes; a directory is removed once nothing else is left in it
+
+        :returns: number of version directories emptied
+        """
+        purged = 0
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir(follow_symlinks=False) or entry.name == self.version \
+                    or not self.VERSION_PATTERN.match(entry.name) \
+                    or not os.path.isfile(os.path.join(entry.path, self.MARKER_FILE)):
+                continue
+            for cache_file in os.scandir(entry.path):
+                if cache_file.is_file(follow_symlinks=False) and (
+                        cache_file.name.endswith((self.FILE_SUFFIX, self.TEMPORARY_SUFFIX))
+                        or cache_file.name == self.MARKER_FILE):
+                    try:
+                        os.remove(cache_file.path)
+                    except FileNotFoundError:
+                        pass
+            try:
+                os.rmdir(entry.path)
+            except OSError:  # something that is not ours stays there, so does the directory
+                continue
+            purged += 1
+        return purged
@@ -0,0 +1,296 @@
+import functools
+import itertools
+from array import array
+from collections.abc import Callable
+
+import numpy as np
+
+from game_logic import CheckersGame
+from packed_moves import CAPTURE_FLAG, DTYPE, SQUARE_BITS, SQUARE_MASK
+
+BOARD_TYPEHINT = list[list[str]]
+
+# cell codes of `MoveFeatures.cells`
+EMPTY = 0
+OWN = 1
+ENEMY = 2
+OFF_BOARD = 3
+# square index past the edge of the board, `MoveFeatures.cells` has one extra OFF_BOARD cell there - lookups
+# through `NEIGHBOURS` and `JUMPS` need no bounds checks
+PAST_EDGE = 64
+
+
+def _square_steps(distance: int) -> np.ndarray:
+    """(64, 4) square `distance` diagonal steps away, per square and `CheckersGame.DIAGONALS` index"""
+    return np.array(
+        [[(row + row_step * distance) * 8 + col + col_step * distance
+          if 0 <= row + row_step * distance <= 7 and 0 <= col + col_step * distance <= 7 else PAST_EDGE
+          for row_step, col_step in CheckersGame.DIAGONALS] for row in range(8) for col in range(8)], dtype=np.int64)
+
+
+def _move_fields() -> np.ndarray:
+    """`MOVE_FIELDS` row of every 13 bit code (junk for codes no move packs into)"""
+    packed = np.arange(CAPTURE_FLAG << 1, dtype=np.int64)
+    start, end = packed >> SQUARE_BITS & SQUARE_MASK, packed & SQUARE_MASK
+    capture = (packed & CAPTURE_FLAG != 0).astype(np.int64)
+    start_row, start_col, end_row, end_col = start // 8, start % 8, end // 8, end % 8
+    diagonal = (end_row > start_row) * 2 + (end_col > start_col)
+    captured = np.where(capture, (start + end) // 2, end)
+    return np.stack([start, end, start_row, start_col, end_row, end_col, capture, diagonal, 1 << diagonal,
+                     1 << (3 - diagonal), captured], axis=1)
+
+
+NEIGHBOURS = _square_steps(1)
+JUMPS = _square_steps(2)
+EDGE_MASKS = np.array(CheckersGame.EDGE_MASKS, dtype=np.int64).ravel()
+CENTRE_COLUMNS = (2, 5)
+# everything `MoveFeatures` needs about a move, looked up by its packed code - one indexing per position
+# columns: start, end, start row, start col, end row, end col, capture, diagonal (index in `CheckersGame.DIAGONALS`
+# the move goes along), step bit and back bit (its bit and the opposite one), captured (square of the beaten piece,
+# end square for plain moves)
+MOVE_FIELDS = _move_fields()
+# board cell (as a byte) -> code, per side to move; "G" hints are empty
+PAST_EDGE_CELL = "#"
+CELL_CODES = {}
+for _side, _enemy in [(CheckersGame.PLAYER_1_COLOR, CheckersGame.PLAYER_2_COLOR),
+                      (CheckersGame.PLAYER_2_COLOR, CheckersGame.PLAYER_1_COLOR)]:
+    CELL_CODES[_side] = np.full(256, EMPTY, dtype=np.int64)
+    CELL_CODES[_side][ord(_side)] = OWN
+    CELL_CODES[_side][ord(_enemy)] = ENEMY
+    CELL_CODES[_side][ord(PAST_EDGE_CELL)] = OFF_BOARD
+
+
+class MoveFeatures:
+    """
+    Per move arrays (one entry per move, in the order of moves) that condition functions are written over.
+
+    computed once per position and shared by all the conditions - flagging is one pass of array expressions over
+    all moves at once instead of a loop over moves per condition. Board and board maps are turned into arrays
+    only when some condition asks for them (cached properties).
+    """
+    # arrays with one entry per move, the ones `take` picks from
+    PER_MOVE = ("moves", "start", "end", "start_row", "start_col", "end_row", "end_col", "capture", "diagonal",
+                "step_bit", "back_bit", "captured")
+
+    def __init__(self, packed_moves: array, board: BOARD_TYPEHINT, side: str, enemy: str, direction: int,
+                 board_maps: tuple[dict, dict]):
+        self.board = board
+        self.side = side
+        self.enemy = enemy
+        self.direction = direction
+        self.board_maps = board_maps
+
+        self.moves = moves = \
+            np.frombuffer(packed_moves, dtype=DTYPE) if len(packed_moves) else np.zeros(0, dtype=DTYPE)
+        (self.start, self.end, self.start_row, self.start_col, self.end_row, self.end_col, capture, self.diagonal,
+         self.step_bit, self.back_bit, self.captured) = MOVE_FIELDS[moves].T
+        self.capture = capture != 0
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    def take(self, indices: list[int]) -> "MoveFeatures":
+        """same position, only moves at `indices` - board arrays converted so far are shared, not converted again"""
+        subset = object.__new__(MoveFeatures)
+        subset.__dict__.update(self.__dict__)
+        for name in self.PER_MOVE:
+            setattr(subset, name, getattr(self, name)[indices])
+        return subset
+
+    @functools.cached_property
+    def cells(self) -> np.ndarray:
+        """(65,) EMPTY / OWN / ENEMY, "G" hints are empty, last one is the OFF_BOARD cell at PAST_EDGE"""
+        cells = "".join(map("".join, self.board)) + PAST_EDGE_CELL
+        cells = np.frombuffer(cells.encode("ascii"), dtype=np.uint8)
+        return CELL_CODES[self.side][cells]
+
+    def _map(self, index: int, side: str) -> np.ndarray:
+        return np.fromiter(itertools.chain.from_iterable(self.board_maps[index][side]), dtype=np.int64, count=64)
+
+    @functools.cached_property
+    def own_defence(self) -> np.ndarray:
+        return self._map(1, self.side)
+
+    @functools.cached_property
+    def enemy_attack(self) -> np.ndarray:
+        return self._map(0, self.enemy)
+
+    @functools.cached_property
+    def enemy_defence(self) -> np.ndarray:
+        return self._map(1, self.enemy)
+
+    @functools.cached_property
+    def behind(self) -> int:
+        """diagonal bits pointing back, against the direction of the side"""
+        return sum(bit for (row_step, _), bit in CheckersGame.DIAGONAL_BITS.items() if row_step == -self.direction)
+
+
+CONDITION_TYPEHINT = Callable[[MoveFeatures], np.ndarray]
+# name -> feature function: `MoveFeatures` in, array of 0/1 (or bool) per move out
+CONDITIONS: dict[str, CONDITION_TYPEHINT] = {}
+# name -> inputs function: `MoveFeatures` in, (moves, k) array of everything the condition reads per move out
+# (besides the move itself and the side) - see `ConditionCache`
+CONDITION_READS: dict[str, CONDITION_TYPEHINT] = {}
+
+
+def register_condition(name: str, reads: CONDITION_TYPEHINT | None = None):
+    """
+    decorator, adds a feature function into `CONDITIONS` - bot picks conditions by name
+
+    :param reads: what the condition reads per move (map entries, cells around the move...), its flag is cached
+        between turns while these stay the same; None - condition is evaluated every time
+    """
+    def decorator(function: CONDITION_TYPEHINT) -> CONDITION_TYPEHINT:
+        if name in CONDITIONS:
+            raise ValueError(f"condition {name!r} is registered already")
+        CONDITIONS[name] = function
+        if reads is not None:
+            CONDITION_READS[name] = reads
+        return function
+    return decorator
+
+
+def move_only(features: MoveFeatures) -> np.ndarray:
+    """`reads` of conditions that depend on the move alone, nothing on the board"""
+    return np.zeros((len(features), 0), dtype=np.int64)
+
+
+@register_condition("piece_shielded", reads=lambda features: features.own_defence[features.end])
+def piece_shielded(features: MoveFeatures) -> np.ndarray:
+    """
+    own piece (or board edge) 1 to the side and 1 row BEHIND the piece after the move - prevents overextending;
+    the square the piece came from does not count, it is empty after the move
+    """
+    defenders = features.own_defence[features.end] | EDGE_MASKS[features.end]
+    return (defenders & features.behind & ~features.back_bit) != 0
+
+
+@register_condition("moves_to_be_beaten", reads=lambda features: np.stack(
+    [features.enemy_attack[features.end], features.enemy_defence[features.end]], axis=1))
+def moves_to_be_beaten(features: MoveFeatures) -> np.ndarray:
+    """
+    inverted logic - flagged when the moved piece can NOT be beaten right after the move
+
+    map is of the board before the move, two things change once it is made: enemy right ahead (in the direction
+    of the move) can jump back onto the square the piece came from (or onto the beaten piece's square), these are
+    empty after the move whatever the map says; beaten piece itself (right behind) is gone, it attacks no more
+    """
+    attackers = features.enemy_attack[features.end] & ~features.step_bit | \
+        features.enemy_defence[features.end] & features.step_bit
+    return attackers == 0
+
+
+@register_condition("can_beat", reads=move_only)
+def can_beat(features: MoveFeatures) -> np.ndarray:
+    """beating an enemy piece"""
+    return features.capture
+
+
+@register_condition("escapes_attack", reads=lambda features: features.enemy_attack[features.start])
+def escapes_attack(features: MoveFeatures) -> np.ndarray:
+    """piece moves away from a square where enemy could beat it"""
+    return features.enemy_attack[features.start] != 0
+
+
+@register_condition("follow_up_capture", reads=lambda features: np.concatenate(
+    [features.cells[NEIGHBOURS[features.end]], features.cells[JUMPS[features.end]]], axis=1))
+def follow_up_capture(features: MoveFeatures) -> np.ndarray:
+    """
+    piece can beat on its next move - enemy next to its new square with an empty square behind it
+
+    board before the move is read, with what the move changes: beaten piece is gone, the square the piece came
+    from and the beaten piece's square are empty
+    """
+    over, landing = NEIGHBOURS[features.end], JUMPS[features.end]  # (moves, 4)
+    cells = features.cells
+    captured, start = features.captured[:, None], features.start[:, None]
+    enemy_over = (cells[over] == ENEMY) & (over != captured)
+    empty_landing = (cells[landing] == EMPTY) | (landing == start) | (landing == captured)
+    return (enemy_over & empty_landing).any(axis=1)
+
+
+@register_condition("keeps_home_row", reads=move_only)
+def keeps_home_row(features: MoveFeatures) -> np.ndarray:
+    """piece that moves is not one of those guarding the home row (the row the side started from)"""
+    home_row = 7 if features.direction < 0 else 0
+    return features.start_row != home_row
+
+
+@register_condition("centre_control", reads=move_only)
+def centre_control(features: MoveFeatures) -> np.ndarray:
+    """move ends in one of the centre columns"""
+    return (features.end_col >= CENTRE_COLUMNS[0]) & (features.end_col <= CENTRE_COLUMNS[1])
+
+
+# order the bot takes conditions in when it gets only their number, first three are the original ones
+DEFAULT_CONDITIONS = [
+    "piece_shielded", "moves_to_be_beaten", "can_beat", "escapes_attack", "follow_up_capture", "keeps_home_row",
+    "centre_control",
+]
+
+
+def evaluate_conditions(features: MoveFeatures, names: list[str]) -> np.ndarray:
+    """(moves, conditions) uint8 flags, every condition evaluated over all the moves at once"""
+    flags = np.zeros((len(features), len(names)), dtype=bool)
+    for column, name in enumerate(names):
+        flags[:, column] = CONDITIONS[name](features)
+    return flags.view(np.uint8)
+
+
+class ConditionCache:
+    """
+    Flags of single moves kept across turns, per (condition, side, direction): what the condition read for the
+    move last time and the flag it gave, in arrays indexed by packed move code.
+
+    between turns only a few squares change, so most moves read the same map entries and cells as last time and
+    keep their flags - `evaluate` runs each condition only over the other moves (`MoveFeatures.take`). Conditions
+    registered without `reads` are evaluated in full every time. One entry per condition, side and move code, so
+    it stays bounded. With `verify` on, flags of every hit are checked against full recomputation and
+    RuntimeError is raised on mismatch.
+
+    pays off for expensive conditions only - built-in ones are a map lookup per move, checking their inputs costs
+    about as much as evaluating them
+    """
+
+    def __init__(self, verify: bool = False):
+        # (condition, side, direction) -> (inputs per move code, flag per move code, move code seen)
+        self.tables: dict[tuple[str, str, int], tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.verify = verify
+
+    def evaluate(self, features: MoveFeatures, names: list[str]) -> np.ndarray:
+        """same as `evaluate_conditions`, with flags of moves whose inputs didn't change taken from the cache"""
+        flags = np.zeros((len(features), len(names)), dtype=bool)
+        moves = features.moves
+        if not len(moves):
+            return flags.view(np.uint8)
+        for column, name in enumerate(names):
+            reads = CONDITION_READS.get(name)
+            if reads is None:
+                flags[:, column] = CONDITIONS[name](features)
+                continue
+            inputs = np.asarray(reads(features), dtype=np.int64).reshape(len(moves), -1)
+            key = (name, features.side, features.direction)
+            if key not in self.tables:
+                self.tables[key] = (np.zeros((len(MOVE_FIELDS), inputs.shape[1]), dtype=np.int64),
+                                    np.zeros(len(MOVE_FIELDS), dtype=bool), np.zeros(len(MOVE_FIELDS), dtype=bool))
+            stored_inputs, stored_flags, seen = self.tables[key]
+            flags[:, column] = stored_flags[moves]
+            missed = np.flatnonzero(~(seen[moves] & (stored_inputs[moves] == inputs).all(axis=1)))
+            self.hits += len(moves) - len(missed)
+            self.misses += len(missed)
+            if len(missed):
+                computed = np.asarray(CONDITIONS[name](features.take(missed)), dtype=bool)
+                flags[missed, column] = computed
+                missed_moves = moves[missed]
+                stored_inputs[missed_moves] = inputs[missed]
+                stored_flags[missed_moves] = computed
+                seen[missed_moves] = True
+            if self.verify and len(missed) < len(moves):
+                expected = np.asarray(CONDITIONS[name](features), dtype=bool)
+                wrong = np.flatnonzero(flags[:, column] != expected)
+                if len(wrong):
+                    raise RuntimeError(f"cached {name} flags of moves {moves[wrong].tolist()} differ from "
+                                       f"full recomputation")
+        return flags.view(np.uint8)
@@ -0,0 +1,174 @@
+import json
+import os
+import random
+import time
+from math import floor, log2
+
+import numpy as np
+
+BYTES_PER_AMPLITUDE = 16  # complex128 statevector entry
+
+
+class ResourceBudgetExceeded(RuntimeError):
+    """simulation would need more memory or time than the bot is allowed to use"""
+
+
+class CostModel:
+    """
+    Predicts how expensive a recommendation job will be, before anything gets built or simulated.
+
+    gate count is worked out from the same formulas that circuit builders use (registers, flags, schedule),
+    big multi-controlled gates are weighted by how many simple gates their synthesis roughly unrolls into.
+    Statevector simulation touches every amplitude for each gate, so expected time is modeled as:
+
+        seconds = overhead_seconds + seconds_per_gate_amplitude * gates * 2^qubits + seconds_per_shot * shots
+
+    and memory as a single statevector of 2^qubits complex amplitudes. Default coefficients are just rough
+    orders of magnitude - run `calibrate` (`python cost_model.py`) on the target machine to fit real ones.
+    """
+    DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cost_model.json")
+
+    def __init__(self, overhead_seconds: float = 0.02, seconds_per_gate_amplitude: float = 2e-9,
+                 seconds_per_shot: float = 1e-6, depth_per_gate: float = 0.9):
+        self.overhead_seconds = overhead_seconds
+        self.seconds_per_gate_amplitude = seconds_per_gate_amplitude
+        self.seconds_per_shot = seconds_per_shot
+        self.depth_per_gate = depth_per_gate
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_PATH):
+        """calibrated model if the file exists, default one otherwise"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as model_file:
+            return cls(**json.load(model_file))
+
+    def save(self, path: str = DEFAULT_PATH):
+        with open(path, "w") as model_file:
+            json.dump(self.__dict__, model_file, indent=2)
+
+    @staticmethod
+    def mcx_gate_weight(strategy: str, num_controls: int) -> int:
+        """rough number of simulator operations a single n-controlled X turns into"""
+        if strategy == "default" or num_controls <= 2:
+            return 1  # Aer applies MCX natively
+        if strategy == "noancilla":
+            return num_controls ** 2
+        if strategy == "recursion":
+            return 8 * num_controls
+        if strategy == "v-chain":
+            return 2 * (num_controls - 2) + 1
+        return 4 * (num_controls - 2)  # v-chain-dirty
+
+    @classmethod
+    def count_gates(cls, bot, flags_count: int | None = None, zero_bits_count: int | None = None) -> int:
+        """
+        number of (weighted) gates of the full circuit, registers of the bot have to be allocated already
+
+        :param flags_count: number of flagged (state, condition) pairs, taken from `bot.valid_moves_with_flags`
+            when not given (worst case - every condition of every move - when there are no flags yet)
+        :param zero_bits_count: number of X gates around the flagged states, estimated as half of the bits if unknown
+        """
+        board_size = len(bot.board_moves_qbit_register)
+        move_alloc = len(bot.results_register)
+        adder_size = len(bot.quantum_adder_register)
+        states = bot.valid_moves_with_flags
+        if flags_count is None:
+            if states:
+                flags_count = sum(sum(row[1:-1]) for row in states.values())
+                zero_bits_count = sum(state.count("0") * sum(row[1:-1]) for state, row in states.items())
+            else:
+                flags_count = (2 ** move_alloc) * bot.number_of_conditions
+        if zero_bits_count is None:
+            zero_bits_count = flags_count * move_alloc // 2
+
+        mcx_weight = cls.mcx_gate_weight(bot.mcx_strategy, board_size)
+        condition_check = flags_count * mcx_weight + 2 * zero_bits_count
+        adder = sum(floor(log2(index + 1)) + 1 for index in range(bot.number_of_conditions))
+        adder_check = 2 * (adder_size + 1) + 1
+        diffusion = 4 * board_size + 2 + cls.mcx_gate_weight(bot.mcx_strategy, board_size - 1)
+
+        total = board_size + move_alloc  # initial hadamards and measurement
+        for oracle_magic_number in bot.iteration_schedule:
+            total += 2 * condition_check + 2 * adder + diffusion
+            total += max(0, bot.number_of_conditions + 1 - oracle_magic_number) * adder_check
+        return total
+
+    @staticmethod
+    def count_qubits(bot) -> int:
+        return sum(len(register) for register in bot._q_all_registers())
+
+    def estimate(self, bot, shots: int = 10000, flags_count: int | None = None) -> dict:
+        """qubits, gates, depth, memory and expected simulation time for the registers currently allocated in bot"""
+        qubits = self.count_qubits(bot)
+        gates = self.count_gates(bot, flags_count)
+        return {
+            "qubits": qubits,
+            "gates": gates,
+            "depth": int(gates * self.depth_per_gate),
+            "memory_bytes": BYTES_PER_AMPLITUDE * 2 ** qubits,
+            "seconds": self.overhead_seconds + self.seconds_per_gate_amplitude * gates * 2 ** qubits
+                       + self.seconds_per_shot * shots,
+        }
+
+    def estimate_for_moves(self, bot, moves_count: int, shots: int = 10000) -> dict:
+        """worst case estimate knowing only number of moves (and bot configuration)"""
+        previous_states = bot.valid_moves_with_flags
+        bot.q_allocate_registers(moves_count)
+        bot.valid_moves_with_flags = None
+        try:
+            return self.estimate(bot, shots)
+        finally:
+            bot.valid_moves_with_flags = previous_states
+
+
+def calibrate(moves_counts=(2, 3, 4, 6, 8, 12, 16), shots_list=(1000, 10000), number_of_conditions: int = 3,
+              mcx_strategy: str = "default", seed: int = 0, verbose: bool = True) -> CostModel:
+    """
+    scaling sweep - build and simulate real circuits of growing size on this machine and fit `CostModel` to them
+    """
+    from qiskit_aer.backends import AerSimulator
+    from bot_logic import QuantumBot
+
+    generator = random.Random(seed)
+    simulator = AerSimulator()
+    simulator.run(QuantumBot(1).prepare_circuit_for_flags([[1]]), shots=1).result()  # warm-up
+
+    samples = []
+    depth_ratios = []
+    for moves_count in moves_counts:
+        bot = QuantumBot(number_of_conditions, mcx_strategy=mcx_strategy)
+        flag_rows = [[generator.randint(0, 1) for _ in range(number_of_conditions)] for _ in range(moves_count)]
+        circuit = bot.prepare_circuit_for_flags(flag_rows)
+        gates = CostModel.count_gates(bot)
+        qubits = CostModel.count_qubits(bot)
+        depth_ratios.append(circuit.depth() / gates)
+        for shots in shots_list:
+            start = time.perf_counter()
+            simulator.run(circuit, shots=shots, seed_simulator=seed).result()
+            samples.append((gates * 2 ** qubits, shots, time.perf_counter() - start, moves_count, qubits))
+
+    # least squares over [1, gates * 2^qubits, shots] -> [overhead, per gate-amplitude, per shot]
+    features = np.array([[1.0, work, shots] for work, shots, *_ in samples])
+    measured = np.array([seconds for _, _, seconds, *_ in samples])
+    coefficients, *_ = np.linalg.lstsq(features, measured, rcond=None)
+    coefficients = np.maximum(coefficients, 0.0)  # negative coefficients only fit noise
+    model = CostModel(
+        overhead_seconds=float(coefficients[0]),
+        seconds_per_gate_amplitude=float(coefficients[1]),
+        seconds_per_shot=float(coefficients[2]),
+        depth_per_gate=float(sum(depth_ratios) / len(depth_ratios)),
+    )
+
+    if verbose:
+        print(f"{'moves':>5} | {'qubits':>6} | {'shots':>6} | {'measured s':>10} | {'predicted s':>11}")
+        for work, shots, seconds, moves_count, qubits in samples:
+            predicted = model.overhead_seconds + model.seconds_per_gate_amplitude * work + model.seconds_per_shot * shots
+            print(f"{moves_count:>5} | {qubits:>6} | {shots:>6} | {seconds:>10.4f} | {predicted:>11.4f}")
+    return model
+
+
+if __name__ == '__main__':
+    calibrated = calibrate()
+    calibrated.save()
+    print(f"saved into {CostModel.DEFAULT_PATH}: {calibrated.__dict__}")
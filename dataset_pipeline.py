@@ -0,0 +1,163 @@
+import json
+import os
+from itertools import islice
+
+from game_archive import GameArchive
+from game_logic import CheckersGame
+
+BOARD_TYPEHINT = list[list[str]]
+CHECKPOINT_TYPEHINT = dict[str, int]
+# (game_id, ply, board, side to move, valid moves, move that was actually played)
+POSITION_RECORD_TYPEHINT = tuple[int, int, BOARD_TYPEHINT, str, list, list]
+
+
+def stream_positions(archive: GameArchive, start_game_id: int = 0, start_ply: int = 0):
+    """
+    step 1 of the pipeline - replay stored games through `CheckersGame.execute_move` and yield every position
+    in which the side to move had to make a decision
+
+    only a single game is being replayed at a time, so memory does not depend on archive size
+
+    :param start_game_id: id of the game to resume from
+    :param start_ply: first ply of `start_game_id` that should be yielded, previous ones are replayed silently
+    """
+    game = CheckersGame()
+    for game_id, record in archive.iter_games(start_game_id):
+        game.reset_everything()
+        first_ply = start_ply if game_id == start_game_id else 0
+        for ply, move in enumerate(record["moves"]):
+            if ply >= first_ply:
+                game.calculate_current_valid_moves()
+                if game.packed_valid_moves:
+                    board_snapshot = [row[:] for row in game.board]
+                    yield game_id, ply, board_snapshot, game.current_player, game.packed_valid_moves, move
+            game.execute_move(*move)
+            game.switch_player()
+
+
+def batch_positions(positions, batch_size: int):
+    """step 2 of the pipeline - group positions into fixed size lists (the last one can be shorter)"""
+    if batch_size < 1:
+        raise ValueError("batch_size should be at least 1")
+    positions = iter(positions)
+    while True:
+        batch = list(islice(positions, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def evaluate_batches(batches, bot, shots=10000, seed_simulator=None):
+    """
+    step 3 of the pipeline - score every batch with a single simulator job
+
+    :returns: generator of (batch, recommendations) pairs, recommendations in `parse_recommendations_bot_use` format
+    """
+    for batch in batches:
+        recommendations = bot.calculate_recommendations_batch(
+            [(valid_moves, board, side) for _, _, board, side, valid_moves, _ in batch],
+            shots=shots, seed_simulator=seed_simulator
+        )
+        yield batch, recommendations
+
+
+class DatasetPipeline:
+    """
+    Re-score historical positions with current bot settings.
+
+    Wires the three generator steps together and keeps the output file and checkpoint in sync. After each batch,
+    results are appended (and flushed) to the output JSON-lines file, then checkpoint is atomically replaced.
+    Checkpoint also stores the size of output file it corresponds to, so on resume anything written after the last
+    checkpoint is truncated away and no position is ever scored twice.
+    """
+
+    def __init__(self, archive_path, output_path, checkpoint_path, bot, batch_size=16, shots=10000,
+                 seed_simulator=None):
+        self.archive = GameArchive(archive_path)
+        self.output_path = output_path
+        self.checkpoint_path = checkpoint_path
+        self.bot = bot
+        self.batch_size = batch_size
+        self.shots = shots
+        self.seed_simulator = seed_simulator
+
+    def load_checkpoint(self) -> CHECKPOINT_TYPEHINT:
+        """position to resume from, fresh checkpoint when there was none saved"""
+        if not os.path.exists(self.checkpoint_path):
+            return {"game_id": 0, "ply": 0, "output_size": 0, "positions_done": 0}
+        with open(self.checkpoint_path) as checkpoint_file:
+            return json.load(checkpoint_file)
+
+    def save_checkpoint(self, checkpoint: CHECKPOINT_TYPEHINT):
+        """write to temporary file first, then swap, so checkpoint is never half-written"""
+        temporary_path = f"{self.checkpoint_path}.tmp"
+        with open(temporary_path, "w") as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temporary_path, self.checkpoint_path)
+
+    @staticmethod
+    def format_result(position: POSITION_RECORD_TYPEHINT, recommendations: list) -> dict:
+        game_id, ply, _, side, _, played_move = position
+        return {
+            "game_id": game_id,
+            "ply": ply,
+            "side": side,
+            "played_move": list(played_move),
+            "recommendations": [[list(move), probability] for move, probability in recommendations],
+        }
+
+    def run(self, max_batches: int | None = None) -> CHECKPOINT_TYPEHINT:
+        """
+        process the archive starting at the saved checkpoint
+
+        :param max_batches: stop after this many batches (pipeline can be resumed later), None means run to the end
+        :returns: last saved checkpoint
+        """
+        checkpoint = self.load_checkpoint()
+        positions = stream_positions(self.archive, checkpoint["game_id"], checkpoint["ply"])
+        batches = batch_positions(positions, self.batch_size)
+        evaluated = evaluate_batches(batches, self.bot, self.shots, self.seed_simulator)
+        if max_batches is not None:
+            evaluated = islice(evaluated, max_batches)
+
+        with open(self.output_path, "ab") as output_file:
+            output_file.truncate(checkpoint["output_size"])
+            output_file.seek(checkpoint["output_size"])
+            for batch, recommendations in evaluated:
+                for position, recommendation in zip(batch, recommendations):
+                    line = json.dumps(self.format_result(position, recommendation), separators=(",", ":"))
+                    output_file.write(line.encode("utf-8") + b"\n")
+                output_file.flush()
+                os.fsync(output_file.fileno())
+
+                last_game_id, last_ply = batch[-1][0], batch[-1][1]
+                checkpoint = {
+                    "game_id": last_game_id,
+                    "ply": last_ply + 1,
+                    "output_size": output_file.tell(),
+                    "positions_done": checkpoint["positions_done"] + len(batch),
+                }
+                self.save_checkpoint(checkpoint)
+        return checkpoint
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    from bot_logic import QuantumBot
+
+    parser = ArgumentParser(description="re-score positions from a game archive with the quantum bot")
+    parser.add_argument("archive")
+    parser.add_argument("output")
+    parser.add_argument("--checkpoint", default=None, help="defaults to <output>.checkpoint")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--shots", type=int, default=10000)
+    parser.add_argument("--conditions", type=int, default=3)
+    args = parser.parse_args()
+
+    pipeline = DatasetPipeline(
+        args.archive, args.output, args.checkpoint or f"{args.output}.checkpoint",
+        QuantumBot(args.conditions), batch_size=args.batch_size, shots=args.shots
+    )
+    print(pipeline.run())
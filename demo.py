@@ -1,8 +1,10 @@
-# demo.py
+import sys
+
 from game_main import Game
 
 
 if __name__ == '__main__':
-    g_type = "pygame"
-    new_game = Game(g_type)
+    g_type = "console" if "--console" in sys.argv else "pygame"
+    # --stream: bot shots run in chunks of 1000 and its sidebar fills in while it is thinking
+    new_game = Game(g_type, ponder="--ponder" in sys.argv, stream_chunk_shots=1000 if "--stream" in sys.argv else None)
     new_game.main()
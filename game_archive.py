@@ -0,0 +1,69 @@
+import json
+import os
+
+MOVE_TYPEHINT = list[int, int, int, int] | tuple[int, int, int, int]
+GAME_RECORD_TYPEHINT = dict[str, list | str | None]
+
+
+class GameArchive:
+    """
+    Append-only storage of played games, kept as a JSON-lines file (one game per line).
+
+    Every game is identified by the byte offset its line starts at. This way the id is stable, unique, grows with
+    every appended game and lets us jump straight to the game without scanning the whole archive.
+
+    game record structure:
+        {"moves": [[start_row, start_col, end_row, end_col], ...], "winner": "R" | "B" | None, ...extra metadata}
+    moves are stored in the order they were played, starting from `CheckersGame.STARTING_BOARD` and
+    `CheckersGame.STARTING_PLAYER`
+    """
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = path
+
+    def append_game(self, moves: list[MOVE_TYPEHINT], winner: str | None = None, **metadata) -> int:
+        """write the game at the end of the archive, returns id of the game"""
+        record = {"moves": [list(move) for move in moves], "winner": winner, **metadata}
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with open(self.path, "ab") as archive_file:
+            game_id = archive_file.seek(0, os.SEEK_END)
+            archive_file.write(line.encode("utf-8"))
+        return game_id
+
+    def read_game(self, game_id: int) -> GAME_RECORD_TYPEHINT:
+        """fetch single game, by its id (byte offset)"""
+        with open(self.path, "rb") as archive_file:
+            archive_file.seek(game_id)
+            return json.loads(archive_file.readline())
+
+    def iter_games(self, start_game_id: int = 0):
+        """
+        stream games one by one, never holding more than a single line in memory
+
+        :param start_game_id: id of the first game to yield, games before it are skipped without being parsed
+        :returns: generator of (game_id, game_record) pairs
+        """
+        for game_id, _, record in self.iter_game_spans(start_game_id):
+            yield game_id, record
+
+    def iter_game_spans(self, start_game_id: int = 0):
+        """same as `iter_games`, but every game also comes with id of the game that follows it (its end offset)"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as archive_file:
+            archive_file.seek(start_game_id)
+            while True:
+                game_id = archive_file.tell()
+                line = archive_file.readline()
+                if not line:
+                    break
+                if not line.endswith(b"\n"):  # partially written game, another process is still appending it
+                    break
+                if line.strip():
+                    yield game_id, game_id + len(line), json.loads(line)
+
+    def end_offset(self) -> int:
+        """id that the next appended game will get"""
+        if not os.path.exists(self.path):
+            return 0
+        return os.path.getsize(self.path)
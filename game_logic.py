@@ -1,6 +1,34 @@
 # game_logic.py
+import re
+from array import array
 from copy import deepcopy
 
+from packed_moves import TYPECODE, pack_move, pack_moves, unpack_move, unpack_moves
+
+
+def _edge_masks(diagonal_bits: dict[tuple[int, int], int]) -> list[list[int]]:
+    return [[sum(bit for (row_step, col_step), bit in diagonal_bits.items()
+                 if not (0 <= row + row_step <= 7 and 0 <= col + col_step <= 7))
+             for col in range(8)] for row in range(8)]
+
+
+def _move_tables(directions: dict[str, int]) -> dict[int, list[list[tuple[int, int, int, int, int]]]]:
+    """
+    per direction, per square (row * 8 + col): (end_row, end_col, captured_row, captured_col, packed move) of moves
+    that stay on the board, in the order of `possible_moves_for_piece` keys - captured_row is -1 for plain moves
+    """
+    tables = {}
+    for direction in directions.values():
+        kinds = [(direction, -1), (direction, 1), (direction * 2, -2), (direction * 2, 2),
+                 (-direction * 2, -2), (-direction * 2, 2)]
+        tables[direction] = [
+            [(row + row_shift, col + col_shift,
+              row + row_shift // 2 if abs(row_shift) == 2 else -1, col + col_shift // 2,
+              pack_move(row, col, row + row_shift, col + col_shift))
+             for row_shift, col_shift in kinds if 0 <= row + row_shift <= 7 and 0 <= col + col_shift <= 7]
+            for row in range(8) for col in range(8)]
+    return tables
+
 
 class CheckersGame:
     STARTING_BOARD = [
@@ -21,13 +49,28 @@ class CheckersGame:
         "R": -1,  # Red moves up
         "B": 1    # Black moves down
     }
+    # same notation as in `human_readable_possible_move`, for example "6A -> 5B", "6a5b" or "6A 5B"
+    HUMAN_MOVE_PATTERN = re.compile(r"^\s*([1-8])\s*([a-h])\s*(?:->|-|,)?\s*([1-8])\s*([a-h])\s*$", re.IGNORECASE)
+    HUMAN_SQUARE_PATTERN = re.compile(r"^\s*([1-8])\s*([a-h])\s*$", re.IGNORECASE)
+    verbose = False
+    # moves remembered for undo/redo, the oldest ones are forgotten (can't be undone anymore) past that
+    MAX_HISTORY_LENGTH = 4096
+    # bit i of attack/defence map entries stands for DIAGONALS[i] (row step, col step)
+    DIAGONALS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+    DIAGONAL_BITS = {diagonal: 1 << index for index, diagonal in enumerate(DIAGONALS)}
+    # diagonals leading off the board from every square
+    EDGE_MASKS = _edge_masks(DIAGONAL_BITS)
+    # precomputed targets of `calculate_current_valid_moves`
+    MOVE_TABLES = _move_tables(PLAYER_BOARD_DIRECTION)
 
     def __init__(self):
-        self.board = deepcopy(self.STARTING_BOARD)
+        self.board = [row[:] for row in self.STARTING_BOARD]
         self.current_player = deepcopy(self.STARTING_PLAYER)
         self.current_enemy_player = deepcopy(self.STARTING_ENEMY)
         self.current_player_direction = deepcopy(self.PLAYER_BOARD_DIRECTION[self.current_player])
-        self.valid_moves: list = []
+        # moves of the side to move packed into 16 bits (see `packed_moves`), `valid_moves` is their tuple view
+        self.packed_valid_moves = array(TYPECODE)
+        self._valid_moves: list[tuple[int, int, int, int]] | None = []
 
         b_size = len(self.board)
         self.board_indices = [(r, c) for c in range(b_size) for r in range(b_size)]
@@ -38,6 +81,19 @@ class CheckersGame:
         # two tuples of origin and destination of enemy move
         self.previous_move_coordinates = []
 
+        # reversible deltas of executed moves:
+        # (start_row, start_col, end_row, end_col, captured_row, captured_col, captured_piece, moving_player)
+        # entries before `history_cursor` are applied on the board, the ones after it can be redone
+        self.history: list[tuple[int, int, int, int, int, int, str, str]] = []
+        self.history_cursor = 0
+        self.history_offset = 0  # number of the oldest plies that got dropped from history
+
+        # per side, per square bitmasks of DIAGONALS (see `board_maps`), kept up to date by every board change
+        self.attack_maps, self.defence_maps = self.board_maps(self.board)
+        # False - moves leave the maps as they are (stale until `set_position`), searching has no use for them and
+        # refreshing is most of the cost of `make_move` / `unmake_move`
+        self.track_maps = True
+
     @staticmethod
     def _check_out_of_border(col, row):
         """check if board position is actually a valid board position"""
@@ -57,6 +113,23 @@ class CheckersGame:
     def human_readable_possible_move(s_row, s_col, e_row, e_col):
         return f"{8-s_row}{chr(s_col + 65)} -> {8-e_row}{chr(e_col + 65)}"
 
+    @classmethod
+    def parse_human_square(cls, text: str) -> tuple[int, int] | None:
+        """inverse of the square notation used by `human_readable_possible_move`, None if it does not match"""
+        match = cls.HUMAN_SQUARE_PATTERN.match(text)
+        if match is None:
+            return None
+        return 8 - int(match.group(1)), ord(match.group(2).upper()) - 65
+
+    @classmethod
+    def parse_human_move(cls, text: str) -> tuple[int, int, int, int] | None:
+        """inverse of `human_readable_possible_move`, None if text is not a move"""
+        match = cls.HUMAN_MOVE_PATTERN.match(text)
+        if match is None:
+            return None
+        s_row, s_col, e_row, e_col = match.groups()
+        return 8 - int(s_row), ord(s_col.upper()) - 65, 8 - int(e_row), ord(e_col.upper()) - 65
+
     def possible_moves_for_piece(self, row, col):
         """
         ALL THE MOVES THAT ARE DONE HERE ARE WITH RESPECT TO THE MONITOR, NOT LOOKING FROM THE PLAYER PERSPECTIVE!
@@ -102,29 +175,130 @@ class CheckersGame:
                 captured_col = (col + col_) // 2
                 # is there a piece to be captured?
                 if moves_dict[k][1] and (self.board[captured_row][captured_col] == self.current_enemy_player):
-                    print(f"beating: {self.human_readable_possible_move(row, col, row_, col_)}")
+                    if self.verbose:
+                        print(f"beating: {self.human_readable_possible_move(row, col, row_, col_)}")
                     moves_dict[k][1] = True
                 else:
                     moves_dict[k][1] = False
         return moves_dict
 
+    @classmethod
+    def _attack_mask(cls, board: list[list[str]], row: int, col: int, side: str) -> int:
+        mask = 0
+        for (row_step, col_step), bit in cls.DIAGONAL_BITS.items():
+            attacker_row, attacker_col = row - row_step, col - col_step
+            landing_row, landing_col = row + row_step, col + col_step
+            if 0 <= attacker_row <= 7 and 0 <= attacker_col <= 7 and 0 <= landing_row <= 7 and 0 <= landing_col <= 7 \
+                    and board[attacker_row][attacker_col] == side and board[landing_row][landing_col] in " G":
+                mask |= bit
+        return mask
+
+    @classmethod
+    def _defence_mask(cls, board: list[list[str]], row: int, col: int, side: str) -> int:
+        mask = 0
+        for (row_step, col_step), bit in cls.DIAGONAL_BITS.items():
+            if 0 <= row + row_step <= 7 and 0 <= col + col_step <= 7 and board[row + row_step][col + col_step] == side:
+                mask |= bit
+        return mask
+
+    @classmethod
+    def board_maps(cls, board: list[list[str]]) -> tuple[dict, dict]:
+        """
+        attack and defence maps of both sides, built from scratch: {side: 8x8 bitmasks of DIAGONALS}
+
+        attack:  bit d of [row][col] - piece of the side on (row, col) - d could jump a piece on (row, col), landing
+                 on (row, col) + d is empty (beating goes both forwards and backwards)
+        defence: bit d of [row][col] - piece of the side stands next to (row, col), on (row, col) + d
+
+        "G" hints count as empty squares
+        """
+        attack_maps = {side: [[0] * 8 for _ in range(8)] for side in cls.PLAYER_BOARD_DIRECTION}
+        defence_maps = {side: [[0] * 8 for _ in range(8)] for side in cls.PLAYER_BOARD_DIRECTION}
+        # walk over pieces, not squares - each piece marks its 4 neighbours
+        for row in range(8):
+            for col in range(8):
+                side = board[row][col]
+                if side not in attack_maps:
+                    continue
+                for (row_step, col_step), bit in cls.DIAGONAL_BITS.items():
+                    next_row, next_col = row + row_step, col + col_step
+                    if not (0 <= next_row <= 7 and 0 <= next_col <= 7):
+                        continue
+                    defence_maps[side][next_row][next_col] |= cls.DIAGONAL_BITS[(-row_step, -col_step)]
+                    landing_row, landing_col = next_row + row_step, next_col + col_step
+                    if 0 <= landing_row <= 7 and 0 <= landing_col <= 7 and board[landing_row][landing_col] in " G":
+                        attack_maps[side][next_row][next_col] |= bit
+        return attack_maps, defence_maps
+
+    def _refresh_maps(self, *changed_squares: tuple[int, int]):
+        """
+        entry of a square depends only on its diagonal neighbours, so only neighbours of changed squares are
+        recomputed - at most 12 squares per move
+        """
+        if not self.track_maps:
+            return
+        stale = set()
+        for row, col in changed_squares:
+            for row_step, col_step in self.DIAGONALS:
+                if 0 <= row + row_step <= 7 and 0 <= col + col_step <= 7:
+                    stale.add((row + row_step, col + col_step))
+        for side in self.PLAYER_BOARD_DIRECTION:
+            attack_map, defence_map = self.attack_maps[side], self.defence_maps[side]
+            for row, col in stale:
+                attack_map[row][col] = self._attack_mask(self.board, row, col, side)
+                defence_map[row][col] = self._defence_mask(self.board, row, col, side)
+
+    @staticmethod
+    def position_key(board: list[list[str]], side: str) -> tuple[str, str]:
+        """hashable identifier of a position - board flattened into a string, plus side to move"""
+        return "".join("".join(row) for row in board), side
+
+    def set_position(self, board: list[list[str]], side: str):
+        """load arbitrary position (copy of the board + side to move) and recalculate valid moves for it"""
+        self.board = [row[:] for row in board]
+        self.attack_maps, self.defence_maps = self.board_maps(self.board)
+        self.current_player = side
+        self.current_enemy_player = self.PLAYER_2_COLOR if side == self.PLAYER_1_COLOR else self.PLAYER_1_COLOR
+        self.current_player_direction = self.PLAYER_BOARD_DIRECTION[side]
+        self.selected_piece = None
+        self.hints_for_selection = None
+        self.clear_history()
+        self.calculate_current_valid_moves()
+
     def check_lose_game(self):
         """no valid moves for player means he/she loses"""
-        return self.valid_moves == []
+        return not self.packed_valid_moves
+
+    @property
+    def valid_moves(self) -> list[tuple[int, int, int, int]]:
+        """tuple view of `packed_valid_moves` for the UI, decoded on first use after every recalculation"""
+        if self._valid_moves is None:
+            self._valid_moves = unpack_moves(self.packed_valid_moves)
+        return self._valid_moves
+
+    @valid_moves.setter
+    def valid_moves(self, moves):
+        self.packed_valid_moves = pack_moves(moves)
+        self._valid_moves = None
 
     def calculate_current_valid_moves(self):
-        """Generates a list of valid moves based on the current state of the board."""
-        valid_moves = []
+        """
+        Generates valid moves based on the current state of the board, packed (`packed_valid_moves`).
+        Same moves in the same order as walking the board with `possible_moves_for_piece`.
+        """
+        board, player, enemy = self.board, self.current_player, self.current_enemy_player
+        move_table = self.MOVE_TABLES[self.current_player_direction]
+        packed_moves = array(TYPECODE)
         for row, col in self.board_indices:
-            if self.board[row][col] == self.current_player:
-                # Check for valid moves in all possible directions
-                moves_parsed = self.possible_moves_for_piece(row, col)
-                for key in moves_parsed:
-                    if moves_parsed[key][1]:
-                        row_, col_ = moves_parsed[key][0]
-                        valid_moves.append((row, col, row_, col_))
+            if board[row][col] == player:
+                for end_row, end_col, captured_row, captured_col, packed in move_table[row * 8 + col]:
+                    if board[end_row][end_col] != " ":
+                        continue
+                    if captured_row < 0 or board[captured_row][captured_col] == enemy:
+                        packed_moves.append(packed)
 
-        self.valid_moves = valid_moves
+        self.packed_valid_moves = packed_moves
+        self._valid_moves = None
 
     def switch_player(self):
         """swap enemy and current player, and change all other necessary variables"""
@@ -142,10 +316,138 @@ class CheckersGame:
         self.board[start_row][start_col] = ' '  # Clear the starting position
 
         # Check for capturing an opponent piece
+        captured_row, captured_col, captured_piece = end_row, end_col, ' '
         if abs(start_row - end_row) == 2:  # A capture move
             captured_row = (start_row + end_row) // 2
             captured_col = (start_col + end_col) // 2
+            captured_piece = self.board[captured_row][captured_col]
             self.board[captured_row][captured_col] = ' '  # Remove the captured piece
+        self._refresh_maps((start_row, start_col), (end_row, end_col), (captured_row, captured_col))
+
+        self._record_move(
+            (start_row, start_col, end_row, end_col, captured_row, captured_col, captured_piece, self.current_player))
+
+    def execute_packed_move(self, packed: int):
+        """`execute_move` of a move from `packed_valid_moves`"""
+        self.execute_move(*unpack_move(packed))
+
+    def make_move(self, packed: int):
+        """
+        play a move from `packed_valid_moves` and hand the turn over - make/unmake pair for searching, the board
+        is changed in place and the move goes into history like any other
+        """
+        self.execute_packed_move(packed)
+        self.switch_player()
+        self.calculate_current_valid_moves()
+
+    def unmake_move(self, valid_moves: array | None = None):
+        """
+        take back the last `make_move`, board is restored from its history delta
+
+        :param valid_moves: `packed_valid_moves` of the position taken back to, when the caller kept them -
+            recalculated otherwise
+        """
+        self._undo_delta()
+        if valid_moves is None:
+            self.calculate_current_valid_moves()
+        else:
+            self.packed_valid_moves = valid_moves
+            self._valid_moves = None
+
+    def _record_move(self, delta: tuple):
+        """new move drops whatever could have been redone, history is trimmed to `MAX_HISTORY_LENGTH`"""
+        if self.history_cursor < len(self.history):
+            del self.history[self.history_cursor:]
+        self.history.append(delta)
+        self.history_cursor += 1
+        if len(self.history) > self.MAX_HISTORY_LENGTH:
+            dropped = len(self.history) - self.MAX_HISTORY_LENGTH
+            del self.history[:dropped]
+            self.history_cursor -= dropped
+            self.history_offset += dropped
+
+    def clear_history(self):
+        self.history = []
+        self.history_cursor = 0
+        self.history_offset = 0
+
+    @property
+    def ply(self) -> int:
+        """number of moves made since the starting position (or `set_position`)"""
+        return self.history_offset + self.history_cursor
+
+    def _set_side(self, side: str):
+        self.current_player = side
+        self.current_enemy_player = self.PLAYER_2_COLOR if side == self.PLAYER_1_COLOR else self.PLAYER_1_COLOR
+        self.current_player_direction = self.PLAYER_BOARD_DIRECTION[side]
+
+    def _undo_delta(self):
+        start_row, start_col, end_row, end_col, captured_row, captured_col, captured_piece, player = \
+            self.history[self.history_cursor - 1]
+        self.board[end_row][end_col] = ' '
+        self.board[captured_row][captured_col] = captured_piece
+        self.board[start_row][start_col] = player
+        self._refresh_maps((start_row, start_col), (end_row, end_col), (captured_row, captured_col))
+        self.history_cursor -= 1
+        self._set_side(player)
+
+    def _redo_delta(self):
+        start_row, start_col, end_row, end_col, captured_row, captured_col, _, player = \
+            self.history[self.history_cursor]
+        self.board[start_row][start_col] = ' '
+        self.board[captured_row][captured_col] = ' '
+        self.board[end_row][end_col] = player
+        self._refresh_maps((start_row, start_col), (end_row, end_col), (captured_row, captured_col))
+        self.history_cursor += 1
+        self._set_side(player)
+        self.switch_player()
+
+    def _after_navigation(self):
+        """selection, last move marker and valid moves of the position history navigation ended at"""
+        self.selected_piece = None
+        self.hints_for_selection = None
+        if self.history_cursor:
+            start_row, start_col, end_row, end_col = self.history[self.history_cursor - 1][:4]
+            self.save_last_move_coordinates(start_row, start_col, end_row, end_col)
+        else:
+            self.previous_move_coordinates = []
+        self.calculate_current_valid_moves()
+
+    def undo(self) -> bool:
+        """
+        take back the last move (player who made it is to move again), False when there is nothing to undo
+
+        expects board as left by the move and `switch_player` - free of "G" hints
+        """
+        if self.history_cursor == 0:
+            return False
+        self._undo_delta()
+        self._after_navigation()
+        return True
+
+    def redo(self) -> bool:
+        """make the last undone move again, False when there is nothing to redo"""
+        if self.history_cursor == len(self.history):
+            return False
+        self._redo_delta()
+        self._after_navigation()
+        return True
+
+    def go_to_ply(self, ply: int):
+        """
+        jump to any remembered ply, moves are undone/redone one by one (each is O(1)), no board gets copied
+
+        :raises ValueError: ply was dropped from history already or was never played
+        """
+        target_cursor = ply - self.history_offset
+        if not 0 <= target_cursor <= len(self.history):
+            raise ValueError(f"ply should be between {self.history_offset} and "
+                             f"{self.history_offset + len(self.history)}")
+        while self.history_cursor > target_cursor:
+            self._undo_delta()
+        while self.history_cursor < target_cursor:
+            self._redo_delta()
+        self._after_navigation()
 
     def mark_available(self):
         """Marks the available moves on the board."""
@@ -187,7 +489,8 @@ class CheckersGame:
 
     def reset_everything(self):
         """reverts state of the game to the beginning"""
-        self.board = deepcopy(self.STARTING_BOARD)
+        self.board = [row[:] for row in self.STARTING_BOARD]  # rows of immutable strings, no deep copy needed
+        self.attack_maps, self.defence_maps = self.board_maps(self.board)
         self.current_player = deepcopy(self.STARTING_PLAYER)
         self.current_enemy_player = deepcopy(self.STARTING_ENEMY)
         self.current_player_direction = deepcopy(self.PLAYER_BOARD_DIRECTION[self.current_player])
@@ -196,3 +499,4 @@ class CheckersGame:
         self.selected_piece = None
         self.hints_for_selection = None
         self.previous_move_coordinates = []
+        self.clear_history()
@@ -8,14 +8,25 @@ except ImportError:
 from game_visualization import GameDisplayEngine
 from game_logic import CheckersGame
 from bot_logic import QuantumBot
+from cost_model import CostModel
+from schedule_tuner import ScheduleTable
+from tablebase import Tablebase
+from game_archive import GameArchive
+from ponder import Ponderer
 
 
 class Game:
-    def __init__(self, g_type: Literal['pygame', 'console'] | str | None = None):
-        self.g_type = g_type if g_type else "pygame"
+    def __init__(self, g_type: Literal['pygame', 'console'] | str | None = None, archive_path: str | None = None,
+                 ponder: bool = False, stream_chunk_shots: int | None = None):
         self.game_interaction_engine = GameDisplayEngine(vis_type=g_type)
+        # display engine falls back to console when pygame is not available
+        self.g_type = self.game_interaction_engine.vis_type
         self.game_rulesystem = CheckersGame()
-        self.q_bot = QuantumBot(3)
+        # tuned schedules, solved endgames and calibrated cost model, if they were generated (next to the modules)
+        schedule_table = ScheduleTable.load(number_of_conditions=3)
+        tablebase = Tablebase.load()
+        cost_model = CostModel.load()
+        self.q_bot = QuantumBot(3, schedule_table=schedule_table, tablebase=tablebase, cost_model=cost_model)
 
         # we update the bot to be an enemy of human player
         # the "current" is from bot perspective as a "main character" :)
@@ -29,6 +40,20 @@ class Game:
         self.running = False
         self.turn_start = True
 
+        # every finished game gets appended into the archive, if one was given
+        self.archive = GameArchive(archive_path) if archive_path else None
+        self.played_moves = []
+
+        # bot replies to every human move are precomputed in the background while human is thinking
+        self.ponderer = Ponderer(lambda: QuantumBot(
+            self.q_bot.number_of_conditions, schedule_table=schedule_table, tablebase=tablebase,
+            cost_model=cost_model)) if ponder else None
+
+        # bot shots run in chunks of this size and the sidebar is redrawn after each one, None - one job, one draw
+        self.stream_chunk_shots: int | None = stream_chunk_shots
+        # end the bot turn as soon as its best move is settled (confidence interval apart from the runner-up's)
+        self.stop_when_settled = False
+
     def end_turn_cleanup(self):
         """all the minor cleanup procedures"""
         # WHEN LEFT - GREEN HINT MARKS ON BOARD (sa "G" character) INTERFERE WITH (" ") CHECKS!
@@ -45,6 +70,9 @@ class Game:
         self.q_bot.human_readable_predictions = []
         self.q_bot.counts = None
         self.q_bot.valid_moves_with_flags = None
+        if self.ponderer is not None:
+            self.ponderer.cancel()
+        self.played_moves = []
         self.turn_start = True
 
     def trigger_player_action(self, event_coordinates, game_event):
@@ -58,6 +86,7 @@ class Game:
                 if event_coordinates in self.game_rulesystem.hints_for_selection:
                     to_execute = (*self.game_rulesystem.selected_piece, *event_coordinates)
                     self.game_rulesystem.execute_move(*to_execute)
+                    self.played_moves.append(to_execute)
                     self.end_turn_cleanup()
                 else:
                     self.game_rulesystem.selected_piece = None
@@ -65,34 +94,94 @@ class Game:
         elif game_event == "reset":
             self.game_reset()
 
+    def archive_played_game(self):
+        """store moves of the game that just ended, winner is the one that still had moves left"""
+        if self.archive is None or not self.played_moves:
+            return
+        self.archive.append_game(self.played_moves, winner=self.game_rulesystem.current_enemy_player)
+        self.played_moves = []
+
     def who_won_procedure(self):
         """we know now that the game is over, lets show a victory message"""
-        print("who won procedure")
+        self.archive_played_game()
         if self.game_rulesystem.current_player == self.game_rulesystem.STARTING_PLAYER:
             # human player no longer has any move
-            self.game_interaction_engine.pyg_draw_win_lose_message(False)
+            self.game_interaction_engine.draw_win_lose_message(False)
         else:
-            self.game_interaction_engine.pyg_draw_win_lose_message(True)
-        pygame.time.delay(3000)  # Pause for 3 seconds
+            self.game_interaction_engine.draw_win_lose_message(True)
+        if self.g_type == "pygame":
+            pygame.time.delay(3000)  # Pause for 3 seconds
+
+    def start_pondering(self):
+        """human is about to think, use that time to evaluate bot replies to all of their moves"""
+        if self.ponderer is not None and self.game_rulesystem.current_player == self.game_rulesystem.STARTING_PLAYER:
+            self.ponderer.start(self.game_rulesystem)
 
     def bot_move(self):
         """execute chain of events that bot does"""
-        # we execute bot controls and movements -> black pieces
-        self.q_bot.calculate_recommendations(
-            self.game_rulesystem.valid_moves,
-            self.game_rulesystem.board
-        )
-        self.q_bot.parse_recommendations_human_readable()
-        self.game_interaction_engine.pyg_draw_quantum_states(self.q_bot.human_readable_predictions)
-        best_moves = self.q_bot.parse_recommendations_bot_use()
+        pondered = None
+        if self.ponderer is not None:
+            pondered = self.ponderer.take(self.game_rulesystem.board, self.game_rulesystem.current_player)
+
+        if pondered is not None:
+            # game bot ends up as if it computed the reply itself
+            self.q_bot.restore_recommendation_state(pondered["recommendation_state"])
+            self.q_bot.human_readable_predictions = pondered["human_readable_predictions"]
+            self.game_interaction_engine.draw_quantum_states(self.q_bot.human_readable_predictions)
+            best_moves = pondered["recommendations"]
+        elif self.stream_chunk_shots:
+            self.stream_bot_recommendations()
+            best_moves = self.q_bot.parse_recommendations_bot_use()
+        else:
+            # we execute bot controls and movements -> black pieces
+            self.q_bot.calculate_recommendations(
+                self.game_rulesystem.packed_valid_moves,
+                self.game_rulesystem.board,
+                board_maps=(self.game_rulesystem.attack_maps, self.game_rulesystem.defence_maps)
+            )
+            self.q_bot.parse_recommendations_human_readable()
+            self.game_interaction_engine.draw_quantum_states(self.q_bot.human_readable_predictions)
+            best_moves = self.q_bot.parse_recommendations_bot_use()
         try:
             to_execute = best_moves[0][0]  # top of the list and 0 column (move)
             self.game_rulesystem.execute_move(*to_execute)
             self.game_rulesystem.save_last_move_coordinates(*to_execute)
+            self.played_moves.append(to_execute)
         except IndexError:
             pass
         self.end_turn_cleanup()
 
+    def stream_bot_recommendations(self):
+        """
+        bot shots in chunks, sidebar shows probabilities so far (± confidence interval) after every chunk;
+        space or enter (pygame) stops the run and the bot plays the best move it has at that point
+        """
+        stream = self.q_bot.stream_recommendations(
+            self.game_rulesystem.packed_valid_moves,
+            self.game_rulesystem.board,
+            chunk_shots=self.stream_chunk_shots,
+            board_maps=(self.game_rulesystem.attack_maps, self.game_rulesystem.defence_maps)
+        )
+        for result in stream:
+            self.q_bot.parse_recommendations_human_readable(intervals=True)
+            self.game_interaction_engine.draw_quantum_states(self.q_bot.human_readable_predictions)
+            if self.stop_requested() or (self.stop_when_settled and result.best_is_separated()):
+                stream.close()
+                break
+
+    def stop_requested(self) -> bool:
+        """pygame only - stop key pressed (or window closed) while the bot is thinking, other events stay queued"""
+        if self.g_type != "pygame":
+            return False
+        requested = False
+        for event in pygame.event.get([pygame.KEYDOWN, pygame.QUIT]):
+            if event.type == pygame.QUIT:
+                self.running = False
+                requested = True
+            elif event.key in (pygame.K_SPACE, pygame.K_RETURN):
+                requested = True
+        return requested
+
     def pyg_main(self):
         """Main game loop for Pygame players"""
         self.running = True
@@ -112,6 +201,8 @@ class Game:
                 game_over = self.game_rulesystem.check_lose_game()  # don't invert with ^ (above)
                 if game_over:
                     self.who_won_procedure()
+                else:
+                    self.start_pondering()
                 self.turn_start = False
 
             if self.game_rulesystem.current_player == self.game_rulesystem.STARTING_PLAYER:
@@ -128,26 +219,106 @@ class Game:
 
             pygame.display.flip()
 
+        if self.ponderer is not None:
+            self.ponderer.shutdown()
         pygame.quit()
 
+    def c_draw(self, status_lines: list[str] | None = None):
+        """one console frame - renderer only sends cells and lines that changed since the previous one"""
+        engine = self.game_interaction_engine
+        engine.c_draw_board(
+            self.game_rulesystem.board,
+            self.game_rulesystem.selected_piece,
+            self.game_rulesystem.hints_for_selection,
+            self.game_rulesystem.previous_move_coordinates
+        )
+        engine.c_draw_quantum_states(self.q_bot.human_readable_predictions)
+        if status_lines is not None:
+            engine.c_draw_status(status_lines)
+
+    def c_handle_command(self, inp: str) -> list[str] | None:
+        """
+        interpret single console command, returns status lines to show (None keeps the current ones)
+
+        commands: q - quit, A - list available moves, r - play again, M <move> or just <move> (for example "3C 4D"),
+        <square> (for example "3C") - select piece and highlight where it can go
+        """
+        command = inp.strip()
+        if command.lower() in ["q", "quit"]:
+            self.running = False
+            return None
+        if command.lower() in ["r", "reset"]:
+            self.game_reset()
+            self.game_interaction_engine.terminal_renderer.invalidate()
+            return ["new game started"]
+        if command in ["show available", "A"]:
+            moves = ", ".join(self.game_rulesystem.human_readable_possible_moves())
+            renderer = self.game_interaction_engine.terminal_renderer
+            return ["Available moves:", *renderer.wrap_status(moves, renderer.STATUS_LINES - 1)]
+        if self.game_rulesystem.check_lose_game():
+            return ["game is over, r - play again, q - quit"]
+
+        if command.split(" ", 1)[0] in ["move", "M"]:
+            command = command.split(" ", 1)[1] if " " in command else self.game_interaction_engine.c_prompt(
+                "Enter your move (for example 3C 4D) > ")
+
+        square = self.game_rulesystem.parse_human_square(command)
+        hints = self.game_rulesystem.hints_for_selection
+        if square is not None and self.game_rulesystem.selected_piece and hints and square in hints:
+            # only destination given, while piece is selected
+            command = self.game_rulesystem.human_readable_possible_move(*self.game_rulesystem.selected_piece, *square)
+        elif square is not None:
+            self.game_rulesystem.selected_piece = None
+            self.game_rulesystem.select_piece(*square)
+            if self.game_rulesystem.selected_piece is None:
+                self.game_rulesystem.hints_for_selection = None
+                return [f"no move available from {command.upper()}"]
+            self.game_rulesystem.calculate_hints_for_selection()
+            return [f"selected {command.upper()}, now enter destination square or full move"]
+
+        move = self.game_rulesystem.parse_human_move(command)
+        if move is None:
+            return [f"unknown command: {command}", "q - quit, A - available moves, r - reset, 3C 4D - move"]
+        if move not in self.game_rulesystem.valid_moves:
+            return [f"invalid move: {self.game_rulesystem.human_readable_possible_move(*move)}"]
+
+        self.game_rulesystem.execute_move(*move)
+        self.played_moves.append(move)
+        self.end_turn_cleanup()
+        return [f"you moved {self.game_rulesystem.human_readable_possible_move(*move)}"]
+
     def c_main(self):
         """Main game loop for console players"""
         self.running = True
+        status_lines = ["q - quit, A - available moves, r - reset, 3C 4D - move"]
+        game_over = False
         while self.running:
-            self.game_interaction_engine.c_draw_board(self.game_rulesystem.board)
-            inp = input("What is your decision? (q, A, M) > ")
-            if inp.lower() in ["q", "quit"]:
-                self.running = False
-            elif inp in ["show available", "A"]:
-                possible_moves = self.game_rulesystem.calculate_current_valid_moves()
-                print("Available moves:", possible_moves)
-                self.game_rulesystem.mark_available()
-            elif inp in ["move", "M"]:
-                # Implement logic for making a move
-                print("Enter your move coordinates: ")
-                move_coords = input()  # Example: "1,2 to 3,4"
-                # You would need to parse this input and validate the move
-                print("moved")
+            if self.turn_start:
+                self.game_rulesystem.calculate_current_valid_moves()
+                game_over = self.game_rulesystem.check_lose_game()
+                self.turn_start = False
+                if game_over:
+                    self.c_draw(status_lines)
+                    self.who_won_procedure()
+                    status_lines = None
+                else:
+                    self.start_pondering()
+
+            if not game_over and self.game_rulesystem.current_player != self.game_rulesystem.STARTING_PLAYER:
+                self.c_draw(["bot is thinking..."])
+                self.bot_move()
+                last_move = self.game_rulesystem.previous_move_coordinates
+                if last_move:
+                    status_lines = [
+                        f"bot moved {self.game_rulesystem.human_readable_possible_move(*last_move[0], *last_move[1])}"]
+                continue
+
+            self.c_draw(status_lines)
+            inp = self.game_interaction_engine.c_prompt("What is your decision? (q, A, M, r) > ")
+            status_lines = self.c_handle_command(inp)
+
+        if self.ponderer is not None:
+            self.ponderer.shutdown()
 
     def main(self):
         if self.g_type == "pygame":
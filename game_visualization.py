@@ -5,6 +5,8 @@ except ImportError:
 
 from typing import Literal, List, Tuple
 
+from terminal_renderer import TerminalRenderer
+
 CLICK_RETURNED_TYPE = tuple[tuple[int, int], str] | tuple[list[int, int], str]
 BOARD_TYPEHINT = list[list[str]]
 STATE_DATA_TYPEHINT = list[str, str, str]
@@ -41,8 +43,10 @@ class GameDisplayEngine:
 
     def __init__(self, vis_type: Literal['pygame', 'console'] | str = None):
         self.vis_type = "pygame" if vis_type is None else vis_type
-        if pygame is None:
+        self.terminal_renderer = None
+        if pygame is None or self.vis_type == 'console':
             self.vis_type = 'console'
+            self.terminal_renderer = TerminalRenderer()
             self.screen = None
             self.board_pixel_size = None
             self.block_size = None
@@ -77,31 +81,40 @@ class GameDisplayEngine:
         self.selected_piece = None
         self.possible_moves = []  # To track possible moves
 
-    @staticmethod
-    def c_possible_moves_section(human_readable_possible_moves: list):
+    def c_possible_moves_section(self, human_readable_possible_moves: list):
         """Display possible moves in console."""
-        for move in human_readable_possible_moves:
-            print(move)
+        self.c_draw_status(["Available moves:", ", ".join(human_readable_possible_moves)])
 
-    @staticmethod
-    def c_draw_quantum_states(state_data: STATE_DATA_TYPEHINT):
-        """Fallback: Draw the quantum states and probabilities in the console."""
-        print(f"{'State':<7} | {'Transition':<20} | {'Probability':<10}")
-        print("-" * 40)
-        for state, transition, probability in state_data:
-            print(f"{state:<7} | {transition:<20} | {probability:<10}")
+    def c_draw_quantum_states(self, state_data: STATE_DATA_TYPEHINT):
+        """Fallback: Draw the quantum states and probabilities in the console, only changed lines are redrawn."""
+        self.terminal_renderer.draw_quantum_states(state_data)
+        self.terminal_renderer.present()
 
-    @staticmethod
-    def c_draw_board(board: List[List[str]]):
-        """Draw board for console type of rendering."""
-        for index, row in enumerate(board):
-            print("  -" + "----" * 8)
-            r_print = f"{len(board) - index} |"
-            for board_spot in row:
-                r_print += f" {board_spot} |"
-            print(r_print)
-        print("  -" + "----" * 8)
-        print("   " + "".join([f" {chr(col + 65)}  " for col in range(8)]))
+    def c_draw_board(self, board: List[List[str]], selected_piece=None, hints_for_selection=None,
+                     previous_move_coordinates=None):
+        """Draw board for console type of rendering, only changed cells are redrawn."""
+        self.terminal_renderer.draw_board(board, selected_piece, hints_for_selection, previous_move_coordinates)
+        self.terminal_renderer.present()
+
+    def c_draw_status(self, lines: list[str]):
+        """messages for the console player, shown below the board"""
+        self.terminal_renderer.draw_status(lines)
+        self.terminal_renderer.present()
+
+    def c_prompt(self, text: str) -> str:
+        return self.terminal_renderer.prompt(text)
+
+    def c_draw_win_lose_message(self, human_won: bool):
+        if human_won:
+            self.c_draw_status(["computer lost!", "you won! (r - play again, q - quit)"])
+        else:
+            self.c_draw_status(["computer won!", "you lost! (r - play again, q - quit)"])
+
+    def draw_win_lose_message(self, human_won: bool):
+        if self.vis_type == 'console':
+            self.c_draw_win_lose_message(human_won)
+        elif self.vis_type == 'pygame':
+            self.pyg_draw_win_lose_message(human_won)
 
     def pyg_draw_win_lose_message(self, human_won: bool):
         """Display a centered win/lose message."""
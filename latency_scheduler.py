@@ -0,0 +1,202 @@
+import time
+from array import array
+from collections import Counter
+
+from cost_model import CostModel
+from packed_moves import pack_move
+
+BOARD_TYPEHINT = list[list[str]]
+MOVES_LIST_TYPEHINT = list[list[int, int, int, int]] | list[tuple[int, int, int, int]] | array
+
+
+class LatencyScheduler:
+    """
+    Picks how the bot computes its reply so that it is ready before a deadline, giving up quality only as needed.
+
+    paths, from the preferred one down:
+        "tablebase"             solved endgame (bot.tablebase) - exact and instant
+        "book"                  position seen before, mean of stored bot recommendations (`PositionIndex`)
+        "aer"                   full circuit with all the shots (compiled circuit is loaded if it is cached)
+        "aer_fewer_shots"       full circuit, as many shots as fit (at least `MIN_SHOTS`)
+        "aer_fewer_iterations"  longest prefix of the iteration schedule that fits, with `MIN_SHOTS` or more
+        "exact"                 probabilities of the full circuit computed classically (`q_exact_probabilities`)
+        "classical"             weights by conditions met (`q_classical_counts`), always fits
+
+    simulation time is predicted by `CostModel` and corrected by measured/predicted ratio of past jobs, circuit
+    building by measured seconds per gate, cheap paths by their measured time - every run updates these
+    (exponential moving averages). Only `safety_margin` of the time that is left gets planned.
+    """
+    PATHS = ["tablebase", "book", "aer", "aer_fewer_shots", "aer_fewer_iterations", "exact", "classical"]
+    MIN_SHOTS = 256
+    SMOOTHING = 0.3  # weight of the newest measurement
+
+    def __init__(self, bot, cost_model: CostModel | None = None, book=None, safety_margin: float = 0.8):
+        """
+        :param bot: `QuantumBot` to drive, its side has to be set already
+        :param book: optional `PositionIndex` with aggregated recommendations
+        """
+        self.bot = bot
+        self.cost_model = cost_model or bot.cost_model or CostModel()
+        self.book = book
+        self.safety_margin = safety_margin
+
+        # measured stage costs
+        self.build_seconds_per_gate = 5e-6
+        self.load_seconds = 5e-3  # compiled circuit from `bot.circuit_cache`
+        self.simulation_correction = 1.0
+        self.stage_seconds = {"book": 1e-4, "flags": 1e-3, "exact": 1e-3, "classical": 1e-4}
+
+        self.path_counts = Counter()
+        self.requests = 0
+        self.deadline_misses = 0
+        self.last_path: str | None = None
+        self.last_elapsed: float | None = None
+
+    def _smooth(self, previous: float, measured: float) -> float:
+        return (1 - self.SMOOTHING) * previous + self.SMOOTHING * measured
+
+    def miss_rate(self) -> float:
+        return self.deadline_misses / self.requests if self.requests else 0.0
+
+    def calculate_recommendations(self, valid_moves_list: MOVES_LIST_TYPEHINT, board: BOARD_TYPEHINT,
+                                  deadline: float, shots: int = 10000, board_maps: tuple[dict, dict] | None = None
+                                  ) -> str:
+        """
+        fill bot counts (same as `QuantumBot.calculate_recommendations`) within `deadline` seconds
+
+        :returns: path that was taken
+        """
+        start = time.perf_counter()
+        path = self._run(valid_moves_list, board, start + deadline, shots, board_maps)
+        self.last_elapsed = time.perf_counter() - start
+        self.last_path = self.bot.last_engine = path
+        self.path_counts[path] += 1
+        self.requests += 1
+        if self.last_elapsed > deadline:
+            self.deadline_misses += 1
+        return path
+
+    def _remaining(self, deadline_at: float) -> float:
+        return (deadline_at - time.perf_counter()) * self.safety_margin
+
+    def _run(self, valid_moves_list: MOVES_LIST_TYPEHINT, board: BOARD_TYPEHINT, deadline_at: float,
+             shots: int, board_maps: tuple[dict, dict] | None) -> str:
+        bot = self.bot
+        if bot.q_tablebase_counts(valid_moves_list, board, shots) is not None:
+            return "tablebase"
+        if self.book is not None and self.stage_seconds["book"] <= self._remaining(deadline_at):
+            stage_start = time.perf_counter()
+            found = self._book_counts(valid_moves_list, board, shots)
+            self._measured("book", stage_start)
+            if found:
+                return "book"
+
+        stage_start = time.perf_counter()
+        bot.prepare_flagged_states(valid_moves_list, board, board_maps)
+        self._measured("flags", stage_start)
+
+        plan = self._circuit_plan(bot.iteration_schedule, shots, self._remaining(deadline_at))
+        if plan is not None:
+            path, bot.iteration_schedule, path_shots = plan
+            self._run_circuit(path_shots)
+            return path
+
+        if self.stage_seconds["exact"] <= self._remaining(deadline_at):
+            stage_start = time.perf_counter()
+            bot.q_exact_counts(shots)
+            self._measured("exact", stage_start)
+            return "exact"
+        stage_start = time.perf_counter()
+        bot.q_classical_counts(shots)
+        self._measured("classical", stage_start)
+        return "classical"
+
+    def _measured(self, stage: str, stage_start: float):
+        self.stage_seconds[stage] = self._smooth(self.stage_seconds[stage], time.perf_counter() - stage_start)
+
+    def _book_counts(self, valid_moves_list: MOVES_LIST_TYPEHINT, board: BOARD_TYPEHINT, shots: int) -> bool:
+        # recommendations and counts only, occurrences of the position are not walked
+        entry = self.book.lookup(board, self.bot.player_identifier)
+        if entry is None or not entry["evaluations"]:
+            return False
+        probabilities = {pack_move(*move): probability for move, probability, _ in entry["recommendations"]}
+        states = self.bot.assign_valid_board_moves_to_q_states(valid_moves_list)
+        counts = {state: int(probabilities[row[0]] * shots) for state, row in states.items() if row[0] in probabilities}
+        if not counts:
+            return False
+        self.bot.valid_moves_with_flags = states
+        self.bot.counts = counts
+        self.bot.current_job_shots = shots
+        return True
+
+    def predict_circuit_seconds(self, schedule: tuple[int, ...], shots: int) -> tuple[float, float, int]:
+        """(building or loading, simulation, gates) predicted for flagged states already in the bot"""
+        bot = self.bot
+        previous_schedule = bot.iteration_schedule
+        bot.iteration_schedule = schedule
+        try:
+            estimate = self.cost_model.estimate(bot, shots)
+            if bot.max_memory_bytes is not None and estimate["memory_bytes"] > bot.max_memory_bytes:
+                return float("inf"), float("inf"), estimate["gates"]
+            if bot.circuit_cache is not None and bot.circuit_cache.contains(bot.circuit_cache_key()):
+                build = self.load_seconds
+            else:
+                build = self.build_seconds_per_gate * estimate["gates"]
+            return build, estimate["seconds"] * self.simulation_correction, estimate["gates"]
+        finally:
+            bot.iteration_schedule = previous_schedule
+
+    def _circuit_plan(self, full_schedule: tuple[int, ...], shots: int,
+                      remaining: float) -> tuple[str, tuple[int, ...], int] | None:
+        """best circuit path that fits into remaining time as (path, schedule, shots), None if none of them does"""
+        build, simulation, _ = self.predict_circuit_seconds(full_schedule, shots)
+        if build + simulation <= remaining:
+            return "aer", full_schedule, shots
+
+        seconds_per_shot = self.cost_model.seconds_per_shot * self.simulation_correction
+        build, simulation_without_shots, _ = self.predict_circuit_seconds(full_schedule, 0)
+        fitting_shots = int((remaining - build - simulation_without_shots) / seconds_per_shot) \
+            if seconds_per_shot else shots
+        if fitting_shots >= self.MIN_SHOTS:
+            return "aer_fewer_shots", full_schedule, min(shots, fitting_shots)
+
+        for length in range(len(full_schedule) - 1, 0, -1):
+            schedule = full_schedule[:length]
+            build, simulation_without_shots, _ = self.predict_circuit_seconds(schedule, 0)
+            fitting_shots = int((remaining - build - simulation_without_shots) / seconds_per_shot) \
+                if seconds_per_shot else shots
+            if fitting_shots >= self.MIN_SHOTS:
+                return "aer_fewer_iterations", schedule, min(shots, fitting_shots)
+        return None
+
+    def _run_circuit(self, shots: int):
+        """build (or load) and simulate, measured times feed the predictions"""
+        bot = self.bot
+        cached = bot.circuit_cache is not None and bot.circuit_cache.contains(bot.circuit_cache_key())
+        _, predicted_simulation, gates = self.predict_circuit_seconds(bot.iteration_schedule, shots)
+
+        build_start = time.perf_counter()
+        bot.q_assemble_master_circuit()
+        build_seconds = time.perf_counter() - build_start
+        if cached:
+            self.load_seconds = self._smooth(self.load_seconds, build_seconds)
+        else:
+            self.build_seconds_per_gate = self._smooth(self.build_seconds_per_gate, build_seconds / max(gates, 1))
+
+        simulation_start = time.perf_counter()
+        bot.run_master_circuit(shots)
+        simulation_seconds = time.perf_counter() - simulation_start
+        if predicted_simulation > 0:
+            self.simulation_correction = self._smooth(
+                self.simulation_correction, simulation_seconds / (predicted_simulation / self.simulation_correction))
+
+    def report(self) -> dict:
+        return {
+            "requests": self.requests,
+            "deadline_misses": self.deadline_misses,
+            "miss_rate": self.miss_rate(),
+            "paths": dict(self.path_counts),
+            "stage_seconds": dict(self.stage_seconds),
+            "build_seconds_per_gate": self.build_seconds_per_gate,
+            "simulation_correction": self.simulation_correction,
+        }
@@ -0,0 +1,180 @@
+import random
+import time
+import timeit
+
+from qiskit import transpile
+from qiskit_aer.backends import AerSimulator
+
+from batch_moves import random_board
+from bot_logic import QuantumBot
+from conditions import DEFAULT_CONDITIONS
+from game_logic import CheckersGame
+
+BASIS_GATES = ["u", "cx"]
+
+
+def random_flag_rows(moves_count: int, number_of_conditions: int, seed: int = 0) -> list[list[int]]:
+    """conditions flagged at random for every move, same seed -> same rows for every strategy"""
+    generator = random.Random(seed)
+    return [[generator.randint(0, 1) for _ in range(number_of_conditions)] for _ in range(moves_count)]
+
+
+def measure_strategy(strategy: str, flag_rows: list[list[int]], number_of_conditions: int = 3, shots: int = 1000,
+                     gray_code_ordering: bool = True, max_simulated_qubits: int | None = None):
+    """
+    build, unroll into u+cx and simulate the full recommendation circuit, returns row of the report
+
+    :param max_simulated_qubits: circuits wider than this are not simulated, their `simulation_s` is None
+    """
+    bot = QuantumBot(number_of_conditions, mcx_strategy=strategy)
+    bot.schedule_table = None
+    bot.gray_code_ordering = gray_code_ordering
+
+    build_start = time.perf_counter()
+    circuit = bot.prepare_circuit_for_flags(flag_rows)
+    build_time = time.perf_counter() - build_start
+
+    unrolled = transpile(circuit, basis_gates=BASIS_GATES, optimization_level=1)
+    operations = unrolled.count_ops()
+    assembled_operations = circuit.count_ops()
+
+    simulation_time = None
+    if max_simulated_qubits is None or circuit.num_qubits <= max_simulated_qubits:
+        simulator = AerSimulator()
+        simulation_start = time.perf_counter()
+        simulator.run(circuit, shots=shots, seed_simulator=1).result()
+        simulation_time = time.perf_counter() - simulation_start
+
+    return {
+        "strategy": strategy,
+        "moves": len(flag_rows),
+        "qubits": circuit.num_qubits,
+        "x": assembled_operations.get("x", 0),
+        # as assembled (native multi-controlled gates), that's what Aer runs
+        "assembled_gates": sum(
+            count for name, count in assembled_operations.items() if name not in ["barrier", "measure"]),
+        "assembled_depth": circuit.depth(),
+        "gates": sum(count for name, count in operations.items() if name not in ["barrier", "measure"]),
+        "cx": operations.get("cx", 0),
+        "depth": unrolled.depth(),
+        "build_s": build_time,
+        "simulation_s": simulation_time,
+    }
+
+
+def report(moves_counts=(2, 4, 7, 8, 12, 16), strategies=None, number_of_conditions: int = 3, shots: int = 1000):
+    """print table comparing all MCX synthesis strategies per move count"""
+    strategies = strategies or QuantumBot.MCX_STRATEGIES
+    header = f"{'moves':>5} | {'strategy':<14} | {'qubits':>6} | {'gates':>8} | {'cx':>8} | {'depth':>7} | " \
+             f"{'build s':>8} | {'sim s':>8}"
+    print(header)
+    print("-" * len(header))
+    rows = []
+    for moves_count in moves_counts:
+        flag_rows = random_flag_rows(moves_count, number_of_conditions, seed=moves_count)
+        for strategy in strategies:
+            row = measure_strategy(strategy, flag_rows, number_of_conditions, shots)
+            rows.append(row)
+            print(f"{row['moves']:>5} | {row['strategy']:<14} | {row['qubits']:>6} | {row['gates']:>8} | "
+                  f"{row['cx']:>8} | {row['depth']:>7} | {row['build_s']:>8.3f} | {row['simulation_s']:>8.3f}")
+    return rows
+
+
+def report_state_ordering(moves_counts=(2, 4, 7, 8, 12, 16), strategy: str = "default",
+                          number_of_conditions: int = 3, shots: int = 1000):
+    """
+    print gate count and depth of the circuit with binary and with gray code state ordering - as assembled and
+    unrolled into u+cx (transpiler merges most of the X gates into neighbouring u gates on its own there)
+    """
+    header = f"{'moves':>5} | {'ordering':<8} | {'x':>6} | {'gates':>6} | {'depth':>6} | {'-%':>5} | " \
+             f"{'u+cx':>8} | {'depth':>7} | {'-%':>5}"
+    print(header)
+    print("-" * len(header))
+    rows = []
+    for moves_count in moves_counts:
+        flag_rows = random_flag_rows(moves_count, number_of_conditions, seed=moves_count)
+        binary = measure_strategy(strategy, flag_rows, number_of_conditions, shots, gray_code_ordering=False)
+        gray = measure_strategy(strategy, flag_rows, number_of_conditions, shots, gray_code_ordering=True)
+        for ordering, row in [("binary", binary), ("gray", gray)]:
+            row["ordering"] = ordering
+            rows.append(row)
+            print(f"{row['moves']:>5} | {ordering:<8} | {row['x']:>6} | {row['assembled_gates']:>6} | "
+                  f"{row['assembled_depth']:>6} | "
+                  f"{100 * (1 - row['assembled_depth'] / binary['assembled_depth']):>5.1f} | "
+                  f"{row['gates']:>8} | {row['depth']:>7} | {100 * (1 - row['depth'] / binary['depth']):>5.1f}")
+    return rows
+
+
+def random_positions(count: int = 300, seed: int = 0) -> list[tuple]:
+    """(board, side, packed valid moves, board maps) of random positions with at least two moves"""
+    generator = random.Random(seed)
+    game = CheckersGame()
+    positions = []
+    while len(positions) < count:
+        board, side = random_board(generator, 0.4), generator.choice(
+            [CheckersGame.PLAYER_1_COLOR, CheckersGame.PLAYER_2_COLOR])
+        game.set_position(board, side)
+        if len(game.packed_valid_moves) >= 2:
+            positions.append((board, side, game.packed_valid_moves, (game.attack_maps, game.defence_maps)))
+    return positions
+
+
+def flagging_seconds(number_of_conditions: int, positions: list[tuple], repeat: int = 5) -> float:
+    """best of `repeat` average seconds `QuantumBot.flag_conditions` takes per position"""
+    bot = QuantumBot(number_of_conditions)
+
+    def flag_all():
+        for board, side, moves, board_maps in positions:
+            bot.update_current_side(side)
+            bot.board_maps = board_maps
+            bot.valid_moves_with_flags = bot.assign_valid_board_moves_to_q_states(moves)
+            bot.flag_conditions(board)
+
+    return min(timeit.repeat(flag_all, number=1, repeat=repeat)) / len(positions)
+
+
+def report_condition_scaling(condition_counts=None, moves_count: int = 8, strategy: str = "default",
+                             shots: int = 1000, max_simulated_qubits: int = 24, positions_count: int = 300):
+    """
+    print how cost grows with every added condition (`conditions.DEFAULT_CONDITIONS` order): circuit size and
+    simulation time at a fixed number of moves, and classical flagging time per position on random positions.
+    +gates / +flag are the growth over the previous row
+    """
+    condition_counts = condition_counts or range(1, len(DEFAULT_CONDITIONS) + 1)
+    positions = random_positions(positions_count)
+    header = f"{'n':>2} | {'condition':<18} | {'qubits':>6} | {'gates':>8} | {'+gates':>7} | {'depth':>7} | " \
+             f"{'build s':>8} | {'sim s':>8} | {'flag us':>8} | {'+flag':>6}"
+    print(header)
+    print("-" * len(header))
+    rows = []
+    for number_of_conditions in condition_counts:
+        flag_rows = random_flag_rows(moves_count, number_of_conditions, seed=moves_count)
+        row = measure_strategy(strategy, flag_rows, number_of_conditions, shots,
+                               max_simulated_qubits=max_simulated_qubits)
+        row["conditions"] = number_of_conditions
+        row["flag_s"] = flagging_seconds(number_of_conditions, positions)
+        previous = rows[-1] if rows else row
+        rows.append(row)
+        simulation = "-" if row["simulation_s"] is None else f"{row['simulation_s']:.3f}"
+        print(f"{number_of_conditions:>2} | {DEFAULT_CONDITIONS[number_of_conditions - 1]:<18} | "
+              f"{row['qubits']:>6} | {row['gates']:>8} | {row['gates'] - previous['gates']:>+7} | "
+              f"{row['depth']:>7} | {row['build_s']:>8.3f} | {simulation:>8} | {row['flag_s'] * 1e6:>8.1f} | "
+              f"{(row['flag_s'] - previous['flag_s']) * 1e6:>+6.1f}")
+    return rows
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="compare MCX synthesis strategies, state orderings or condition counts of the bot circuit")
+    parser.add_argument("--ordering", action="store_true", help="binary vs gray code state ordering")
+    parser.add_argument("--conditions", action="store_true",
+                        help="cost of every added condition, 1 to all of `conditions.DEFAULT_CONDITIONS`")
+    args = parser.parse_args()
+
+    if args.ordering:
+        report_state_ordering()
+    elif args.conditions:
+        report_condition_scaling()
+    else:
+        report()
@@ -0,0 +1,90 @@
+from array import array
+from numbers import Integral
+
+import numpy as np
+
+MOVE_TYPEHINT = list[int, int, int, int] | tuple[int, int, int, int]
+
+# move packed into 16 bits: capture flag | from square | to square, square = row * 8 + col
+#   bit  12      - move is a capture (jump over two squares)
+#   bits 6 - 11  - from square
+#   bits 0 - 5   - to square
+# rows and columns keep the 3-bit layout `sr << 9 | sc << 6 | er << 3 | ec`, the capture bit is on top of it
+SQUARE_BITS = 6
+SQUARE_MASK = (1 << SQUARE_BITS) - 1
+CAPTURE_FLAG = 1 << (2 * SQUARE_BITS)
+TYPECODE = "H"  # array('H') - unsigned 16 bit, same as np.uint16
+DTYPE = np.uint16
+LAST_SQUARE = 63
+
+
+def pack_move(start_row: int, start_col: int, end_row: int, end_col: int) -> int:
+    capture = CAPTURE_FLAG if abs(end_row - start_row) == 2 else 0
+    return capture | (start_row * 8 + start_col) << SQUARE_BITS | end_row * 8 + end_col
+
+
+def unpack_move(packed: int) -> tuple[int, int, int, int]:
+    start_row, start_col = divmod(packed >> SQUARE_BITS & SQUARE_MASK, 8)
+    end_row, end_col = divmod(packed & SQUARE_MASK, 8)
+    return start_row, start_col, end_row, end_col
+
+
+def from_square(packed: int) -> int:
+    return packed >> SQUARE_BITS & SQUARE_MASK
+
+
+def to_square(packed: int) -> int:
+    return packed & SQUARE_MASK
+
+
+def is_capture(packed: int) -> bool:
+    return bool(packed & CAPTURE_FLAG)
+
+
+def move_step(packed: int) -> tuple[int, int]:
+    """(row step, col step) of one diagonal square in the direction of the move"""
+    start_row, start_col = divmod(packed >> SQUARE_BITS & SQUARE_MASK, 8)
+    end_row, end_col = divmod(packed & SQUARE_MASK, 8)
+    return (1 if end_row > start_row else -1), (1 if end_col > start_col else -1)
+
+
+def transform_packed(packed: int) -> int:
+    """move turned by 180 degrees (see `symmetry.transform_move`) - square becomes 63 - square"""
+    return packed & CAPTURE_FLAG | (LAST_SQUARE - from_square(packed)) << SQUARE_BITS | LAST_SQUARE - to_square(packed)
+
+
+def pack_moves(moves) -> array:
+    """
+    array('H') of packed moves, from tuples/lists of 4 coordinates or already packed ints (arrays of those are
+    returned as they are, NumPy ones are converted)
+
+    NumPy scalars are taken as ints too - packed ones and coordinates (int8 rows of `unpack_move_matrix` would
+    overflow in `pack_move` as they are)
+    """
+    if isinstance(moves, array):
+        return moves
+    if isinstance(moves, np.ndarray):
+        if moves.ndim == 2:
+            moves = pack_move_matrix(moves)
+        return array(TYPECODE, moves.astype(DTYPE).tobytes())
+    return array(TYPECODE, [int(move) if isinstance(move, Integral) else pack_move(*map(int, move)) for move in moves])
+
+
+def unpack_moves(packed_moves) -> list[tuple[int, int, int, int]]:
+    """tuple view - for the UI and anything else that wants coordinates"""
+    return [unpack_move(packed) for packed in packed_moves]
+
+
+def pack_move_matrix(moves: np.ndarray) -> np.ndarray:
+    """(M, 4) coordinates (as from `batch_moves.batch_valid_moves`) into (M,) uint16"""
+    moves = moves.astype(np.int32, copy=False)
+    capture = (np.abs(moves[:, 2] - moves[:, 0]) == 2) * CAPTURE_FLAG
+    packed = capture | (moves[:, 0] * 8 + moves[:, 1]) << SQUARE_BITS | moves[:, 2] * 8 + moves[:, 3]
+    return packed.astype(DTYPE)
+
+
+def unpack_move_matrix(packed: np.ndarray) -> np.ndarray:
+    """(M,) packed moves into (M, 4) int8 coordinates"""
+    packed = np.asarray(packed, dtype=np.int32)
+    start, end = packed >> SQUARE_BITS & SQUARE_MASK, packed & SQUARE_MASK
+    return np.stack([start // 8, start % 8, end // 8, end % 8], axis=1).astype(np.int8)
@@ -0,0 +1,96 @@
+import threading
+from array import array
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from game_logic import CheckersGame
+
+BOARD_TYPEHINT = list[list[str]]
+PONDER_RESULT_TYPEHINT = dict[str, list | dict]
+
+
+class Ponderer:
+    """
+    Speculative bot evaluation while the human is still thinking.
+
+    As soon as human's valid moves are known, every position they can lead to is evaluated in a background pool
+    (one `QuantumBot` per worker thread, bots are stateful). When human finally moves, `take` hands over result for
+    the position that was actually reached - immediately if it's already computed, otherwise as soon as the
+    running evaluation finishes. All the other branches get cancelled: ones that did not start yet are never run,
+    ones that are running have their results thrown away.
+    """
+
+    def __init__(self, bot_factory, workers: int = 2):
+        """
+        :param bot_factory: callable returning new `QuantumBot`
+        """
+        self.bot_factory = bot_factory
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ponder")
+        self.thread_state = threading.local()
+        self.pondered: dict[tuple[str, str], Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _thread_bot(self):
+        if not hasattr(self.thread_state, "bot"):
+            self.thread_state.bot = self.bot_factory()
+        return self.thread_state.bot
+
+    def start(self, game: CheckersGame):
+        """enumerate human moves of the current position and start evaluating bot replies to each of them"""
+        self.cancel()
+        for move in game.packed_valid_moves:
+            branch = CheckersGame()
+            branch.set_position(game.board, game.current_player)
+            branch.execute_packed_move(move)
+            branch.switch_player()
+            branch.calculate_current_valid_moves()
+            key = CheckersGame.position_key(branch.board, branch.current_player)
+            if key in self.pondered:  # two different moves can lead to the same position
+                continue
+            self.pondered[key] = self.pool.submit(
+                self._evaluate, branch.packed_valid_moves, branch.board, branch.current_player)
+
+    def _evaluate(self, valid_moves: array, board: BOARD_TYPEHINT, side: str):
+        if not valid_moves:  # human wins with that move, nothing for the bot to do
+            return None
+        bot = self._thread_bot()
+        bot.update_current_side(side)
+        bot.calculate_recommendations(valid_moves, board)
+        bot.parse_recommendations_human_readable()
+        return {
+            "human_readable_predictions": bot.human_readable_predictions,
+            "recommendations": bot.parse_recommendations_bot_use(),
+            # counts, flags and result - game bot takes them over (`QuantumBot.restore_recommendation_state`)
+            "recommendation_state": bot.recommendation_state(),
+        }
+
+    def take(self, board: BOARD_TYPEHINT, side: str, timeout: float | None = None) -> PONDER_RESULT_TYPEHINT | None:
+        """
+        result pondered for the position, None when position was not pondered (or evaluation failed)
+
+        every other pondered branch is cancelled
+        """
+        future = self.pondered.pop(CheckersGame.position_key(board, side), None)
+        self.cancel()
+        if future is None:
+            self.misses += 1
+            return None
+        try:
+            result = future.result(timeout)
+        except Exception:  # timeout or failed evaluation - caller will just calculate the move on its own
+            result = None
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def cancel(self):
+        """drop all the pondered branches, the ones already running finish but nobody will read their results"""
+        for future in self.pondered.values():
+            future.cancel()
+        self.pondered.clear()
+
+    def shutdown(self):
+        self.cancel()
+        self.pool.shutdown(wait=False, cancel_futures=True)
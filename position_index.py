@@ -0,0 +1,361 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+from game_archive import GameArchive
+from game_logic import CheckersGame
+from packed_moves import pack_move, unpack_move
+from symmetry import canonicalize, map_move
+
+BOARD_TYPEHINT = list[list[str]]
+
+# 2 bits per square, hint marks ("G") are not a part of the position
+SQUARE_CODES = {" ": 0, "G": 0, CheckersGame.PLAYER_1_COLOR: 1, CheckersGame.PLAYER_2_COLOR: 2}
+SIDE_CODES = {CheckersGame.PLAYER_1_COLOR: 1, CheckersGame.PLAYER_2_COLOR: 2}
+
+
+def canonical_position(board: BOARD_TYPEHINT, side: str) -> tuple[bytes, int]:
+    """board packed into 16 bytes (4 squares per byte, row after row) and side code - exact key of a position"""
+    packed = bytearray(16)
+    for index in range(64):
+        packed[index >> 2] |= SQUARE_CODES[board[index >> 3][index & 7]] << ((index & 3) * 2)
+    return bytes(packed), SIDE_CODES[side]
+
+
+class _MappedRecords:
+    """
+    memory-mapped file of fixed size records, grows by doubling (file is extended and mapped again)
+
+    record 0 is never used, so 0 can be a "null" link in record chains
+    """
+
+    def __init__(self, path: str, record: struct.Struct, initial_capacity: int = 1024):
+        self.path = path
+        self.record = record
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "wb") as records_file:
+                records_file.truncate(record.size * initial_capacity)
+        self.file = open(path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.map) // self.record.size
+
+    def ensure_capacity(self, records: int):
+        if records <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < records:
+            capacity *= 2
+        self.map.close()
+        self.file.truncate(capacity * self.record.size)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+
+    def read(self, index: int) -> tuple:
+        return self.record.unpack_from(self.map, index * self.record.size)
+
+    def write(self, index: int, *values):
+        self.record.pack_into(self.map, index * self.record.size, *values)
+
+    def flush(self):
+        self.map.flush()
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+class PositionIndex:
+    """
+    Persistent hash index: position (board + side to move) -> where it occurred and what bot recommended there.
+
+    three memory-mapped files next to `path`:
+        <path>.idx  header + open addressing hash table, slot = (packed board, side, occurrences, first occurrence,
+                    evaluations, first move statistic); board is stored in full, so there are no false matches
+        <path>.occ  occurrence records (game id, ply, next), chained from the slot - newest first
+        <path>.mst  per move statistics (move, times recommended, summed probability, next), chained from the slot
+
+    `lookup` is a hash, a few slot probes and walk over the move statistics - occurrences are counted in the slot,
+    their chain (as long as the number of games for opening positions) is walked only by `occurrences_of`, no
+    archive is touched. Table doubles (and gets rehashed) when it is 70% full. `update` indexes only games appended since the last call, the header remembers
+    how far the archive was read - it is written together with every indexed game, so an interrupted update picks
+    up after the last complete game and never counts a game twice. Changes are flushed to disk every
+    `flush_every` games of `update` and at the end of `update`/`add_recommendations`/`close`.
+
+    `symmetric` index keeps positions in their canonical form (`symmetry.canonicalize`), so a position and its
+    colour swapped, turned around twin share one entry; moves are mapped both ways, callers never see the
+    canonical form. Plies of occurrences are the original ones. It is fixed when the index is created.
+    """
+    # version 2: moves are stored in the `packed_moves` encoding (capture bit added), version 1 files don't open
+    MAGIC = b"QPIDX002"
+    SYMMETRIC_MAGIC = b"QPIDS002"
+    HEADER = struct.Struct("<8sQQQQQ")  # magic, slots, used slots, archive offset, occurrences, move statistics
+    SLOT = struct.Struct("<16sB3xIIII")  # board, side (0 = empty slot), occurrences, head, evaluations, stats head
+    OCCURRENCE = struct.Struct("<QI4xI")  # game id, ply, next occurrence
+    MOVE_STATISTIC = struct.Struct("<HxxIdI")  # packed move, times recommended, summed probability, next statistic
+    MAX_LOAD_FACTOR = 0.7
+    HEADER_SLOTS = -(-HEADER.size // SLOT.size)  # records at the start of table file taken by the header
+
+    def __init__(self, path: str | os.PathLike, initial_slots: int = 4096, symmetric: bool = False):
+        self.path = str(path)
+        self.symmetric = symmetric
+        table_path = f"{self.path}.idx"
+        if not os.path.exists(table_path) or os.path.getsize(table_path) == 0:
+            self._create_table(table_path, initial_slots)
+        self.table = _MappedRecords(table_path, self.SLOT)
+        magic, self.slots, self.used, self.archive_offset, self.occurrence_records, self.statistic_records = \
+            self.HEADER.unpack_from(self.table.map, 0)
+        if magic not in (self.MAGIC, self.SYMMETRIC_MAGIC):
+            raise ValueError(f"{table_path} is not a position index")
+        if (magic == self.SYMMETRIC_MAGIC) != symmetric:
+            raise ValueError(f"{table_path} was created {'with' if magic == self.SYMMETRIC_MAGIC else 'without'} "
+                             f"symmetry, open it with symmetric={magic == self.SYMMETRIC_MAGIC}")
+        self.occurrences = _MappedRecords(f"{self.path}.occ", self.OCCURRENCE)
+        self.move_statistics = _MappedRecords(f"{self.path}.mst", self.MOVE_STATISTIC)
+
+    @property
+    def magic(self) -> bytes:
+        return self.SYMMETRIC_MAGIC if self.symmetric else self.MAGIC
+
+    def _create_table(self, table_path: str, slots: int):
+        with open(table_path, "wb") as table_file:
+            table_file.write(self.HEADER.pack(self.magic, slots, 0, 0, 0, 0))
+            table_file.truncate(self.SLOT.size * (self.HEADER_SLOTS + slots))
+
+    def _key(self, board: BOARD_TYPEHINT, side: str) -> tuple[bytes, int, bool]:
+        """(packed board, side code, are moves transformed) of the position as it is stored"""
+        transformed = False
+        if self.symmetric:
+            board, side, transformed = canonicalize(board, side)
+        return *canonical_position(board, side), transformed
+
+    def _write_header(self):
+        self.HEADER.pack_into(self.table.map, 0, self.magic, self.slots, self.used, self.archive_offset,
+                              self.occurrence_records, self.statistic_records)
+
+    @staticmethod
+    def _hash(packed_board: bytes, side: int) -> int:
+        return int.from_bytes(hashlib.blake2b(packed_board + bytes([side]), digest_size=8).digest(), "little")
+
+    def _find_slot(self, packed_board: bytes, side: int) -> tuple[int, bool]:
+        """(record number of the slot, is the position there) - records before `HEADER_SLOTS` hold the header"""
+        slot = self._hash(packed_board, side) % self.slots
+        while True:
+            stored_board, stored_side, *_ = self.table.read(self.HEADER_SLOTS + slot)
+            if stored_side == 0:
+                return self.HEADER_SLOTS + slot, False
+            if stored_side == side and stored_board == packed_board:
+                return self.HEADER_SLOTS + slot, True
+            slot = (slot + 1) % self.slots
+
+    def _grow(self):
+        """double the table and move every position to its new slot"""
+        first_slot = self.HEADER_SLOTS * self.SLOT.size
+        entries = [self.table.read(slot) for slot in range(self.HEADER_SLOTS, self.HEADER_SLOTS + self.slots)]
+        self.slots *= 2
+        self.table.ensure_capacity(self.HEADER_SLOTS + self.slots)
+        self.table.map[first_slot:] = bytes(len(self.table.map) - first_slot)
+        for entry in entries:
+            if entry[1] != 0:
+                slot, _ = self._find_slot(entry[0], entry[1])
+                self.table.write(slot, *entry)
+        self._write_header()
+
+    def _slot_for_update(self, packed_board: bytes, side_code: int) -> tuple[int, tuple]:
+        slot, found = self._find_slot(packed_board, side_code)
+        if found:
+            return slot, self.table.read(slot)
+        if self.used + 1 > self.slots * self.MAX_LOAD_FACTOR:
+            self._grow()
+            slot, _ = self._find_slot(packed_board, side_code)
+        self.used += 1
+        entry = (packed_board, side_code, 0, 0, 0, 0)
+        self.table.write(slot, *entry)
+        self._write_header()  # slot count never lags behind the slots in the file
+        return slot, entry
+
+    def add_occurrence(self, board: BOARD_TYPEHINT, side: str, game_id: int, ply: int, record: int | None = None):
+        """
+        :param record: occurrence record to use, reserved by the caller (see `update`) - next free one otherwise
+        :returns: False when this exact occurrence is the newest one of the position already (re-indexed game)
+        """
+        packed_board, side_code, _ = self._key(board, side)
+        slot, (packed_board, side_code, occurrences, head, evaluations, statistics_head) = \
+            self._slot_for_update(packed_board, side_code)
+        if head and self.occurrences.read(head)[:2] == (game_id, ply):
+            return False
+        if record is None:
+            self.occurrence_records += 1
+            record = self.occurrence_records
+        self.occurrences.ensure_capacity(record + 1)
+        # record first, then the slot pointing at it
+        self.occurrences.write(record, game_id, ply, head)
+        self.table.write(slot, packed_board, side_code, occurrences + 1, record, evaluations, statistics_head)
+        return True
+
+    def add_recommendations(self, board: BOARD_TYPEHINT, side: str, recommendations: list, flush: bool = True):
+        """
+        aggregate one bot evaluation of the position
+
+        :param recommendations: [[move, probability], ...] as returned by `QuantumBot.parse_recommendations_bot_use`
+        """
+        packed_board, side_code, transformed = self._key(board, side)
+        slot, (packed_board, side_code, occurrences, head, evaluations, statistics_head) = \
+            self._slot_for_update(packed_board, side_code)
+        for move, probability in recommendations:
+            packed_move = pack_move(*map_move(move, transformed))
+            statistic = statistics_head
+            while statistic:
+                stored_move, recommended, probability_sum, following = self.move_statistics.read(statistic)
+                if stored_move == packed_move:
+                    self.move_statistics.write(
+                        statistic, stored_move, recommended + 1, probability_sum + probability, following)
+                    break
+                statistic = following
+            else:
+                self.statistic_records += 1
+                self.move_statistics.ensure_capacity(self.statistic_records + 1)
+                self.move_statistics.write(self.statistic_records, packed_move, 1, probability, statistics_head)
+                statistics_head = self.statistic_records
+        self.table.write(slot, packed_board, side_code, occurrences, head, evaluations + 1, statistics_head)
+        if flush:
+            self.flush()
+
+    def update(self, archive: GameArchive, flush_every: int = 256) -> int:
+        """
+        index games appended to the archive since the last update, returns number of positions added
+
+        a game is replayed in full before anything of it is written (a broken record stops the update with nothing
+        of that game indexed). Its occurrence records are reserved in the header before any is written, and the
+        header moves `archive_offset` past the game right after. A game interrupted halfway is indexed again by
+        the next update: positions it got to are recognized (newest occurrence is this game and ply - a position
+        occurs at most once per game, rules have no cycles) and skipped, records of the first attempt stay unused
+
+        :param flush_every: games between flushes to disk, header in the mapped file is current after every game
+        """
+        added = 0
+        game = CheckersGame()
+        for games, (game_id, next_game_id, record) in enumerate(archive.iter_game_spans(self.archive_offset), 1):
+            game.reset_everything()
+            positions = []
+            for move in record["moves"]:
+                positions.append(([row[:] for row in game.board], game.current_player))
+                game.execute_move(*move)
+                game.switch_player()
+            first_record = self.occurrence_records + 1
+            self.occurrence_records += len(positions)
+            self._write_header()
+            for ply, (board, side) in enumerate(positions):
+                added += self.add_occurrence(board, side, game_id, ply, first_record + ply)
+            self.archive_offset = next_game_id
+            self._write_header()
+            if not games % flush_every:
+                self.flush()
+        self.flush()
+        return added
+
+    def ingest_dataset(self, archive: GameArchive, dataset_path: str | os.PathLike) -> int:
+        """
+        aggregate bot statistics from `DatasetPipeline` output, positions are restored by replaying their games
+
+        :returns: number of evaluations added
+        """
+        added = 0
+        game = CheckersGame()
+        replayed_game_id = None
+        moves = []
+        with open(dataset_path, "rb") as dataset_file:
+            for line in dataset_file:
+                result = json.loads(line)
+                # dataset goes through games ply after ply, so replay just continues unless the game changes
+                if result["game_id"] != replayed_game_id or result["ply"] < game.ply:
+                    if result["game_id"] != replayed_game_id:
+                        replayed_game_id = result["game_id"]
+                        moves = archive.read_game(replayed_game_id)["moves"]
+                    game.reset_everything()
+                for move in moves[game.ply:result["ply"]]:
+                    game.execute_move(*move)
+                    game.switch_player()
+                self.add_recommendations(game.board, result["side"], result["recommendations"], flush=False)
+                added += 1
+        self.flush()
+        return added
+
+    def lookup(self, board: BOARD_TYPEHINT, side: str) -> dict | None:
+        """
+        bot statistics of the position and how many times it occurred, None if it never occurred nor was evaluated
+
+        reads the slot and the move statistics only, whatever the number of occurrences (see `occurrences_of`)
+
+        :returns: {"occurrence_count": int, "evaluations": int,
+            "recommendations": [(move, mean probability, times recommended), ...] (best first)}
+        """
+        packed_board, side_code, transformed = self._key(board, side)
+        slot, found = self._find_slot(packed_board, side_code)
+        if not found:
+            return None
+        _, _, occurrence_count, _, evaluations, statistics_head = self.table.read(slot)
+        recommendations = []
+        while statistics_head:
+            packed_move, recommended, probability_sum, statistics_head = self.move_statistics.read(statistics_head)
+            recommendations.append((map_move(unpack_move(packed_move), transformed), probability_sum / evaluations, recommended))
+        recommendations.sort(key=lambda statistic: -statistic[1])
+        return {"occurrence_count": occurrence_count, "evaluations": evaluations, "recommendations": recommendations}
+
+    def occurrences_of(self, board: BOARD_TYPEHINT, side: str, limit: int | None = None) -> list[tuple[int, int]]:
+        """
+        (game_id, ply) of the position's occurrences, newest first - a walk over the chain, `limit` of them at most
+
+        opening positions occur in every game, take only as many as you need
+        """
+        slot, found = self._find_slot(*self._key(board, side)[:2])
+        if not found:
+            return []
+        head = self.table.read(slot)[3]
+        occurrences = []
+        while head and (limit is None or len(occurrences) < limit):
+            game_id, ply, head = self.occurrences.read(head)
+            occurrences.append((game_id, ply))
+        return occurrences
+
+    def occurrence_count(self, board: BOARD_TYPEHINT, side: str) -> int:
+        """how many times the position occurred (0 - never), stored in the slot - no chain walk"""
+        slot, found = self._find_slot(*self._key(board, side)[:2])
+        return self.table.read(slot)[2] if found else 0
+
+    def __len__(self) -> int:
+        """number of distinct positions"""
+        return self.used
+
+    def flush(self):
+        self._write_header()
+        self.table.flush()
+        self.occurrences.flush()
+        self.move_statistics.flush()
+
+    def close(self):
+        self.flush()
+        self.table.close()
+        self.occurrences.close()
+        self.move_statistics.close()
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="index positions of a game archive (and bot statistics of a dataset)")
+    parser.add_argument("archive")
+    parser.add_argument("index", help="path prefix of index files")
+    parser.add_argument("--dataset", help="output of dataset_pipeline.py to aggregate bot statistics from")
+    parser.add_argument("--symmetric", action="store_true", help="one entry for a position and its symmetric twin")
+    args = parser.parse_args()
+
+    position_index = PositionIndex(args.index, symmetric=args.symmetric)
+    game_archive = GameArchive(args.archive)
+    print(f"{position_index.update(game_archive)} positions indexed, {len(position_index)} distinct")
+    if args.dataset:
+        print(f"{position_index.ingest_dataset(game_archive, args.dataset)} evaluations aggregated")
+    position_index.close()
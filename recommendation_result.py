@@ -0,0 +1,140 @@
+from array import array
+from collections.abc import Sequence
+
+import numpy as np
+
+from packed_moves import TYPECODE, unpack_move
+
+COUNTS_TYPEHINT = dict[str, int]
+ASSIGNED_STATES_TYPEHINT = dict[str, list]
+
+
+class RecommendationResult:
+    """
+    Outcome of one recommendation job: state index, packed move and probability per valid move, as arrays.
+
+    built in one pass over the counts (`from_counts`); probability of a move is its counts plus an equal share of
+    the shots that landed on states with no move, over all the shots. Sorting and anything text is done lazily -
+    `order` when the first sorted view is asked for, `human_readable` rows only when they get displayed.
+    """
+
+    def __init__(self, state_indices: np.ndarray, moves: array, counts: np.ndarray, shots: int, state_bits: int):
+        self.state_indices = state_indices
+        self.moves = moves
+        self.counts = counts
+        self.shots = shots
+        self.state_bits = state_bits
+        # shots outside of valid states are split evenly
+        self.leftover = (shots - int(counts.sum())) // len(counts) if len(counts) else 0
+        self.probabilities = (counts + self.leftover) / shots
+        self._order: np.ndarray | None = None
+
+    @classmethod
+    def from_counts(cls, assigned_states: ASSIGNED_STATES_TYPEHINT, counts: COUNTS_TYPEHINT, shots: int):
+        """
+        :param assigned_states: `QuantumBot.valid_moves_with_flags`, its order is kept
+        :param counts: measured (or computed) counts, keyed by the results register bitstring - states without
+            a move are only counted in as the missing shots
+        """
+        state_bits = len(next(iter(assigned_states), ""))
+        state_indices = np.array([int(state, 2) for state in assigned_states], dtype=np.int64)
+        state_counts = np.array([counts.get(state, 0) for state in assigned_states], dtype=np.int64)
+        moves = array(TYPECODE, [row[0] for row in assigned_states.values()])
+        return cls(state_indices, moves, state_counts, shots, state_bits)
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    @property
+    def order(self) -> np.ndarray:
+        """positions of the moves from the most to the least probable one (stable, ties keep the state order)"""
+        if self._order is None:
+            self._order = np.argsort(-self.probabilities, kind="stable")
+        return self._order
+
+    @property
+    def best_move(self) -> tuple[int, int, int, int] | None:
+        if not len(self):
+            return None
+        return unpack_move(self.moves[self.order[0]])
+
+    def packed(self) -> list[list[int, float]]:
+        """[[packed move, probability], ...] sorted by probability"""
+        probabilities = self.probabilities.tolist()
+        return [[self.moves[index], probabilities[index]] for index in self.order.tolist()]
+
+    def bot_use(self) -> list[list[tuple[int, int, int, int], float]]:
+        """format of `QuantumBot.parse_recommendations_bot_use` - moves decoded into tuples"""
+        return [[unpack_move(move), probability] for move, probability in self.packed()]
+
+    def confidence_intervals(self, z: float = 1.96) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (lower, upper) bounds of every probability - Wilson score interval with shots as trials, z = 1.96 is 95%.
+        Narrows with the square root of shots, what a partial result of `QuantumBot.stream_recommendations` is
+        judged by
+        """
+        trials = self.shots
+        probabilities = np.clip(self.probabilities, 0.0, 1.0)
+        denominator = 1 + z * z / trials
+        centre = (probabilities + z * z / (2 * trials)) / denominator
+        half_width = z * np.sqrt(probabilities * (1 - probabilities) / trials + z * z / (4 * trials * trials)) \
+            / denominator
+        return np.clip(centre - half_width, 0.0, 1.0), np.clip(centre + half_width, 0.0, 1.0)
+
+    def best_is_separated(self, z: float = 1.96) -> bool:
+        """lower bound of the best move is above upper bound of the runner-up - more shots won't change the pick"""
+        if len(self) < 2:
+            return True
+        lower, upper = self.confidence_intervals(z)
+        best, runner_up = self.order[:2]
+        return bool(lower[best] > upper[runner_up])
+
+    def human_readable(self, intervals: bool = False) -> "PredictionRows":
+        """rows of the sidebar table, formatted one by one as they are read"""
+        return PredictionRows(self, intervals)
+
+
+class PredictionRows(Sequence):
+    """
+    [quantum state, move, probability XX.XX%] rows in the order of `RecommendationResult.order` - a read only
+    list to the renderers, a row is formatted the first time it is read and kept
+
+    with `intervals` probability is XX.XX±Y.YY%, ± half width of the 95% confidence interval
+    """
+
+    def __init__(self, result: RecommendationResult, intervals: bool = False):
+        self.result = result
+        self.half_widths = None
+        if intervals:
+            lower, upper = result.confidence_intervals()
+            self.half_widths = ((upper - lower) / 2).tolist()
+        self.rows: list[list[str] | None] = [None] * len(result)
+        # plain ints, reading single NumPy items is slower than converting once
+        self.order = result.order.tolist()
+        self.counts = result.counts.tolist()
+        self.state_indices = result.state_indices.tolist()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self.rows)))]
+        row = self.rows[index]
+        if row is None:
+            row = self.rows[index] = self._format(index)
+        return row
+
+    def _format(self, index: int) -> list[str]:
+        result = self.result
+        position = self.order[index]
+        start_row, start_col, end_row, end_col = unpack_move(result.moves[position])
+        fixed_counts = int((self.counts[position] + result.leftover) * 10000 / result.shots)
+        probability = f"{fixed_counts // 100:2}.{fixed_counts % 100:02}"
+        if self.half_widths is not None:
+            probability += f"±{self.half_widths[position] * 100:.2f}"
+        return [
+            f"|{self.state_indices[position]:0{result.state_bits}b}>",
+            f"{8 - start_row}{chr(start_col + 65)} -> {8 - end_row}{chr(end_col + 65)}",
+            probability + "%",
+        ]
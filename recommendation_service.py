@@ -0,0 +1,311 @@
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+from game_logic import CheckersGame
+
+BOARD_TYPEHINT = list[list[str]]
+RECOMMENDATIONS_TYPEHINT = list[list]
+
+
+class RecommendationService:
+    """
+    Local JSON-lines server handing out bot moves to any number of front-ends, no pygame involved.
+
+    Each request line is a JSON object:
+        {"id": 1, "method": "recommend", "board": [[" ", "B", ...], ...], "side": "B"}
+        {"id": 2, "method": "metrics"}
+    and each response line carries the same id plus either "result" or "error".
+    "recommend" result is a list of [move, probability] pairs, sorted from the best move (`parse_recommendations_bot_use`)
+
+    Requests arriving within `batch_window` seconds are gathered (up to `max_batch_size`) and run as one simulator job.
+    Pending requests are held in a bounded queue - when it's full, readers stop consuming their sockets, and clients
+    get slowed down by plain transport flow control (backpressure). Every simulator job runs in its own worker thread
+    with a bot instance of its own, so at most `max_concurrent_jobs` jobs are ever executed at once.
+    """
+    LATENCY_WINDOW = 1000  # how many latest requests latency percentiles are calculated over
+
+    def __init__(self, bot_factory, batch_window: float = 0.01, max_batch_size: int = 16, max_pending: int = 64,
+                 max_concurrent_jobs: int = 1, shots: int = 10000):
+        """
+        :param bot_factory: callable returning new `QuantumBot` (or anything exposing `calculate_recommendations_batch`)
+        """
+        self.bot_factory = bot_factory
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.max_pending = max_pending
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.shots = shots
+
+        self.queue: asyncio.Queue | None = None
+        self.server: asyncio.AbstractServer | None = None
+        self.executor: ThreadPoolExecutor | None = None
+        self.workers: list[asyncio.Task] = []
+
+        self.requests_total = 0
+        self.errors_total = 0
+        self.jobs_total = 0
+        self.max_queue_depth = 0
+        self.batch_sizes = deque(maxlen=self.LATENCY_WINDOW)
+        self.latencies = deque(maxlen=self.LATENCY_WINDOW)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0, unix_path: str | None = None):
+        """start listening, with port=0 OS picks free one - check `address` afterwards"""
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrent_jobs, thread_name_prefix="q-bot")
+        self.workers = [
+            asyncio.create_task(self._batch_worker(self.bot_factory())) for _ in range(self.max_concurrent_jobs)]
+        if unix_path is not None:
+            self.server = await asyncio.start_unix_server(self._handle_connection, path=unix_path)
+        else:
+            self.server = await asyncio.start_server(self._handle_connection, host=host, port=port)
+        return self
+
+    @property
+    def address(self):
+        """(host, port) for TCP server, path for unix socket one"""
+        return self.server.sockets[0].getsockname()
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.executor.shutdown(wait=True)
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """read requests line by line, responses are written back as soon as their batch finishes"""
+        write_lock = asyncio.Lock()
+        pending = set()
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                    self.errors_total += 1
+                    await self._respond(writer, write_lock, {"id": None, "error": f"malformed request: {e}"})
+                    continue
+                if not isinstance(request, dict):
+                    # valid JSON, but not an object - `[]`, `1`, `"x"`...
+                    self.errors_total += 1
+                    await self._respond(writer, write_lock, {"id": None, "error": "malformed request"})
+                    continue
+                # waiting here when queue is full is what provides the backpressure
+                task = await self._dispatch(request, writer, write_lock)
+                if task is not None:
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+            await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request: dict, writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+        request_id = request.get("id")
+        method = request.get("method")
+        if method == "metrics":
+            await self._respond(writer, write_lock, {"id": request_id, "result": self.metrics()})
+            return None
+        if method != "recommend":
+            self.errors_total += 1
+            await self._respond(writer, write_lock, {"id": request_id, "error": f"unknown method: {method}"})
+            return None
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((request.get("board"), request.get("side"), future, time.perf_counter()))
+        self.requests_total += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        return asyncio.create_task(self._respond_when_done(request_id, future, writer, write_lock))
+
+    async def _respond_when_done(self, request_id, future: asyncio.Future, writer, write_lock):
+        try:
+            response = {"id": request_id, "result": await future}
+        except Exception as e:
+            self.errors_total += 1
+            response = {"id": request_id, "error": str(e)}
+        await self._respond(writer, write_lock, response)
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, write_lock: asyncio.Lock, response: dict):
+        async with write_lock:
+            writer.write(json.dumps(response, separators=(",", ":")).encode("utf-8") + b"\n")
+            await writer.drain()
+
+    async def _collect_batch(self) -> list:
+        """wait for the first request, then keep gathering for `batch_window` seconds or until batch is full"""
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _batch_worker(self, bot):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = []
+            positions = []
+            for board, side, future, enqueued in await self._collect_batch():
+                try:
+                    positions.append(self.prepare_position(board, side))
+                except (ValueError, TypeError, KeyError) as e:
+                    future.set_exception(ValueError(f"invalid position: {e}"))
+                    continue
+                batch.append((future, enqueued))
+            if not batch:
+                continue
+
+            try:
+                recommendations = await loop.run_in_executor(self.executor, self._evaluate, bot, positions)
+            except Exception as e:
+                for future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            self.jobs_total += 1
+            self.batch_sizes.append(len(batch))
+            for (future, enqueued), recommendation in zip(batch, recommendations):
+                self.latencies.append(finished - enqueued)
+                if not future.done():
+                    future.set_result([[list(move), probability] for move, probability in recommendation])
+
+    @staticmethod
+    def prepare_position(board: BOARD_TYPEHINT, side: str):
+        """validate request and compute its valid moves, returns (valid_moves, board, side)"""
+        if side not in CheckersGame.PLAYER_BOARD_DIRECTION:
+            raise ValueError(f"side should be one of: {list(CheckersGame.PLAYER_BOARD_DIRECTION)}")
+        if not (isinstance(board, list) and len(board) == 8 and all(len(row) == 8 for row in board)):
+            raise ValueError("board should be 8x8 list of rows")
+        game = CheckersGame()
+        game.set_position(board, side)
+        return game.packed_valid_moves, game.board, side
+
+    def _evaluate(self, bot, positions) -> list[RECOMMENDATIONS_TYPEHINT]:
+        """runs in worker thread; positions without any move don't need simulator at all"""
+        to_simulate = [position for position in positions if position[0]]
+        simulated = iter(bot.calculate_recommendations_batch(to_simulate, shots=self.shots))
+        return [next(simulated) if position[0] else [] for position in positions]
+
+    def metrics(self) -> dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+            "jobs_total": self.jobs_total,
+            "mean_batch_size": sum(self.batch_sizes) / len(self.batch_sizes) if self.batch_sizes else None,
+            "latency_p50": percentile(0.5),
+            "latency_p95": percentile(0.95),
+            "latency_max": latencies[-1] if latencies else None,
+        }
+
+
+class RecommendationClient:
+    """
+    Minimal asyncio client of `RecommendationService`, many requests can be in flight over one connection
+
+    usage:
+        client = await RecommendationClient.connect(*service.address)
+        best_moves = await client.recommend(board, "B")
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.pending: dict[int, asyncio.Future] = {}
+        self.ids = count()
+        self.reading_task = asyncio.create_task(self._read_responses())
+
+    @classmethod
+    async def connect(cls, host: str = "127.0.0.1", port: int = 0):
+        return cls(*await asyncio.open_connection(host, port))
+
+    @classmethod
+    async def connect_unix(cls, path: str):
+        return cls(*await asyncio.open_unix_connection(path))
+
+    async def _read_responses(self):
+        while line := await self.reader.readline():
+            response = json.loads(line)
+            future = self.pending.pop(response.get("id"), None)
+            if future is None or future.done():
+                continue
+            if "error" in response:
+                future.set_exception(RuntimeError(response["error"]))
+            else:
+                future.set_result(response["result"])
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("service closed the connection"))
+
+    async def _call(self, request: dict):
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        self.writer.write(json.dumps({"id": request_id, **request}).encode("utf-8") + b"\n")
+        await self.writer.drain()
+        return await future
+
+    async def recommend(self, board: BOARD_TYPEHINT, side: str) -> RECOMMENDATIONS_TYPEHINT:
+        return await self._call({"method": "recommend", "board": board, "side": side})
+
+    async def metrics(self) -> dict:
+        return await self._call({"method": "metrics"})
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.reading_task.cancel()
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    from bot_logic import QuantumBot
+    from cost_model import CostModel
+    from schedule_tuner import ScheduleTable
+    from tablebase import Tablebase
+
+    parser = ArgumentParser(description="serve quantum bot recommendations over local socket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="unix socket path, overrides host and port")
+    parser.add_argument("--window", type=float, default=0.01, help="micro-batching window in seconds")
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument("--jobs", type=int, default=1, help="concurrent simulator jobs")
+    args = parser.parse_args()
+
+    # loaded once, shared by the bots of all the workers
+    schedule_table = ScheduleTable.load(number_of_conditions=3)
+    tablebase, cost_model = Tablebase.load(), CostModel.load()
+
+    async def main():
+        service = RecommendationService(
+            lambda: QuantumBot(3, schedule_table=schedule_table, tablebase=tablebase, cost_model=cost_model),
+            batch_window=args.window, max_batch_size=args.max_batch,
+            max_concurrent_jobs=args.jobs)
+        await service.start(args.host, args.port, args.unix)
+        print(f"listening on {service.address}")
+        await service.serve_forever()
+
+    asyncio.run(main())
@@ -0,0 +1,191 @@
+import os
+
+# has to be set before pygame initializes its display, dummy driver renders into memory - no window is needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import random
+import time
+import tracemalloc
+from collections import defaultdict
+
+from game_logic import CheckersGame
+from game_visualization import GameDisplayEngine, pygame
+
+# drawing methods timed separately, `pyg_draw_board` includes the last two
+MEASURED_METHODS = ["pyg_draw_board", "pyg_draw_quantum_states", "pyg_draw_move_hints", "pyg_draw_last_player_move"]
+
+
+def prediction_table(game: CheckersGame, generator: random.Random) -> list[list[str]]:
+    """table in the format of `QuantumBot.parse_recommendations_human_readable`, random probabilities"""
+    moves = game.valid_moves
+    if not moves:
+        return []
+    state_bits = max(1, (len(moves) - 1).bit_length())
+    weights = [generator.random() for _ in moves]
+    total = sum(weights)
+    table = [[f"|{index:0{state_bits}b}>", game.human_readable_possible_move(*move), f"{weight / total:6.2%}"]
+             for index, (move, weight) in enumerate(zip(moves, weights))]
+    table.sort(key=lambda row: -float(row[2][:-1]))
+    return table
+
+
+def scripted_frames(games: int = 3, seed: int = 0):
+    """
+    frames of random games (same seed - same script): board, selected piece, its hints, last move and predictions
+
+    every position is shown twice - once without and once with a piece selected, like a player picking a piece
+    """
+    generator = random.Random(seed)
+    game = CheckersGame()
+    for _ in range(games):
+        game.reset_everything()
+        game.calculate_current_valid_moves()
+        while game.valid_moves:
+            predictions = prediction_table(game, generator)
+            board = [row[:] for row in game.board]
+            yield board, None, None, game.previous_move_coordinates, predictions
+            selected = generator.choice(game.valid_moves)[:2]
+            hints = [(move[2], move[3]) for move in game.valid_moves if tuple(move[:2]) == tuple(selected)]
+            yield board, selected, hints, game.previous_move_coordinates, predictions
+
+            move = generator.choice(game.valid_moves)
+            game.execute_move(*move)
+            game.save_last_move_coordinates(*move)
+            game.switch_player()
+            game.calculate_current_valid_moves()
+
+
+def _instrument(engine: GameDisplayEngine, timings: dict[str, list[float]], allocations: dict[str, list[int]]):
+    """
+    wrap measured methods of this one engine instance, wrappers record duration of every call - and bytes it left
+    allocated, while tracemalloc is on
+    """
+    for name in MEASURED_METHODS:
+        method = getattr(engine, name)
+
+        def timed(*args, _method=method, _name=name, **kwargs):
+            tracing = tracemalloc.is_tracing()
+            before = tracemalloc.get_traced_memory()[0] if tracing else 0
+            start = time.perf_counter()
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                if tracing:
+                    allocations[_name].append(tracemalloc.get_traced_memory()[0] - before)
+                else:
+                    timings[_name].append(elapsed)
+
+        setattr(engine, name, timed)
+
+
+def _draw_frame(engine: GameDisplayEngine, frame):
+    """what one iteration of `Game.pyg_main` draws"""
+    board, selected, hints, last_move, predictions = frame
+    engine.pyg_draw_board(board, selected, hints, last_move)
+    engine.pyg_draw_quantum_states(predictions)
+    pygame.display.flip()
+
+
+def distribution(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": percentile(0.5),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "max": ordered[-1],
+    }
+
+
+def run(games: int = 3, seed: int = 0, repeats: int = 3, warmup_frames: int = 10) -> dict:
+    """
+    draw the scripted frames `repeats` times and measure them in two passes:
+
+    timing   - per method and per frame wall time, nothing else running
+    memory   - tracemalloc on (it slows everything down, hence the separate pass): bytes allocated per frame that
+               stayed allocated, and peak during the frame; only Python allocations are visible, memory SDL
+               takes for surfaces is not
+
+    :returns: {"frames": distribution of frame seconds, "methods": {name: distribution of seconds},
+        "allocated": distribution of bytes, "peak": distribution of bytes,
+        "method_allocated": {name: distribution of bytes}}
+    """
+    if pygame is None:
+        raise RuntimeError("pygame is not installed, rendering can't be benchmarked")
+    frames = list(scripted_frames(games, seed))
+    engine = GameDisplayEngine("pygame")
+    timings = defaultdict(list)
+    allocations = defaultdict(list)
+
+    for frame in frames[:warmup_frames]:  # fonts get cached, first blits are slower
+        _draw_frame(engine, frame)
+
+    _instrument(engine, timings, allocations)
+    frame_times = []
+    for _ in range(repeats):
+        for frame in frames:
+            start = time.perf_counter()
+            _draw_frame(engine, frame)
+            frame_times.append(time.perf_counter() - start)
+    method_times = {name: distribution(timings[name]) for name in MEASURED_METHODS}
+
+    allocated, peaks = [], []
+    tracemalloc.start()
+    try:
+        for frame in frames:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            _draw_frame(engine, frame)
+            after, peak = tracemalloc.get_traced_memory()
+            allocated.append(after - before)
+            peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+    pygame.quit()
+
+    return {
+        "frames": distribution(frame_times),
+        "methods": method_times,
+        "allocated": distribution(allocated),
+        "peak": distribution(peaks),
+        "method_allocated": {name: distribution(allocations[name]) for name in MEASURED_METHODS},
+    }
+
+
+def report(games: int = 3, seed: int = 0, repeats: int = 3) -> dict:
+    """print frame and per-method time distributions (milliseconds) and allocations per frame (bytes)"""
+    results = run(games, seed, repeats)
+    header = f"{'':<26} | {'count':>6} | {'mean':>8} | {'p50':>8} | {'p95':>8} | {'p99':>8} | {'max':>8}"
+    print(header.replace(" " * 26, f"{'ms':<26}", 1))
+    print("-" * len(header))
+    for name, stats in [("frame", results["frames"]), *results["methods"].items()]:
+        print(f"{name:<26} | {stats['count']:>6} | {stats['mean'] * 1e3:>8.3f} | {stats['p50'] * 1e3:>8.3f} | "
+              f"{stats['p95'] * 1e3:>8.3f} | {stats['p99'] * 1e3:>8.3f} | {stats['max'] * 1e3:>8.3f}")
+    print()
+    print(header.replace(" " * 26, f"{'bytes':<26}", 1))
+    print("-" * len(header))
+    allocation_rows = [("frame allocated", results["allocated"]), ("frame peak", results["peak"]),
+                       *results["method_allocated"].items()]
+    for name, stats in allocation_rows:
+        print(f"{name:<26} | {stats['count']:>6} | {stats['mean']:>8.0f} | {stats['p50']:>8} | "
+              f"{stats['p95']:>8} | {stats['p99']:>8} | {stats['max']:>8}")
+    return results
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="headless frame time benchmark of the pygame renderer")
+    parser.add_argument("--games", type=int, default=3, help="random games the frames are scripted from")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=3, help="times every frame is drawn in the timing pass")
+    args = parser.parse_args()
+
+    report(args.games, args.seed, args.repeats)
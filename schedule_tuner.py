@@ -0,0 +1,217 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+from collections import Counter
+
+from game_logic import CheckersGame
+
+SCHEDULE_TYPEHINT = tuple[int, ...]
+HISTOGRAM_TYPEHINT = tuple[int, ...]
+
+
+class ScheduleTable:
+    """
+    Lookup table of tuned grover iteration schedules, produced offline by `tune` (`python schedule_tuner.py`).
+
+    Grover oracle marks states by *how many* conditions they meet (adder + magic number), so probabilities a
+    schedule produces depend only on number of moves and on the flag histogram - how many moves meet 0, 1, 2...
+    conditions - not on which move is which. That pair is the key of the table.
+    """
+    # next to this module, not in the working directory - whatever directory the game starts from
+    DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schedule_table.json")
+
+    def __init__(self, number_of_conditions: int, entries: dict[str, dict] | None = None):
+        self.number_of_conditions = number_of_conditions
+        self.entries = entries or {}
+
+    @staticmethod
+    def key(moves_count: int, histogram: HISTOGRAM_TYPEHINT) -> str:
+        return f"{moves_count}:{','.join(str(count) for count in histogram)}"
+
+    @staticmethod
+    def flag_histogram(flag_rows, number_of_conditions: int) -> HISTOGRAM_TYPEHINT:
+        """number of moves meeting exactly 0, 1, ... `number_of_conditions` conditions"""
+        histogram = [0] * (number_of_conditions + 1)
+        for flags in flag_rows:
+            histogram[sum(flags)] += 1
+        return tuple(histogram)
+
+    def lookup(self, moves_count: int, histogram: HISTOGRAM_TYPEHINT) -> SCHEDULE_TYPEHINT | None:
+        """tuned schedule, None when that shape was never tuned"""
+        entry = self.entries.get(self.key(moves_count, histogram))
+        return None if entry is None else tuple(entry["schedule"])
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_PATH, number_of_conditions: int | None = None):
+        """
+        table stored in `path`, None if there is no file (or it was tuned for different number of conditions)
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path) as table_file:
+            stored = json.load(table_file)
+        if number_of_conditions is not None and stored["number_of_conditions"] != number_of_conditions:
+            return None
+        return cls(stored["number_of_conditions"], stored["entries"])
+
+    def save(self, path: str = DEFAULT_PATH):
+        with open(path, "w") as table_file:
+            json.dump({"number_of_conditions": self.number_of_conditions, "entries": self.entries}, table_file,
+                      indent=2, sort_keys=True)
+
+
+def random_positions(games: int = 100, seed: int = 0):
+    """corpus of positions from random self-play, when there is no archive of real games at hand"""
+    generator = random.Random(seed)
+    game = CheckersGame()
+    for _ in range(games):
+        game.reset_everything()
+        game.calculate_current_valid_moves()
+        while game.packed_valid_moves:
+            yield game.packed_valid_moves, [row[:] for row in game.board], game.current_player
+            game.execute_packed_move(generator.choice(game.packed_valid_moves))
+            game.switch_player()
+            game.calculate_current_valid_moves()
+
+
+def collect_shapes(positions, number_of_conditions: int = 3) -> Counter:
+    """how often every (moves count, flag histogram) shows up in the corpus - flags only, nothing is simulated"""
+    from bot_logic import QuantumBot
+
+    bot = QuantumBot(number_of_conditions)
+    bot.schedule_table = None
+    shapes = Counter()
+    for valid_moves, board, side in positions:
+        bot.update_current_side(side)
+        states = bot.prepare_flagged_states(valid_moves, board)
+        histogram = ScheduleTable.flag_histogram((row[1:-1] for row in states.values()), number_of_conditions)
+        shapes[(len(valid_moves), histogram)] += 1
+    return shapes
+
+
+def flag_rows_for_histogram(histogram: HISTOGRAM_TYPEHINT, number_of_conditions: int) -> list[list[int]]:
+    """any flag rows with given histogram do - oracle only looks at number of conditions met"""
+    rows = []
+    for conditions_met, count in enumerate(histogram):
+        rows.extend([[1] * conditions_met + [0] * (number_of_conditions - conditions_met)] * count)
+    return rows
+
+
+def recommendation_quality(probabilities, scores: list[int]) -> float:
+    """
+    how far is the expected score (conditions met) of the picked move from random pick towards the best pick:
+    0 - no better than uniform, 1 - always one of the best moves
+
+    :param probabilities: probability of every move, in the same order as `scores`; what is missing to 1 (states
+        that are not a move) is spread evenly over moves, same as parsing of counts does
+    """
+    moves_count = len(scores)
+    leftover = (1 - sum(probabilities)) / moves_count
+    expected = sum((probabilities[index] + leftover) * score for index, score in enumerate(scores))
+    mean_score = sum(scores) / moves_count
+    if max(scores) == mean_score:
+        return 0.0
+    return (expected - mean_score) / (max(scores) - mean_score)
+
+
+def candidate_schedules(magic_numbers: list[int], max_length: int, default: SCHEDULE_TYPEHINT):
+    candidates = {tuple(default)}
+    for length in range(max_length + 1):
+        candidates.update(itertools.product(magic_numbers, repeat=length))
+    return sorted(candidates, key=lambda schedule: (len(schedule), schedule))
+
+
+def evaluate_schedules(moves_count: int, histogram: HISTOGRAM_TYPEHINT, schedules, number_of_conditions: int = 3):
+    """exact (statevector) quality and circuit depth of every schedule for one shape"""
+    from qiskit_aer.backends import AerSimulator
+    from bot_logic import QuantumBot
+
+    flag_rows = flag_rows_for_histogram(histogram, number_of_conditions)
+    bot = QuantumBot(number_of_conditions)
+    bot.schedule_table = None
+    circuits = []
+    depths = []
+    for schedule in schedules:
+        bot.default_iteration_schedule = schedule
+        circuit = bot.prepare_circuit_for_flags(flag_rows)
+        depths.append(circuit.depth())
+        exact = circuit.remove_final_measurements(inplace=False)
+        exact.save_probabilities(bot.board_moves_qbit_register[:len(bot.results_register)])
+        circuits.append(exact)
+
+    # states are not 0, 1, 2... in order of the rows (see `QuantumBot.q_order_flagged_states`)
+    state_indices = [int(state, 2) for state in bot.valid_moves_with_flags]
+    scores = [sum(row[1:-1]) for row in bot.valid_moves_with_flags.values()]
+    result = AerSimulator(method="statevector").run(circuits, shots=1).result()
+    return [
+        (schedule, recommendation_quality(result.data(index)["probabilities"][state_indices], scores), depth)
+        for index, (schedule, depth) in enumerate(zip(schedules, depths))
+    ]
+
+
+def pick_schedule(evaluated, tolerance: float):
+    """
+    best quality per unit of depth among schedules whose quality is within `tolerance` of the best one found
+    """
+    best_quality = max(quality for _, quality, _ in evaluated)
+    acceptable = [entry for entry in evaluated if entry[1] >= best_quality - tolerance]
+    return max(acceptable, key=lambda entry: (entry[1] / entry[2], entry[1]))
+
+
+def tune(positions, number_of_conditions: int = 3, max_length: int = 5, tolerance: float = 0.05,
+         max_shapes: int | None = 50, verbose: bool = True) -> ScheduleTable:
+    """
+    search iteration schedules for every position shape found in the corpus (most frequent first)
+
+    :param max_length: longest schedule tried (all combinations of magic numbers), default schedule is tried too
+    :param tolerance: quality (0-1 scale, see `recommendation_quality`) that can be traded for shorter circuit
+    :param max_shapes: only that many most frequent shapes are tuned, the rest keeps the default schedule
+    """
+    from bot_logic import QuantumBot
+
+    shapes = collect_shapes(positions, number_of_conditions)
+    schedules = candidate_schedules(
+        list(range(1, number_of_conditions + 1)), max_length, QuantumBot.ITERATION_SCHEDULE)
+    table = ScheduleTable(number_of_conditions)
+
+    for (moves_count, histogram), occurrences in shapes.most_common(max_shapes):
+        start = time.perf_counter()
+        evaluated = evaluate_schedules(moves_count, histogram, schedules, number_of_conditions)
+        schedule, quality, depth = pick_schedule(evaluated, tolerance)
+        _, default_quality, default_depth = next(
+            entry for entry in evaluated if entry[0] == tuple(QuantumBot.ITERATION_SCHEDULE))
+        table.entries[ScheduleTable.key(moves_count, histogram)] = {
+            "schedule": list(schedule), "quality": quality, "depth": depth,
+            "default_quality": default_quality, "default_depth": default_depth, "occurrences": occurrences,
+        }
+        if verbose:
+            print(f"{moves_count:>3} moves {histogram} x{occurrences}: {schedule} quality {quality:.3f} "
+                  f"depth {depth} (default {default_quality:.3f} / {default_depth}), "
+                  f"{time.perf_counter() - start:.1f} s")
+    return table
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="tune grover iteration schedules over a corpus of positions")
+    parser.add_argument("--archive", help="game archive (JSON lines) to take positions from, random games otherwise")
+    parser.add_argument("--games", type=int, default=100, help="number of random games, when there is no archive")
+    parser.add_argument("--conditions", type=int, default=3)
+    parser.add_argument("--max-length", type=int, default=5, help="6 finds better schedules, but takes ~4x longer")
+    parser.add_argument("--tolerance", type=float, default=0.05)
+    parser.add_argument("--max-shapes", type=int, default=50)
+    parser.add_argument("--output", default=ScheduleTable.DEFAULT_PATH)
+    arguments = parser.parse_args()
+
+    if arguments.archive:
+        from dataset_pipeline import stream_positions
+        from game_archive import GameArchive
+        corpus = ((moves, board, side) for _, _, board, side, moves, _ in
+                  stream_positions(GameArchive(arguments.archive)))
+    else:
+        corpus = random_positions(arguments.games)
+    tuned = tune(corpus, arguments.conditions, arguments.max_length, arguments.tolerance, arguments.max_shapes)
+    tuned.save(arguments.output)
+    print(f"saved {len(tuned.entries)} schedules into {arguments.output}")
@@ -0,0 +1,468 @@
+import random
+import time
+from array import array
+
+from game_logic import CheckersGame
+from packed_moves import CAPTURE_FLAG, SQUARE_BITS, SQUARE_MASK, unpack_move
+from recommendation_result import RecommendationResult
+
+BOARD_TYPEHINT = list[list[str]]
+
+PIECE_SCORE = 100
+MOBILITY_SCORE = 2  # per move of the side to move
+WIN_SCORE = 100_000  # side to move has no moves - lost, minus plies from the root: faster wins score higher
+WIN_THRESHOLD = WIN_SCORE - 1000  # scores beyond are wins or losses
+INFINITY = WIN_SCORE + 1
+# most the bot's opinion of a leaf can add, a fifth of a piece - it breaks ties, doesn't outweigh material
+QUANTUM_LEAF_SCORE = 20
+
+# transposition table bounds
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# random keys of (side, square) and of black to move, position key is xor of the keys of what's on the board
+_zobrist_generator = random.Random(20240601)
+ZOBRIST = {side: [_zobrist_generator.getrandbits(64) for _ in range(64)]
+           for side in (CheckersGame.PLAYER_1_COLOR, CheckersGame.PLAYER_2_COLOR)}
+SIDE_KEY = _zobrist_generator.getrandbits(64)
+
+
+class SearchTimeout(Exception):
+    """time budget of the search ran out, deepest finished iteration stands"""
+
+
+class AlphaBetaSearcher:
+    """
+    Iterative deepening alpha-beta (negamax) over `CheckersGame`, with the quantum bot as a heuristic only.
+
+    search runs on its own copy of the position and moves through it with `CheckersGame.make_move` /
+    `unmake_move` - no board gets copied per node, position key (zobrist) and material are updated incrementally.
+    Positions already searched deep enough are taken from a transposition table, best move of the previous
+    iteration (or of the table) is tried first, then captures. Leaves are settled with a captures-only
+    quiescence search and scored by material and mobility.
+
+    bot is called only where it's bounded: once at the root to order the moves before the first iteration, and
+    for at most `quantum_leaves` leaves per search (then cached by position key). Leaves are evaluated from the
+    `quantum_leaf_depth` iteration on, first ones a well ordered iteration reaches are those of its principal
+    variation. Everything else is classical, so a search costs at most 1 + `quantum_leaves` simulations whatever
+    depth it gets to. Bot is handed back as it was given - its side and current recommendations are restored
+    after every search.
+    """
+    TIME_CHECK_INTERVAL = 256  # nodes between clock reads
+    # what a search changes on the bot, put back once it is over
+    BOT_STATE = ("player_identifier", "enemy", "direction", "valid_moves_with_flags", "counts", "current_job_shots",
+                 "iteration_schedule", "board_maps", "last_engine")
+
+    def __init__(self, bot=None, time_budget: float = 1.0, max_depth: int = 32, order_root: bool = True,
+                 quantum_leaves: int = 4, quantum_leaf_depth: int = 4, shots: int = 1000,
+                 max_table_entries: int = 1 << 20):
+        """
+        :param bot: `QuantumBot` used for ordering and leaves, None for a purely classical search
+        :param time_budget: seconds per search, iteration running when they are up is thrown away
+        :param quantum_leaves: leaves per search the bot gets to evaluate, 0 turns leaf evaluation off
+        :param quantum_leaf_depth: first iteration whose leaves the bot evaluates, shallower ones are classical
+        :param max_table_entries: transposition table is cleared once it grows past this
+        """
+        self.bot = bot
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.order_root = order_root
+        self.quantum_leaves = quantum_leaves
+        self.quantum_leaf_depth = quantum_leaf_depth
+        self.shots = shots
+        self.max_table_entries = max_table_entries
+
+        self.game = CheckersGame()
+        self.game.track_maps = False
+        # key -> (depth, score, bound, best move)
+        self.table: dict[int, tuple[int, int, int, int | None]] = {}
+        # key -> score the bot gave the leaf, kept between searches (same position, same opinion)
+        self.quantum_values: dict[int, int] = {}
+
+        self.key = 0
+        self.key_stack: list[int] = []
+        self.material: dict[str, int] = {}
+        self.deadline = 0.0
+        self.iteration_depth = 0
+        self.horizon_reached = False
+
+        self.nodes = 0
+        self.bot_calls = 0
+        self.simulations = 0
+        self.quantum_leaf_calls = 0
+        self.bot_seconds = 0.0
+        self.last_report: dict | None = None
+
+    def _position_key(self) -> int:
+        game = self.game
+        key = SIDE_KEY if game.current_player == CheckersGame.PLAYER_2_COLOR else 0
+        for square, cell in enumerate(cell for row in game.board for cell in row):
+            if cell in ZOBRIST:
+                key ^= ZOBRIST[cell][square]
+        return key
+
+    def _make(self, move: int):
+        game = self.game
+        side = game.current_player
+        start, end = move >> SQUARE_BITS & SQUARE_MASK, move & SQUARE_MASK
+        key = self.key ^ ZOBRIST[side][start] ^ ZOBRIST[side][end] ^ SIDE_KEY
+        if move & CAPTURE_FLAG:
+            enemy = game.current_enemy_player
+            key ^= ZOBRIST[enemy][(start + end) // 2]  # jumped square sits halfway, row and column
+            self.material[enemy] -= 1
+        self.key_stack.append(self.key)
+        self.key = key
+        game.make_move(move)
+
+    def _unmake(self, move: int, valid_moves: array):
+        game = self.game
+        game.unmake_move(valid_moves)
+        self.key = self.key_stack.pop()
+        if move & CAPTURE_FLAG:
+            self.material[game.current_enemy_player] += 1
+
+    def _tick(self):
+        self.nodes += 1
+        if not self.nodes % self.TIME_CHECK_INTERVAL and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+    def _recommend(self, valid_moves: array) -> RecommendationResult:
+        """bot's recommendations for the current position of the search"""
+        game = self.game
+        start = time.perf_counter()
+        self.bot.update_current_side(game.current_player)
+        # maps of the search game are not kept up to date, bot builds its own
+        self.bot.calculate_recommendations(valid_moves, game.board, shots=self.shots)
+        self.bot_seconds += time.perf_counter() - start
+        self.bot_calls += 1
+        if self.bot.last_engine == "aer":
+            self.simulations += 1
+        return self.bot.recommendation_result()
+
+    def _quantum_leaf_value(self) -> int:
+        """
+        0 .. QUANTUM_LEAF_SCORE - how much the bot's best move stands out from the rest (uniform probabilities
+        score 0, a single certain move the full score), 0 without bot or once the leaf budget is used up
+        """
+        value = self.quantum_values.get(self.key)
+        if value is not None:
+            return value
+        valid_moves = self.game.packed_valid_moves
+        if self.bot is None or self.quantum_leaf_calls >= self.quantum_leaves or len(valid_moves) < 2 \
+                or self.iteration_depth < self.quantum_leaf_depth:
+            return 0
+        self.quantum_leaf_calls += 1
+        result = self._recommend(valid_moves)
+        moves_count = len(result)
+        value = round(QUANTUM_LEAF_SCORE * (moves_count * float(result.probabilities.max()) - 1) / (moves_count - 1))
+        self.quantum_values[self.key] = value = max(0, min(QUANTUM_LEAF_SCORE, value))
+        return value
+
+    def evaluate(self) -> int:
+        """static score for the side to move"""
+        game = self.game
+        material = self.material[game.current_player] - self.material[game.current_enemy_player]
+        return material * PIECE_SCORE + MOBILITY_SCORE * len(game.packed_valid_moves)
+
+    def _quiescence(self, alpha: int, beta: int, ply: int, leaf: bool = False) -> int:
+        """captures only, until the position is quiet - side to move can also stand pat on the static score"""
+        self._tick()
+        valid_moves = self.game.packed_valid_moves
+        if not valid_moves:
+            return -WIN_SCORE + ply
+        score = self.evaluate()
+        if leaf:
+            score += self._quantum_leaf_value()
+        if score >= beta:
+            return score
+        alpha = max(alpha, score)
+        for move in valid_moves:
+            if not move & CAPTURE_FLAG:
+                continue
+            self._make(move)
+            score = -self._quiescence(-beta, -alpha, ply + 1)
+            self._unmake(move, valid_moves)
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+        return alpha
+
+    @staticmethod
+    def _ordered(valid_moves: array, first: int | None) -> list[int]:
+        """`first` (table move), then captures, then quiet moves - generation order within each group"""
+        ordered = [move for move in valid_moves if move & CAPTURE_FLAG]
+        ordered += [move for move in valid_moves if not move & CAPTURE_FLAG]
+        if first is not None and first in ordered:
+            ordered.remove(first)
+            ordered.insert(0, first)
+        return ordered
+
+    def _negamax(self, depth: int, alpha: int, beta: int, ply: int) -> int:
+        valid_moves = self.game.packed_valid_moves
+        if depth <= 0 and valid_moves:
+            self.horizon_reached = True
+            return self._quiescence(alpha, beta, ply, leaf=True)
+        self._tick()
+        if not valid_moves:
+            return -WIN_SCORE + ply
+
+        table_move = None
+        entry = self.table.get(self.key)
+        if entry is not None:
+            entry_depth, score, bound, table_move = entry
+            if entry_depth >= depth:
+                score = self._from_table(score, ply)
+                if bound == EXACT or bound == LOWER and score >= beta or bound == UPPER and score <= alpha:
+                    # subtree behind the entry may have been cut off at its depth, unless it ends the game
+                    if abs(score) <= WIN_THRESHOLD:
+                        self.horizon_reached = True
+                    return score
+
+        original_alpha = alpha
+        best_score, best_move = -INFINITY, None
+        for move in self._ordered(valid_moves, table_move):
+            self._make(move)
+            score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            self._unmake(move, valid_moves)
+            if score > best_score:
+                best_score, best_move = score, move
+                alpha = max(alpha, score)
+                if alpha >= beta:
+                    break
+
+        bound = UPPER if best_score <= original_alpha else LOWER if best_score >= beta else EXACT
+        self._store(depth, best_score, bound, best_move, ply)
+        return best_score
+
+    def _store(self, depth: int, score: int, bound: int, move: int | None, ply: int):
+        if len(self.table) >= self.max_table_entries:
+            self.table.clear()
+        self.table[self.key] = (depth, self._to_table(score, ply), bound, move)
+
+    # win scores count plies from the root, the table keeps them counted from the stored position
+    @staticmethod
+    def _to_table(score: int, ply: int) -> int:
+        return score + ply if score > WIN_THRESHOLD else score - ply if score < -WIN_THRESHOLD else score
+
+    @staticmethod
+    def _from_table(score: int, ply: int) -> int:
+        return score - ply if score > WIN_THRESHOLD else score + ply if score < -WIN_THRESHOLD else score
+
+    def _search_root(self, root_moves: list[int], depth: int) -> tuple[int, int]:
+        valid_moves = self.game.packed_valid_moves
+        alpha, best_move = -INFINITY, root_moves[0]
+        for move in root_moves:
+            self._make(move)
+            score = -self._negamax(depth - 1, -INFINITY, -alpha, 1)
+            self._unmake(move, valid_moves)
+            if score > alpha:
+                alpha, best_move = score, move
+        self._store(depth, alpha, EXACT, best_move, 0)
+        return alpha, best_move
+
+    def search(self, board: BOARD_TYPEHINT, side: str, time_budget: float | None = None) -> int | None:
+        """
+        best move (packed, see `packed_moves`) for the side to move, None when it has no moves
+
+        deepens one ply at a time until the time budget, `max_depth` or the end of the game (an iteration that
+        never hit its depth limit, or a forced win / loss) - best move of the deepest finished iteration is
+        played, it is searched first in the next one. Report of the search is kept in `last_report`
+        """
+        start = time.perf_counter()
+        self.deadline = start + (self.time_budget if time_budget is None else time_budget)
+        self.nodes = self.bot_calls = self.simulations = self.quantum_leaf_calls = 0
+        self.bot_seconds = 0.0
+
+        if self.bot is None:
+            return self._search(board, side, start)
+        bot_state = [getattr(self.bot, name) for name in self.BOT_STATE]
+        try:
+            return self._search(board, side, start)
+        finally:
+            for name, value in zip(self.BOT_STATE, bot_state):
+                setattr(self.bot, name, value)
+
+    def _search(self, board: BOARD_TYPEHINT, side: str, start: float) -> int | None:
+        game = self.game
+        game.set_position(board, side)
+        game.clean_hints()
+        game.calculate_current_valid_moves()
+        self.key, self.key_stack = self._position_key(), []
+        flat_board = [cell for row in game.board for cell in row]
+        self.material = {player: flat_board.count(player) for player in ZOBRIST}
+
+        root_moves = list(game.packed_valid_moves)
+        iterations = []
+        best_move = root_moves[0] if root_moves else None
+        if self.bot is not None and self.order_root and len(root_moves) > 1:
+            result = self._recommend(game.packed_valid_moves)
+            probabilities = dict(zip(result.moves, result.probabilities.tolist()))
+            root_moves.sort(key=lambda move: -probabilities[move])
+            best_move = root_moves[0]
+
+        if len(root_moves) > 1:
+            for depth in range(1, self.max_depth + 1):
+                self.iteration_depth = depth
+                self.horizon_reached = False
+                try:
+                    score, best_move = self._search_root(root_moves, depth)
+                except SearchTimeout:
+                    break
+                iterations.append({"depth": depth, "seconds": time.perf_counter() - start, "nodes": self.nodes,
+                                   "score": score, "move": best_move})
+                root_moves.remove(best_move)
+                root_moves.insert(0, best_move)
+                if not self.horizon_reached or abs(score) > WIN_THRESHOLD:
+                    break
+
+        seconds = time.perf_counter() - start
+        self.last_report = {
+            "moves": len(root_moves),
+            "depth": iterations[-1]["depth"] if iterations else 0,
+            "score": iterations[-1]["score"] if iterations else None,
+            "move": best_move,
+            "nodes": self.nodes,
+            "seconds": seconds,
+            "nodes_per_second": self.nodes / seconds if seconds else 0.0,
+            "bot_calls": self.bot_calls,
+            "bot_seconds": self.bot_seconds,
+            "simulations": self.simulations,
+            "iterations": iterations,
+        }
+        return best_move
+
+
+def benchmark_positions(count: int = 10, seed: int = 0) -> list[tuple[BOARD_TYPEHINT, str]]:
+    """positions of random games, somewhere between the opening and the endgame"""
+    generator = random.Random(seed)
+    game = CheckersGame()
+    positions = []
+    while len(positions) < count:
+        game.reset_everything()
+        game.calculate_current_valid_moves()
+        for _ in range(generator.randint(4, 30)):
+            if not game.packed_valid_moves:
+                break
+            game.make_move(generator.choice(game.packed_valid_moves))
+        if len(game.packed_valid_moves) > 1:
+            positions.append(([row[:] for row in game.board], game.current_player))
+    return positions
+
+
+def _minimax(searcher: AlphaBetaSearcher, depth: int, ply: int) -> int:
+    """plain negamax over every move, no pruning and no table - what the searcher should agree with"""
+    valid_moves = searcher.game.packed_valid_moves
+    if depth <= 0 and valid_moves:
+        return _minimax_captures(searcher, ply)
+    if not valid_moves:
+        return -WIN_SCORE + ply
+    best_score = -INFINITY
+    for move in valid_moves:
+        searcher._make(move)
+        best_score = max(best_score, -_minimax(searcher, depth - 1, ply + 1))
+        searcher._unmake(move, valid_moves)
+    return best_score
+
+
+def _minimax_captures(searcher: AlphaBetaSearcher, ply: int) -> int:
+    valid_moves = searcher.game.packed_valid_moves
+    if not valid_moves:
+        return -WIN_SCORE + ply
+    best_score = searcher.evaluate()
+    for move in valid_moves:
+        if move & CAPTURE_FLAG:
+            searcher._make(move)
+            best_score = max(best_score, -_minimax_captures(searcher, ply + 1))
+            searcher._unmake(move, valid_moves)
+    return best_score
+
+
+def validate_against_minimax(count: int = 10, seed: int = 7, depths: tuple[int, ...] = (1, 2, 3)) -> int:
+    """
+    classical search to fixed depths against plain negamax on random positions - pruning, transposition table
+    and move ordering must not change the score
+
+    :returns: number of searches compared, raises RuntimeError on the first mismatch
+    """
+    positions = benchmark_positions(count, seed)
+    compared = 0
+    for depth in depths:
+        for index, (board, side) in enumerate(positions):
+            searcher = AlphaBetaSearcher(None, time_budget=float("inf"), max_depth=depth)
+            searcher.search(board, side)
+            reached = searcher.last_report["depth"]
+            # search leaves the game at the root, key and material included
+            valid_moves = searcher.game.packed_valid_moves
+            expected = -INFINITY
+            for move in valid_moves:
+                searcher._make(move)
+                expected = max(expected, -_minimax(searcher, reached - 1, 1))
+                searcher._unmake(move, valid_moves)
+            if expected != searcher.last_report["score"]:
+                raise RuntimeError(f"position {index} ({side} to move), depth {reached}: search scored "
+                                   f"{searcher.last_report['score']}, negamax {expected}")
+            compared += 1
+    return compared
+
+
+def report(searcher: AlphaBetaSearcher, positions: list[tuple[BOARD_TYPEHINT, str]]) -> list[dict]:
+    """
+    search every position and print per move: depth reached, nodes/sec, bot calls and simulations, and
+    seconds it took to finish every depth (bot calls included); averages over all the moves at the end
+    """
+    header = f"{'#':>3} | {'moves':>5} | {'move':<8} | {'depth':>5} | {'score':>7} | {'nodes':>8} | " \
+             f"{'nodes/s':>8} | {'bot':>3} | {'sim':>3} | time to depth 1, 2, ... (s)"
+    print(header)
+    print("-" * len(header))
+    reports = []
+    for index, (board, side) in enumerate(positions):
+        move = searcher.search(board, side)
+        row = searcher.last_report
+        reports.append(row)
+        to_depth = " ".join(f"{iteration['seconds']:.2f}" for iteration in row["iterations"])
+        print(f"{index:>3} | {row['moves']:>5} | {CheckersGame.human_readable_possible_move(*unpack_move(move)):<8} | "
+              f"{row['depth']:>5} | {row['score'] if row['score'] is not None else '-':>7} | {row['nodes']:>8} | "
+              f"{row['nodes_per_second']:>8.0f} | {row['bot_calls']:>3} | {row['simulations']:>3} | {to_depth}")
+
+    seconds = sum(row["seconds"] for row in reports)
+    bot_seconds = sum(row["bot_seconds"] for row in reports)
+    nodes = sum(row["nodes"] for row in reports)
+    print(f"\nnodes/s {nodes / seconds:.0f} ({nodes / (seconds - bot_seconds):.0f} without the bot, bot took "
+          f"{100 * bot_seconds / seconds:.0f}% of the time)")
+    print(f"simulations per move {sum(row['simulations'] for row in reports) / len(reports):.2f}, "
+          f"bot calls per move {sum(row['bot_calls'] for row in reports) / len(reports):.2f}, "
+          f"mean depth {sum(row['depth'] for row in reports) / len(reports):.1f}")
+    deepest = max(row["depth"] for row in reports)
+    for depth in range(1, deepest + 1):
+        reached = [row["iterations"][depth - 1]["seconds"] for row in reports if row["depth"] >= depth]
+        print(f"depth {depth:>2}: reached in {len(reached):>3} of {len(reports)} moves, "
+              f"mean {sum(reached) / len(reached):.3f} s")
+    return reports
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="alpha-beta search with the quantum bot ordering moves and scoring leaves")
+    parser.add_argument("--positions", type=int, default=10, help="random game positions searched")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--time-budget", type=float, default=1.0, help="seconds per move")
+    parser.add_argument("--quantum-leaves", type=int, default=4, help="leaves per move the bot evaluates")
+    parser.add_argument("--conditions", type=int, default=3, help="number of conditions of the bot")
+    parser.add_argument("--classical", action="store_true", help="search without the bot")
+    parser.add_argument("--validate", action="store_true",
+                        help="only check classical search scores against plain negamax and exit")
+    args = parser.parse_args()
+
+    if args.validate:
+        compared = validate_against_minimax()
+        print(f"alpha-beta search matches plain negamax ({compared} searches compared)")
+        raise SystemExit
+
+    bot = None
+    if not args.classical:
+        from bot_logic import QuantumBot
+        bot = QuantumBot(args.conditions)
+    report(AlphaBetaSearcher(bot, args.time_budget, quantum_leaves=args.quantum_leaves),
+           benchmark_positions(args.positions, args.seed))
@@ -0,0 +1,239 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from array import array
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import count
+
+from game_logic import CheckersGame
+
+MOVE_TYPEHINT = list[int, int, int, int] | tuple[int, int, int, int]
+BOARD_TYPEHINT = list[list[str]]
+
+
+class GameSession:
+    """
+    Lightweight state of a single hosted game - no pygame, no bot, no `CheckersGame` instance attached.
+
+    board is kept as 64-character string (row after row), history as flat unsigned byte array with 4 entries
+    per move (start_row, start_col, end_row, end_col). This keeps a session a handful of small objects instead
+    of nested lists, which is what makes thousands of them per process cheap.
+    """
+    __slots__ = ("session_id", "board", "side", "history", "last_active", "winner")
+
+    STARTING_BOARD = "".join("".join(row) for row in CheckersGame.STARTING_BOARD)
+
+    def __init__(self, session_id: str, board: str | None = None, side: str = CheckersGame.STARTING_PLAYER,
+                 history: array | None = None, winner: str | None = None):
+        self.session_id = session_id
+        self.board = self.STARTING_BOARD if board is None else board
+        self.side = side
+        self.history = array("B") if history is None else history
+        self.last_active = time.monotonic()
+        self.winner = winner
+
+    @staticmethod
+    def pack_board(board: BOARD_TYPEHINT) -> str:
+        return "".join("".join(row) for row in board)
+
+    def board_rows(self) -> BOARD_TYPEHINT:
+        """unpacked, mutable copy of the board in `CheckersGame` format"""
+        return [list(self.board[row * 8:row * 8 + 8]) for row in range(8)]
+
+    def moves_played(self) -> list[tuple[int, int, int, int]]:
+        return [tuple(self.history[i:i + 4]) for i in range(0, len(self.history), 4)]
+
+    def to_dict(self) -> dict:
+        return {
+            "session_id": self.session_id, "board": self.board, "side": self.side,
+            "history": list(self.history), "winner": self.winner
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data["session_id"], data["board"], data["side"], array("B", data["history"]), data["winner"])
+
+
+class SessionManager:
+    """
+    Hosts many concurrent games in one process.
+
+    sessions share a small pool of bot worker threads, each thread owns its own `QuantumBot` and scratch
+    `CheckersGame` (both are stateful, so they can't be shared between threads). Sessions idle for longer than
+    given time can be evicted to `eviction_dir` as JSON files; they are transparently loaded back on next access.
+    """
+
+    def __init__(self, eviction_dir: str, bot_factory=None, bot_workers: int = 2, shots: int = 10000):
+        """
+        :param bot_factory: callable returning new `QuantumBot`, by default bot with 3 conditions and the schedule
+            table, tablebase and cost model found next to the modules (shared by all the bots)
+        """
+        if bot_factory is None:
+            from bot_logic import QuantumBot
+            from cost_model import CostModel
+            from schedule_tuner import ScheduleTable
+            from tablebase import Tablebase
+            schedule_table, tablebase = ScheduleTable.load(number_of_conditions=3), Tablebase.load()
+            cost_model = CostModel.load()
+            bot_factory = lambda: QuantumBot(  # noqa: E731
+                3, schedule_table=schedule_table, tablebase=tablebase, cost_model=cost_model)
+        self.eviction_dir = eviction_dir
+        os.makedirs(eviction_dir, exist_ok=True)
+        self.bot_factory = bot_factory
+        self.shots = shots
+
+        self.sessions: dict[str, GameSession] = {}
+        self.busy_sessions: set[str] = set()  # bot move in progress, never evicted
+        self.lock = threading.RLock()
+        self.ids = count()
+        self.thread_state = threading.local()
+        self.bot_pool = ThreadPoolExecutor(max_workers=bot_workers, thread_name_prefix="session-bot")
+
+    def _scratch_game(self) -> CheckersGame:
+        """per-thread `CheckersGame` used only to run the rules over session boards"""
+        if not hasattr(self.thread_state, "game"):
+            self.thread_state.game = CheckersGame()
+        return self.thread_state.game
+
+    def _thread_bot(self):
+        if not hasattr(self.thread_state, "bot"):
+            self.thread_state.bot = self.bot_factory()
+        return self.thread_state.bot
+
+    def _eviction_path(self, session_id: str) -> str:
+        return os.path.join(self.eviction_dir, f"{session_id}.json")
+
+    def create_session(self) -> str:
+        with self.lock:
+            session_id = f"s{next(self.ids)}"
+            while session_id in self.sessions or os.path.exists(self._eviction_path(session_id)):
+                session_id = f"s{next(self.ids)}"
+            self.sessions[session_id] = GameSession(session_id)
+        return session_id
+
+    def get_session(self, session_id: str) -> GameSession:
+        """returns live session, loading it back from disk when it was evicted"""
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                path = self._eviction_path(session_id)
+                try:
+                    with open(path) as session_file:
+                        session = GameSession.from_dict(json.load(session_file))
+                except FileNotFoundError:
+                    raise KeyError(f"no such session: {session_id}") from None
+                self.sessions[session_id] = session
+                os.remove(path)
+            session.last_active = time.monotonic()
+            return session
+
+    def close_session(self, session_id: str):
+        with self.lock:
+            self.sessions.pop(session_id, None)
+            path = self._eviction_path(session_id)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def valid_moves(self, session_id: str) -> list[tuple[int, int, int, int]]:
+        session = self.get_session(session_id)
+        game = self._scratch_game()
+        game.set_position(session.board_rows(), session.side)
+        return game.valid_moves
+
+    def apply_move(self, session_id: str, move: MOVE_TYPEHINT, expected_ply: int | None = None):
+        """
+        validate and play the move for the side to move
+
+        :param expected_ply: if given, move is rejected when the session has moved on in the meantime
+        """
+        move = tuple(move)
+        with self.lock:
+            session = self.get_session(session_id)
+            if session.winner is not None:
+                raise ValueError(f"game in session {session_id} is already over")
+            if expected_ply is not None and expected_ply != len(session.history) // 4:
+                raise RuntimeError(f"session {session_id} changed while the move was being calculated")
+            game = self._scratch_game()
+            game.set_position(session.board_rows(), session.side)
+            if move not in game.valid_moves:
+                raise ValueError(f"invalid move {move} in session {session_id}")
+
+            game.execute_move(*move)
+            game.switch_player()
+            game.calculate_current_valid_moves()
+            session.board = GameSession.pack_board(game.board)
+            session.side = game.current_player
+            session.history.extend(move)
+            if game.check_lose_game():
+                session.winner = game.current_enemy_player
+
+    def request_bot_move(self, session_id: str) -> Future:
+        """schedule bot move for the side to move, returned future resolves to the executed move (or None)"""
+        with self.lock:
+            session = self.get_session(session_id)
+            if session_id in self.busy_sessions:
+                raise RuntimeError(f"bot is already moving in session {session_id}")
+            self.busy_sessions.add(session_id)
+            snapshot = session.board_rows(), session.side, len(session.history) // 4
+        return self.bot_pool.submit(self._bot_move, session_id, *snapshot)
+
+    def _bot_move(self, session_id: str, board: BOARD_TYPEHINT, side: str, ply: int):
+        try:
+            game = self._scratch_game()
+            game.set_position(board, side)
+            if not game.packed_valid_moves:
+                return None
+            recommendations = self._thread_bot().calculate_recommendations_batch(
+                [(game.packed_valid_moves, game.board, side)], shots=self.shots)[0]
+            best_move = tuple(recommendations[0][0])
+            self.apply_move(session_id, best_move, expected_ply=ply)
+            return best_move
+        finally:
+            with self.lock:
+                self.busy_sessions.discard(session_id)
+
+    def evict_idle(self, max_idle_seconds: float) -> int:
+        """dump sessions that were not touched for a while to disk, returns number of evicted sessions"""
+        threshold = time.monotonic() - max_idle_seconds
+        evicted = 0
+        with self.lock:
+            for session_id, session in list(self.sessions.items()):
+                if session.last_active > threshold or session_id in self.busy_sessions:
+                    continue
+                path = self._eviction_path(session_id)
+                with open(f"{path}.tmp", "w") as session_file:
+                    json.dump(session.to_dict(), session_file, separators=(",", ":"))
+                os.replace(f"{path}.tmp", path)
+                del self.sessions[session_id]
+                evicted += 1
+        return evicted
+
+    def shutdown(self):
+        self.bot_pool.shutdown(wait=True)
+
+    @staticmethod
+    def memory_per_session(sample_size: int = 10000, moves_per_session: int = 20) -> float:
+        """
+        capacity planning figure - average bytes allocated per live session, including its dict entry
+
+        sessions are filled with `moves_per_session` moves of history, to resemble games in progress
+        """
+        sessions = {}
+        history_template = array("B", [5, 0, 4, 1] * moves_per_session)
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        for index in range(sample_size):
+            session = GameSession(f"s{index}", history=array("B", history_template))
+            # boards differ between sessions in practice, so don't let them share the interned starting one
+            session.board = session.board[:-1] + " "
+            sessions[session.session_id] = session
+        after, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return (after - before) / sample_size
+
+
+if __name__ == '__main__':
+    for moves in [0, 20, 60]:
+        print(f"{moves} moves of history: {SessionManager.memory_per_session(moves_per_session=moves):.0f} B/session")
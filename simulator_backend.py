@@ -0,0 +1,218 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from abc import ABC, abstractmethod
+
+from qiskit import QuantumCircuit
+from qiskit_aer.backends import AerSimulator
+
+COUNTS_TYPEHINT = dict[str, int]
+
+
+class MissingRecording(RuntimeError):
+    """replayed circuit (or its shots/seed) was never recorded"""
+
+
+def circuit_fingerprint(circuit: QuantumCircuit) -> str:
+    """
+    structural hash of the circuit itself - every instruction with its parameters and qubit/clbit positions
+
+    independent of the bot state that produced the circuit, so it works for any circuit (including the ones of
+    `calculate_recommendations_batch`); same circuit built twice has the same fingerprint
+    """
+    digest = hashlib.sha256(f"{circuit.num_qubits}|{circuit.num_clbits}".encode("utf-8"))
+    for instruction in circuit.data:
+        operation = instruction.operation
+        digest.update(
+            f"|{operation.name}:{getattr(operation, 'ctrl_state', '')}:{[str(param) for param in operation.params]}:"
+            f"{[circuit.find_bit(qubit).index for qubit in instruction.qubits]}:"
+            f"{[circuit.find_bit(clbit).index for clbit in instruction.clbits]}".encode("utf-8")
+        )
+    return digest.hexdigest()[:32]
+
+
+class SimulatorBackend(ABC):
+    """runs circuits and returns their counts - what `QuantumBot` schedules jobs on (`bot.simulator_backend`)"""
+    name = "base"
+
+    @abstractmethod
+    def run(self, circuits: list[QuantumCircuit], shots: int, seed_simulator: int | None = None
+            ) -> list[COUNTS_TYPEHINT]:
+        """counts of every circuit, in the same order"""
+
+
+class AerBackend(SimulatorBackend):
+    """local Aer simulation, the default one"""
+    name = "aer"
+
+    def __init__(self):
+        self.simulator = AerSimulator()
+
+    def run(self, circuits: list[QuantumCircuit], shots: int, seed_simulator: int | None = None
+            ) -> list[COUNTS_TYPEHINT]:
+        result = self.simulator.run(circuits, shots=shots, seed_simulator=seed_simulator).result()
+        return [result.get_counts(index) for index in range(len(circuits))]
+
+
+class RecordReplayBackend(SimulatorBackend):
+    """
+    Counts keyed by (circuit fingerprint, shots, seed), stored in one gzipped JSON file.
+
+    modes:
+        "record"  run on the wrapped backend and remember the counts (`save` writes them)
+        "replay"  serve recorded counts without simulating anything, `MissingRecording` for anything unknown
+        "verify"  run on the wrapped backend and compare with the recording - what a separate job does to check
+                  recordings still hold for the current simulator; differences land in `mismatches`
+
+    counts of a fixed seed are deterministic for given Aer version, so verification is exact by default;
+    `tolerance` allows total variation distance (0 - 1) between recorded and fresh counts. Jobs without a seed
+    can be recorded too, but they will never verify exactly.
+    """
+    MODES = ["record", "replay", "verify"]
+    VERSION = 1
+
+    def __init__(self, path: str | os.PathLike, mode: str = "replay", backend: SimulatorBackend | None = None,
+                 tolerance: float = 0.0):
+        if mode not in self.MODES:
+            raise ValueError(f"mode should be one of: {self.MODES}")
+        self.path = path
+        self.mode = mode
+        self.backend = backend
+        self.tolerance = tolerance
+        self.recordings: dict[str, COUNTS_TYPEHINT] = self._load(path)
+        if mode == "replay" and not os.path.exists(path):
+            raise ValueError(f"there are no recordings in {path}")
+        self.name = f"{mode}:{os.path.basename(path)}"
+
+        self.replayed = 0
+        self.recorded = 0
+        self.verified = 0
+        self.mismatches: list[tuple[str, float | None]] = []  # (key, total variation distance), None if missing
+
+    @staticmethod
+    def _load(path: str | os.PathLike) -> dict[str, COUNTS_TYPEHINT]:
+        if not os.path.exists(path):
+            return {}
+        with gzip.open(path, "rt", encoding="utf-8") as recordings_file:
+            stored = json.load(recordings_file)
+        if stored.get("version") != RecordReplayBackend.VERSION:
+            raise ValueError(f"{path} holds recordings of unsupported version {stored.get('version')}")
+        return stored["recordings"]
+
+    def _wrapped(self) -> SimulatorBackend:
+        if self.backend is None:
+            self.backend = AerBackend()
+        return self.backend
+
+    @staticmethod
+    def key(circuit: QuantumCircuit, shots: int, seed_simulator: int | None) -> str:
+        return f"{circuit_fingerprint(circuit)}:{shots}:{seed_simulator}"
+
+    @staticmethod
+    def distance(recorded: COUNTS_TYPEHINT, fresh: COUNTS_TYPEHINT) -> float:
+        """total variation distance of two count distributions"""
+        recorded_total = sum(recorded.values()) or 1
+        fresh_total = sum(fresh.values()) or 1
+        return sum(abs(recorded.get(state, 0) / recorded_total - fresh.get(state, 0) / fresh_total)
+                   for state in recorded.keys() | fresh.keys()) / 2
+
+    def run(self, circuits: list[QuantumCircuit], shots: int, seed_simulator: int | None = None
+            ) -> list[COUNTS_TYPEHINT]:
+        keys = [self.key(circuit, shots, seed_simulator) for circuit in circuits]
+        if self.mode == "replay":
+            missing = [key for key in keys if key not in self.recordings]
+            if missing:
+                raise MissingRecording(f"{len(missing)} of {len(keys)} circuits were not recorded, first: {missing[0]}")
+            self.replayed += len(keys)
+            return [dict(self.recordings[key]) for key in keys]
+
+        counts = self._wrapped().run(circuits, shots, seed_simulator)
+        for key, fresh in zip(keys, counts):
+            if self.mode == "record":
+                self.recordings[key] = dict(fresh)
+                self.recorded += 1
+                continue
+            self.verified += 1
+            if key not in self.recordings:
+                self.mismatches.append((key, None))
+                continue
+            distance = self.distance(self.recordings[key], fresh)
+            if distance > self.tolerance:
+                self.mismatches.append((key, distance))
+        return counts
+
+    def save(self):
+        """write recordings atomically (temporary file renamed into place)"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "wb") as raw_file, \
+                    gzip.open(raw_file, "wt", encoding="utf-8") as recordings_file:
+                json.dump({"version": self.VERSION, "recordings": self.recordings}, recordings_file,
+                          separators=(",", ":"), sort_keys=True)
+            os.replace(temporary_path, self.path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+
+    def report(self) -> dict:
+        return {
+            "mode": self.mode,
+            "recordings": len(self.recordings),
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+            "verified": self.verified,
+            "mismatches": len(self.mismatches),
+        }
+
+
+def record_games(path: str | os.PathLike, games: int = 5, number_of_conditions: int = 3, shots: int = 1000,
+                 seed: int = 0, mode: str = "record") -> RecordReplayBackend:
+    """
+    play bot-vs-random games with fixed seeds through a recording backend - reference workload for both recording
+    and the verification job (same seeds build the same circuits), `mode="verify"` checks them
+    """
+    import random
+    from bot_logic import QuantumBot
+    from game_logic import CheckersGame
+
+    backend = RecordReplayBackend(path, mode)
+    bot = QuantumBot(number_of_conditions)
+    bot.simulator_backend = backend
+    generator = random.Random(seed)
+    game = CheckersGame()
+    for _ in range(games):
+        game.reset_everything()
+        game.calculate_current_valid_moves()
+        while game.packed_valid_moves:
+            bot.update_current_side(game.current_player)
+            bot.prepare_flagged_states(game.packed_valid_moves, game.board)
+            bot.q_assemble_master_circuit()
+            bot.run_master_circuit(shots, seed_simulator=generator.randrange(2 ** 31))
+            game.execute_packed_move(generator.choice(game.packed_valid_moves))
+            game.switch_player()
+            game.calculate_current_valid_moves()
+    if mode == "record":
+        backend.save()
+    return backend
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="record simulator counts of a reference workload, or verify them")
+    parser.add_argument("mode", choices=["record", "verify"])
+    parser.add_argument("path", help="recordings file (.json.gz)")
+    parser.add_argument("--games", type=int, default=5)
+    parser.add_argument("--shots", type=int, default=1000)
+    args = parser.parse_args()
+
+    used_backend = record_games(args.path, args.games, shots=args.shots, mode=args.mode)
+    print(used_backend.report())
+    if used_backend.mismatches:
+        for mismatched_key, mismatch_distance in used_backend.mismatches[:10]:
+            print(f"mismatch {mismatched_key}: {'not recorded' if mismatch_distance is None else mismatch_distance}")
+        raise SystemExit(1)
@@ -0,0 +1,86 @@
+import random
+
+from game_logic import CheckersGame
+
+BOARD_TYPEHINT = list[list[str]]
+MOVE_TYPEHINT = list[int, int, int, int] | tuple[int, int, int, int]
+MOVES_LIST_TYPEHINT = list[list[int, int, int, int]] | list[tuple[int, int, int, int]]
+
+# board turned by 180 degrees with colours swapped is the same position for the other side: directions in
+# `PLAYER_BOARD_DIRECTION` are mirror images and dark squares stay dark ((7 - row) + (7 - col) has the same parity).
+# Mirroring only rows or only columns would move pieces onto light squares, so this is the only symmetry.
+CANONICAL_SIDE = CheckersGame.PLAYER_1_COLOR
+SWAPPED_COLORS = {
+    CheckersGame.PLAYER_1_COLOR: CheckersGame.PLAYER_2_COLOR,
+    CheckersGame.PLAYER_2_COLOR: CheckersGame.PLAYER_1_COLOR,
+}
+LAST = 7
+
+
+def transform_board(board: BOARD_TYPEHINT) -> BOARD_TYPEHINT:
+    """turned by 180 degrees, colours swapped (hint marks stay hint marks)"""
+    return [[SWAPPED_COLORS.get(cell, cell) for cell in reversed(row)] for row in reversed(board)]
+
+
+def transform_move(move: MOVE_TYPEHINT) -> tuple[int, int, int, int]:
+    start_row, start_col, end_row, end_col = move
+    return LAST - start_row, LAST - start_col, LAST - end_row, LAST - end_col
+
+
+def canonicalize(board: BOARD_TYPEHINT, side: str) -> tuple[BOARD_TYPEHINT, str, bool]:
+    """
+    canonical form of the position: (board, side, transformed) - side to move is always `CANONICAL_SIDE`, so both
+    variants of a position end up as one. `transformed` tells whether moves have to go through `transform_move`
+    """
+    if side == CANONICAL_SIDE:
+        return board, side, False
+    if side not in SWAPPED_COLORS:
+        raise ValueError(f"unknown side {side!r}")
+    return transform_board(board), CANONICAL_SIDE, True
+
+
+# the transform is its own inverse, so the same functions map into the canonical form and back out of it
+def map_move(move: MOVE_TYPEHINT, transformed: bool) -> tuple[int, int, int, int]:
+    return transform_move(move) if transformed else tuple(move)
+
+
+def map_moves(moves: MOVES_LIST_TYPEHINT, transformed: bool) -> list[tuple[int, int, int, int]]:
+    return [map_move(move, transformed) for move in moves]
+
+
+def map_recommendations(recommendations: list, transformed: bool) -> list:
+    """
+    [[move, probability, ...], ...] (as from `QuantumBot.parse_recommendations_bot_use` or `PositionIndex.lookup`)
+    with moves mapped, anything after the move is kept as is
+    """
+    return [[map_move(move, transformed), *rest] for move, *rest in recommendations]
+
+
+def validate(count: int = 500, seed: int = 0) -> int:
+    """
+    transformed position has the transformed moves (as a set, their order differs) and the transform is an
+    involution - returns number of positions checked
+    """
+    from batch_moves import random_board
+
+    generator = random.Random(seed)
+    game = CheckersGame()
+    for _ in range(count):
+        board = random_board(generator, generator.uniform(0.1, 0.6))
+        side = generator.choice(list(SWAPPED_COLORS))
+        if transform_board(transform_board(board)) != board:
+            raise RuntimeError(f"transform is not an involution for {board}")
+        game.set_position(board, side)
+        moves = set(map_moves(game.valid_moves, True))
+
+        game.set_position(transform_board(board), SWAPPED_COLORS[side])
+        if set(map(tuple, game.valid_moves)) != moves:
+            raise RuntimeError(f"moves of the transformed position differ for {board}, {side}")
+        _, canonical_side, transformed = canonicalize(board, side)
+        if canonical_side != CANONICAL_SIDE or transformed != (side != CANONICAL_SIDE):
+            raise RuntimeError(f"{side} is not canonicalized")
+    return count
+
+
+if __name__ == '__main__':
+    print(f"{validate()} positions checked")
@@ -0,0 +1,336 @@
+import mmap
+import os
+import random
+import struct
+import time
+from array import array
+from itertools import combinations
+from math import comb
+
+from batch_moves import move_kinds
+from game_logic import CheckersGame
+
+BOARD_TYPEHINT = list[list[str]]
+MOVE_TYPEHINT = list[int, int, int, int] | tuple[int, int, int, int]
+
+# pieces never leave dark squares (every move is diagonal), so only these 32 are indexed
+DARK_SQUARES = [(row, col) for row in range(8) for col in range(8) if (row + col) % 2 == 1]
+DARK_SQUARE_INDEX = {square: index for index, square in enumerate(DARK_SQUARES)}
+SIDES = [CheckersGame.PLAYER_1_COLOR, CheckersGame.PLAYER_2_COLOR]
+
+# one byte per position: result in the top 2 bits, distance to result (plies) in the other 6
+WIN = 1 << 6
+LOSS = 2 << 6
+DRAW = 3 << 6
+RESULT_MASK = 3 << 6
+MAX_DISTANCE = (1 << 6) - 1
+RESULT_NAMES = {WIN: "win", LOSS: "loss", DRAW: "draw"}
+
+
+def _move_table() -> list[list[list[tuple[int, int, int]]]]:
+    """
+    [side][dark square] -> possible moves (destination, jumped square or -1, kind order) with the board geometry
+    of `CheckersGame.possible_moves_for_piece`, occupancy is checked later
+    """
+    table = []
+    for side in SIDES:
+        side_moves = []
+        for row, col in DARK_SQUARES:
+            moves = []
+            for kind_index, (row_shift, col_shift, beating) in enumerate(
+                    move_kinds(CheckersGame.PLAYER_BOARD_DIRECTION[side])):
+                destination = (row + row_shift, col + col_shift)
+                if destination not in DARK_SQUARE_INDEX:
+                    continue
+                jumped = DARK_SQUARE_INDEX[(row + row_shift // 2, col + col_shift // 2)] if beating else -1
+                moves.append((DARK_SQUARE_INDEX[destination], jumped, kind_index))
+            side_moves.append(moves)
+        table.append(side_moves)
+    return table
+
+
+MOVE_TABLE = _move_table()
+# squares in the order `CheckersGame.calculate_current_valid_moves` walks the board (column by column)
+COLUMN_MAJOR_SQUARES = sorted(range(32), key=lambda index: (DARK_SQUARES[index][1], DARK_SQUARES[index][0]))
+
+
+def generate_moves(own: int, enemy: int, side_index: int) -> list[tuple[int, int, int]]:
+    """
+    (origin, destination, jumped square or -1) of every legal move, pieces given as 32 bit masks of dark squares
+
+    same order as `CheckersGame.valid_moves`
+    """
+    occupied = own | enemy
+    moves = []
+    for origin in COLUMN_MAJOR_SQUARES:
+        if not own >> origin & 1:
+            continue
+        for destination, jumped, _ in MOVE_TABLE[side_index][origin]:
+            if occupied >> destination & 1:
+                continue
+            if jumped >= 0 and not enemy >> jumped & 1:
+                continue
+            moves.append((origin, destination, jumped))
+    return moves
+
+
+class TablebaseIndexing:
+    """
+    perfect index of all positions with up to `max_pieces` pieces
+
+    positions are grouped in blocks by (red count, black count); inside a block index is
+    side * (C(32, n) * C(n, red)) + rank of occupied squares * C(n, red) + rank of red ones among occupied,
+    both ranks in combinatorial number system (colex)
+    """
+
+    def __init__(self, max_pieces: int):
+        self.max_pieces = max_pieces
+        self.block_offsets: dict[tuple[int, int], int] = {}
+        offset = 0
+        for pieces in range(max_pieces + 1):
+            for reds in range(pieces + 1):
+                self.block_offsets[(reds, pieces - reds)] = offset
+                offset += 2 * self.block_half_size(reds, pieces - reds)
+        self.size = offset
+
+    @staticmethod
+    def block_half_size(reds: int, blacks: int) -> int:
+        return comb(32, reds + blacks) * comb(reds + blacks, reds)
+
+    def index(self, reds: int, blacks: int, side_index: int) -> int:
+        """index of position given by 32 bit masks of red and black pieces"""
+        occupied = reds | blacks
+        occupied_rank = 0
+        red_rank = 0
+        occupied_seen = 0
+        reds_seen = 0
+        square = 0
+        while occupied >> square:
+            if occupied >> square & 1:
+                occupied_seen += 1
+                occupied_rank += comb(square, occupied_seen)
+                if reds >> square & 1:
+                    reds_seen += 1
+                    red_rank += comb(occupied_seen - 1, reds_seen)
+            square += 1
+        red_count = reds_seen
+        black_count = occupied_seen - reds_seen
+        half = self.block_half_size(red_count, black_count)
+        return (self.block_offsets[(red_count, black_count)] + side_index * half
+                + occupied_rank * comb(occupied_seen, red_count) + red_rank)
+
+
+def _masks_from_board(board: BOARD_TYPEHINT) -> tuple[int, int] | None:
+    """32 bit masks of red and black pieces, None if any piece stands on a light square"""
+    masks = [0, 0]
+    for row in range(8):
+        for col in range(8):
+            cell = board[row][col]
+            if cell in SIDES:
+                square = DARK_SQUARE_INDEX.get((row, col))
+                if square is None:
+                    return None
+                masks[SIDES.index(cell)] |= 1 << square
+    return masks[0], masks[1]
+
+
+def generate(max_pieces: int = 4, verbose: bool = True) -> bytearray:
+    """
+    solve every position with up to `max_pieces` pieces by retrograde analysis
+
+    rules have no kings: a quiet move always takes a piece one row further, a beating removes a piece. So a move
+    either lowers number of pieces or raises "advancement" (rows travelled by all pieces) by one, and game graph
+    has no cycles. Layers are solved from the end backwards - fewer pieces first, then from the most advanced
+    positions (terminal ones) back to the least advanced - which means every successor is already solved when
+    position is reached. Side with no moves loses (`check_lose_game`), there are no draws in these rules.
+    """
+    indexing = TablebaseIndexing(max_pieces)
+    values = bytearray(indexing.size)
+    start = time.perf_counter()
+    for pieces in range(max_pieces + 1):
+        for red_count in range(pieces + 1):
+            black_count = pieces - red_count
+            buckets = _positions_by_advancement(red_count, black_count)
+            for advancement in sorted(buckets, reverse=True):
+                red_masks, black_masks = buckets[advancement]
+                for reds, blacks in zip(red_masks, black_masks):
+                    for side_index in (0, 1):
+                        values[indexing.index(reds, blacks, side_index)] = _solve(
+                            indexing, values, reds, blacks, side_index)
+            if verbose:
+                print(f"{red_count} red + {black_count} black solved, {time.perf_counter() - start:.1f} s")
+    return values
+
+
+def _positions_by_advancement(red_count: int, black_count: int) -> dict[int, tuple[array, array]]:
+    """every placement of given pieces, grouped by rows travelled (red goes up, black goes down)"""
+    buckets: dict[int, tuple[array, array]] = {}
+    red_progress = [7 - row for row, _ in DARK_SQUARES]
+    black_progress = [row for row, _ in DARK_SQUARES]
+    squares = range(32)
+    for red_squares in combinations(squares, red_count):
+        reds = sum(1 << square for square in red_squares)
+        red_advancement = sum(red_progress[square] for square in red_squares)
+        free_squares = [square for square in squares if not reds >> square & 1]
+        for black_squares in combinations(free_squares, black_count):
+            advancement = red_advancement + sum(black_progress[square] for square in black_squares)
+            bucket = buckets.get(advancement)
+            if bucket is None:
+                bucket = buckets[advancement] = (array("I"), array("I"))
+            bucket[0].append(reds)
+            bucket[1].append(sum(1 << square for square in black_squares))
+    return buckets
+
+
+def _solve(indexing: TablebaseIndexing, values: bytearray, reds: int, blacks: int, side_index: int) -> int:
+    own, enemy = (reds, blacks) if side_index == 0 else (blacks, reds)
+    best_win = None
+    longest_loss = 0
+    for origin, destination, jumped in generate_moves(own, enemy, side_index):
+        next_own = own & ~(1 << origin) | 1 << destination
+        next_enemy = enemy & ~(1 << jumped) if jumped >= 0 else enemy
+        next_reds, next_blacks = (next_own, next_enemy) if side_index == 0 else (next_enemy, next_own)
+        successor = values[indexing.index(next_reds, next_blacks, 1 - side_index)]
+        distance = (successor & ~RESULT_MASK) + 1
+        if successor & RESULT_MASK == LOSS:  # opponent loses there
+            if best_win is None or distance < best_win:
+                best_win = distance
+        elif successor & RESULT_MASK == WIN:
+            longest_loss = max(longest_loss, distance)
+        else:
+            raise RuntimeError("successor was not solved before its predecessor")
+    if best_win is not None:
+        result, distance = WIN, best_win
+    else:
+        result, distance = LOSS, longest_loss  # no moves at all is a loss right away
+    if distance > MAX_DISTANCE:
+        raise RuntimeError(f"distance {distance} does not fit into {MAX_DISTANCE}")
+    return result | distance
+
+
+class Tablebase:
+    """
+    Solved endgames, memory-mapped from the file written by `generate` (`python tablebase.py`).
+
+    file layout: header (magic, max pieces), then one byte per position in `TablebaseIndexing` order
+    """
+    # next to this module, not in the working directory - whatever directory the game starts from
+    DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablebase.bin")
+    MAGIC = b"QPTB0001"
+    HEADER = struct.Struct("<8sB7x")
+
+    def __init__(self, path: str | os.PathLike = DEFAULT_PATH):
+        self.path = path
+        with open(path, "rb") as tablebase_file:
+            self.map = mmap.mmap(tablebase_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.max_pieces = self.HEADER.unpack_from(self.map, 0)
+        if magic != self.MAGIC:
+            raise ValueError(f"{path} is not a tablebase")
+        self.indexing = TablebaseIndexing(self.max_pieces)
+        if len(self.map) != self.HEADER.size + self.indexing.size:
+            raise ValueError(f"{path} is truncated")
+
+    @classmethod
+    def load(cls, path: str | os.PathLike = DEFAULT_PATH):
+        """tablebase stored in `path`, None if there is no file"""
+        if not os.path.exists(path):
+            return None
+        return cls(path)
+
+    @classmethod
+    def write(cls, path: str | os.PathLike, max_pieces: int, values: bytearray):
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as tablebase_file:
+            tablebase_file.write(cls.HEADER.pack(cls.MAGIC, max_pieces))
+            tablebase_file.write(values)
+        os.replace(temporary_path, path)
+
+    def _value(self, reds: int, blacks: int, side_index: int) -> int:
+        return self.map[self.HEADER.size + self.indexing.index(reds, blacks, side_index)]
+
+    def probe(self, board: BOARD_TYPEHINT, side: str) -> tuple[str, int] | None:
+        """
+        ("win" / "loss" / "draw", plies to the end with perfect play) for the side to move,
+        None if position is not covered (too many pieces)
+        """
+        masks = _masks_from_board(board)
+        if masks is None or bin(masks[0]).count("1") + bin(masks[1]).count("1") > self.max_pieces:
+            return None
+        value = self._value(*masks, SIDES.index(side))
+        return RESULT_NAMES[value & RESULT_MASK], value & ~RESULT_MASK
+
+    def best_moves(self, board: BOARD_TYPEHINT, side: str) -> list[tuple[tuple[int, int, int, int], str, int]] | None:
+        """
+        every move keeping the best result (fastest win, slowest loss) as (move, result, distance) entries, in
+        `CheckersGame.valid_moves` order, None if position is not covered
+        """
+        probed = self.probe(board, side)
+        if probed is None:
+            return None
+        reds, blacks = _masks_from_board(board)
+        side_index = SIDES.index(side)
+        own, enemy = (reds, blacks) if side_index == 0 else (blacks, reds)
+        result, distance = probed
+        best = []
+        for origin, destination, jumped in generate_moves(own, enemy, side_index):
+            next_own = own & ~(1 << origin) | 1 << destination
+            next_enemy = enemy & ~(1 << jumped) if jumped >= 0 else enemy
+            next_reds, next_blacks = (next_own, next_enemy) if side_index == 0 else (next_enemy, next_own)
+            successor = self._value(next_reds, next_blacks, 1 - side_index)
+            successor_result = RESULT_NAMES[successor & RESULT_MASK]
+            keeps_result = successor_result == {"win": "loss", "loss": "win", "draw": "draw"}[result]
+            if keeps_result and (successor & ~RESULT_MASK) + 1 == distance:
+                best.append(((*DARK_SQUARES[origin], *DARK_SQUARES[destination]), result, distance))
+        return best
+
+    def close(self):
+        self.map.close()
+
+
+def validate_against_game(path: str | os.PathLike = Tablebase.DEFAULT_PATH, samples: int = 2000, seed: int = 0):
+    """
+    spot check on random covered positions - move generation matches `CheckersGame` and every stored result is
+    consistent with results of the successors
+    """
+    tablebase = Tablebase(path)
+    generator = random.Random(seed)
+    game = CheckersGame()
+    for _ in range(samples):
+        pieces = generator.randint(1, tablebase.max_pieces)
+        squares = generator.sample(DARK_SQUARES, pieces)
+        board = [[" "] * 8 for _ in range(8)]
+        for row, col in squares:
+            board[row][col] = generator.choice(SIDES)
+        side = generator.choice(SIDES)
+        game.set_position(board, side)
+
+        reds, blacks = _masks_from_board(board)
+        own, enemy = (reds, blacks) if side == SIDES[0] else (blacks, reds)
+        generated = [(*DARK_SQUARES[origin], *DARK_SQUARES[destination])
+                     for origin, destination, _ in generate_moves(own, enemy, SIDES.index(side))]
+        if generated != game.valid_moves:
+            raise RuntimeError(f"moves differ for {board} ({side}):\n{generated}\n{game.valid_moves}")
+
+        result, distance = tablebase.probe(board, side)
+        if not game.valid_moves:
+            expected = ("loss", 0)
+        else:
+            best = tablebase.best_moves(board, side)
+            expected = (result, distance) if best else None
+        if (result, distance) != expected:
+            raise RuntimeError(f"inconsistent entry for {board} ({side}): {(result, distance)}")
+    tablebase.close()
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="solve all endgames up to given number of pieces")
+    parser.add_argument("--pieces", type=int, default=4)
+    parser.add_argument("--output", default=Tablebase.DEFAULT_PATH)
+    args = parser.parse_args()
+
+    solved = generate(args.pieces)
+    Tablebase.write(args.output, args.pieces, solved)
+    validate_against_game(args.output)
+    print(f"{len(solved)} positions written into {args.output}")
@@ -0,0 +1,172 @@
+import shutil
+import sys
+import textwrap
+
+BOARD_TYPEHINT = list[list[str]]
+STATE_DATA_TYPEHINT = list[str, str, str]
+
+CSI = "\x1b["
+
+
+class TerminalRenderer:
+    """
+    Incremental ANSI renderer for console play.
+
+    Remembers what was put on screen last frame (every board cell, every sidebar and status line) and only emits
+    cursor-positioned writes for the parts that differ. Everything of a frame is gathered into one buffer and
+    written to the stream at once in `present`, so on slow (SSH) links a move costs a few dozen bytes instead of
+    a full board + prediction table reprint.
+
+    screen layout (1-based terminal rows/columns):
+        rows 2-9        board, 3 columns per cell, row markers to the left
+        rows 1-11       sidebar with quantum predictions, to the right of the board
+        rows 13-16      status lines, then the prompt line
+    """
+    BOARD_TOP = 2
+    BOARD_LEFT = 4
+    CELL_WIDTH = 3
+    SIDEBAR_TOP = 1
+    SIDEBAR_LEFT = 34
+    SIDEBAR_LINES = 11  # header and separator included, the rest is summarized in the last line
+    STATUS_TOP = 13
+    STATUS_LINES = 4
+    PROMPT_ROW = STATUS_TOP + STATUS_LINES + 1
+
+    RESET_STYLE = f"{CSI}0m"
+    LIGHT_SQUARE_STYLE = f"{CSI}47m"
+    DARK_SQUARE_STYLE = f"{CSI}100m"
+    HIGHLIGHT_STYLES = {
+        "hint": f"{CSI}42m",        # green - possible destination of selected piece
+        "selected": f"{CSI}46m",    # cyan - selected piece
+        "last": f"{CSI}43m",        # orange/yellow - last bot move
+    }
+    PIECE_STYLES = {
+        "R": f"{CSI}1;31m",
+        "B": f"{CSI}1;30m",
+        "G": f"{CSI}1;32m",
+    }
+    TOP_PREDICTION_STYLE = f"{CSI}33m"
+
+    def __init__(self, stream=None):
+        self.stream = sys.stdout if stream is None else stream
+        self.buffer: list[str] = []
+        self.cells: dict[tuple[int, int], tuple[str, str | None]] = {}
+        self.sidebar: list[str] = []
+        self.status: list[str] = []
+        self.full_redraw = True
+
+    @staticmethod
+    def status_width() -> int:
+        """columns a status line may take - one less than the terminal, writing the last column wraps the cursor"""
+        return max(20, shutil.get_terminal_size(fallback=(80, 24)).columns - 1)
+
+    def wrap_status(self, text: str, max_lines: int | None = None) -> list[str]:
+        """long text as status lines that fit the width, at most `max_lines` (all status lines by default)"""
+        return textwrap.wrap(text, self.status_width(), max_lines=max_lines or self.STATUS_LINES, placeholder=" ...")
+
+    def invalidate(self):
+        """forget everything that is on screen, next frame clears terminal and is drawn from scratch"""
+        self.full_redraw = True
+
+    def _move_to(self, row: int, col: int):
+        self.buffer.append(f"{CSI}{row};{col}H")
+
+    def _begin_frame(self):
+        if not self.full_redraw:
+            return
+        self.full_redraw = False
+        self.cells.clear()
+        self.sidebar = []
+        self.status = []
+        self.buffer.append(f"{CSI}2J")
+        for row in range(8):
+            self._move_to(self.BOARD_TOP + row, 1)
+            self.buffer.append(f"{8 - row} ")
+        self._move_to(self.BOARD_TOP + 8, self.BOARD_LEFT)
+        self.buffer.append("".join(f" {chr(col + 65)} " for col in range(8)))
+
+    def _cell_text(self, row: int, col: int, piece: str, highlight: str | None) -> str:
+        if highlight is not None:
+            background = self.HIGHLIGHT_STYLES[highlight]
+        elif (row + col) % 2 == 0:
+            background = self.LIGHT_SQUARE_STYLE
+        else:
+            background = self.DARK_SQUARE_STYLE
+        piece_style = self.PIECE_STYLES.get(piece, "")
+        return f"{background}{piece_style} {piece} {self.RESET_STYLE}"
+
+    def draw_board(self, board: BOARD_TYPEHINT, selected_piece=None, hints_for_selection=None,
+                   previous_move_coordinates=None):
+        """queue redraw of the board cells that differ from the previous frame"""
+        self._begin_frame()
+        highlights = {}
+        for square in previous_move_coordinates or []:
+            highlights[tuple(square)] = "last"
+        for square in hints_for_selection or []:
+            highlights[tuple(square)] = "hint"
+        if selected_piece:
+            highlights[tuple(selected_piece)] = "selected"
+
+        for row in range(8):
+            board_row = board[row]
+            for col in range(8):
+                cell = (board_row[col], highlights.get((row, col)))
+                if self.cells.get((row, col)) == cell:
+                    continue
+                self.cells[(row, col)] = cell
+                self._move_to(self.BOARD_TOP + row, self.BOARD_LEFT + col * self.CELL_WIDTH)
+                self.buffer.append(self._cell_text(row, col, *cell))
+
+    def _draw_lines(self, previous: list[str], lines: list[str], top: int, left: int, styles=None):
+        """redraw only the lines that changed, lines that are gone are erased"""
+        for index in range(max(len(previous), len(lines))):
+            line = lines[index] if index < len(lines) else ""
+            if index < len(previous) and previous[index] == line:
+                continue
+            self._move_to(top + index, left)
+            style = styles.get(index) if styles else None
+            if style:
+                self.buffer.append(f"{style}{line}{self.RESET_STYLE}{CSI}K")
+            else:
+                self.buffer.append(f"{line}{CSI}K")
+
+    def draw_quantum_states(self, state_data: STATE_DATA_TYPEHINT):
+        """sidebar table, same columns as in pygame version; first row is the move that bot has taken"""
+        self._begin_frame()
+        lines = [f"{'State':<7} | {'Transition':<10} | {'Probability':<10}", "-" * 36]
+        rows_available = self.SIDEBAR_LINES - len(lines)
+        if len(state_data) > rows_available:
+            rows_available -= 1
+        for state, transition, probability in state_data[:rows_available]:
+            lines.append(f"{state:<7} | {transition:<10} | {probability:<10}")
+        if len(state_data) > rows_available:
+            lines.append(f"... and {len(state_data) - rows_available} more")
+        styles = {2: self.TOP_PREDICTION_STYLE} if state_data else None
+        self._draw_lines(self.sidebar, lines, self.SIDEBAR_TOP, self.SIDEBAR_LEFT, styles)
+        self.sidebar = lines
+
+    def draw_status(self, lines: list[str]):
+        """
+        status area below the board, at most `STATUS_LINES` lines are kept; lines are cut to `status_width` - a line
+        wrapping on its own would shift everything drawn below it
+        """
+        self._begin_frame()
+        width = self.status_width()
+        lines = [line[:width] for line in lines[-self.STATUS_LINES:]]
+        self._draw_lines(self.status, lines, self.STATUS_TOP, 1)
+        self.status = lines
+
+    def present(self):
+        """write everything queued since the last frame in one go"""
+        if self.buffer:
+            self.stream.write("".join(self.buffer))
+            self.stream.flush()
+            self.buffer.clear()
+
+    def prompt(self, text: str) -> str:
+        """present the frame, then read user input at the prompt line (it gets erased before reading)"""
+        self._begin_frame()
+        self._move_to(self.PROMPT_ROW, 1)
+        self.buffer.append(f"{CSI}2K{text}")
+        self.present()
+        return input()